@@ -0,0 +1,162 @@
+"""
+Single-call "collapsed supervisor" agent bound to every specialist tool.
+
+Instead of a routing call followed by a specialist call, one agent sees all
+tools under per-domain namespaces (e.g. `scheduler__create_event`) and picks
+the right ones itself. The per-domain state the UI expects is still filled in
+from the namespaced tool calls.
+"""
+
+from typing import Dict, Any, List
+from langchain_core.runnables import RunnableConfig
+from langgraph.types import Command
+from langgraph.graph import END
+from langchain.agents import create_agent
+
+from state import AgentState, CLEAR_LOGS
+from llm import get_model
+from prompts import PromptBuilder
+from context_window import context_manager
+from tool_tracking import new_messages, new_tool_calls
+from metrics import instrument_tools
+from agents import email_agent, scheduler_agent, research_agent
+
+NAMESPACE_SEPARATOR = "__"
+
+# domain -> (tools, state key, tool call tracker)
+DOMAINS = {
+    "email": (
+        [
+            email_agent.compose_email,
+            email_agent.send_email,
+            email_agent.schedule_email_send,
+            email_agent.manage_email_thread,
+        ],
+        "recent_emails",
+        email_agent.track_tool_call,
+    ),
+    "scheduler": (
+        [
+            scheduler_agent.create_event,
+            scheduler_agent.create_recurring_event,
+            scheduler_agent.cancel_event_occurrence,
+            scheduler_agent.find_available_slots,
+            scheduler_agent.send_calendar_invites,
+            scheduler_agent.reschedule_event,
+            scheduler_agent.check_calendar_conflicts,
+        ],
+        "scheduled_events",
+        scheduler_agent.track_tool_call,
+    ),
+    "research": (
+        [
+            research_agent.search_documents,
+            research_agent.analyze_document,
+            research_agent.create_research_summary,
+            research_agent.extract_key_information,
+            research_agent.compare_documents,
+        ],
+        "research_results",
+        research_agent.track_tool_call,
+    ),
+}
+
+
+# System prompt for the collapsed agent
+COLLAPSED_AGENT_PROMPT = f"""You are a personal assistant handling email, calendar and research tasks directly.
+
+Your tools are grouped by domain, and each tool name is prefixed with its domain:
+- email{NAMESPACE_SEPARATOR}* for composing, sending, scheduling and organizing email
+- scheduler{NAMESPACE_SEPARATOR}* for calendar events, available slots, invitations and conflicts
+- research{NAMESPACE_SEPARATOR}* for searching, analyzing, summarizing and comparing documents
+
+{email_agent.EMAIL_AGENT_PROMPT}
+
+{scheduler_agent.SCHEDULER_AGENT_PROMPT}
+
+{research_agent.RESEARCH_AGENT_PROMPT}
+
+Requests may span several domains; use tools from every domain the request needs."""
+
+
+def namespaced(domain: str, tool):
+    """Copy a tool under a domain-prefixed name."""
+    return tool.model_copy(update={"name": f"{domain}{NAMESPACE_SEPARATOR}{tool.name}"})
+
+
+class CollapsedAgent:
+    """One agent with every specialist tool, replacing supervisor + specialist."""
+
+    def __init__(self):
+        # Tool timings are exported on /metrics
+        self.tools = instrument_tools(
+            [
+                namespaced(domain, tool)
+                for domain, (tools, _, _) in DOMAINS.items()
+                for tool in tools
+            ]
+        )
+
+        # Shared, pooled model for this role (see llm.py)
+        model = get_model("assistant")
+
+        # Static system prompt plus a trailing context message (prefix-cache friendly)
+        self.prompt = PromptBuilder(COLLAPSED_AGENT_PROMPT)
+
+        # Create agent using LangChain's create_agent API
+        self.agent = create_agent(
+            model,
+            tools=self.tools,
+            state_schema=AgentState,
+            system_prompt=self.prompt.static_prompt,
+            middleware=[context_manager.middleware("assistant"), self.prompt.middleware()],
+        )
+
+    def get_tools(self):
+        """Return list of tools for this agent."""
+        return self.tools
+
+    async def process(self, state: AgentState, config: RunnableConfig) -> Command[str]:
+        """Handle the request in a single agent loop and fill per-domain state."""
+
+        new_logs = [{"message": "🤖 Assistant processing request...", "done": False}]
+
+        # Invoke the agent with current state
+        result = await self.agent.ainvoke(state, config)
+        produced = new_messages(state.get("messages", []), result.get("messages", []))
+
+        collections: Dict[str, List[Dict[str, Any]]] = {}
+        domains_used: List[str] = []
+
+        # Only messages produced by this invocation carry new tool calls
+        for tool_call in new_tool_calls(produced):
+            domain, _, tool_name = tool_call.get("name", "").partition(NAMESPACE_SEPARATOR)
+            if domain not in DOMAINS:
+                continue
+            new_logs.append({"message": f"Executing: {domain}.{tool_name}", "done": True})
+            if domain not in domains_used:
+                domains_used.append(domain)
+
+            _, state_key, track = DOMAINS[domain]
+            entry = track({**tool_call, "name": tool_name})
+            if entry is not None:
+                collections.setdefault(state_key, []).append(entry)
+
+        new_logs[0] = {"message": "🤖 Assistant processing request...", "done": True}
+        new_logs.append({"message": "✅ Assistant completed", "done": True})
+
+        task = getattr(state["messages"][-1], "content", "") if state.get("messages") else ""
+        if isinstance(task, str) and len(task) > 100:
+            task = task[:97] + "..."
+
+        return Command(
+            goto=END,
+            update={
+                "messages": produced,
+                "active_agent": ", ".join(domains_used) or "assistant",
+                "current_task": task if isinstance(task, str) else "",
+                **collections,
+                # Entry node: start this turn's logs from scratch
+                "logs": [CLEAR_LOGS, *new_logs],
+            },
+        )
@@ -3,21 +3,24 @@ Email agent specialized for email composition and management.
 """
 
 from typing import Dict, Any
+from datetime import datetime
 from langchain.tools import tool
 from langchain_core.runnables import RunnableConfig
 # from langchain_openai import AzureChatOpenAI
 # from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
 from langgraph.types import Command
 from langgraph.graph import END
 from langchain.agents import create_agent
-import os
-from dotenv import load_dotenv
 
 from state import AgentState
-
-# Load environment variables
-load_dotenv()
+from llm import get_model
+from prompts import PromptBuilder
+from context_window import context_manager
+from tool_tracking import new_messages, new_tool_calls
+from metrics import instrument_tools
+from calendar_store import calendar_store, format_time
+from outbox import outbox, parse_send_time
+from mailbox_store import mailbox, parse_thread_action
 
 
 @tool
@@ -26,10 +29,20 @@ def compose_email(recipient: str, subject: str, content: str) -> str:
     return f"📧 Email composed to {recipient} with subject '{subject}'"
 
 
+def _queued(ids) -> str:
+    note = "" if outbox.delivering else "; delivery is not configured (SMTP_HOST)"
+    return f"[id {', '.join(ids)}{note}]"
+
+
 @tool
 def send_email(recipient: str, subject: str, content: str) -> str:
     """Send an email to the specified recipient."""
-    return f"✅ Email sent to {recipient} with subject '{subject}'"
+    # Queued durably; the outbox worker delivers it in the background
+    try:
+        ids = outbox.enqueue(recipient, subject, content)
+    except ValueError as e:
+        return f"❌ Could not send email: {e}"
+    return f"✅ Email to {recipient} with subject '{subject}' queued for delivery {_queued(ids)}"
 
 
 @tool
@@ -37,13 +50,61 @@ def schedule_email_send(
     recipient: str, subject: str, content: str, send_time: str
 ) -> str:
     """Schedule an email to be sent at a specific time."""
-    return f"⏰ Email to {recipient} scheduled for {send_time}"
+    tz = calendar_store.tz
+    try:
+        when = parse_send_time(send_time, datetime.now(tz), tz)
+        ids = outbox.enqueue(recipient, subject, content, send_at=when.timestamp())
+    except ValueError as e:
+        return f"❌ Could not schedule email: {e}"
+    return f"⏰ Email to {recipient} scheduled for {format_time(int(when.timestamp()), tz)} {_queued(ids)}"
+
+
+def _describe_thread(thread_id: str, messages) -> str:
+    tz = calendar_store.tz
+    lines = [f"📬 Thread {thread_id} ({len(messages)} messages):"]
+    for message in messages:
+        when = format_time(message["date"], tz) if message["date"] is not None else "undated"
+        state = ", ".join(
+            label for label, on in (("unread", not message["seen"]), ("archived", message["archived"])) if on
+        )
+        lines.append(f"- {when} from {message['sender']}: {message['subject']}" + (f" [{state}]" if state else ""))
+        if message.get("body"):
+            lines.append(f"  {message['body'][:500]}")
+    return "\n".join(lines)
 
 
 @tool
 def manage_email_thread(thread_id: str, action: str) -> str:
-    """Manage email threads (mark as read, archive, etc.)."""
-    return f"📬 Email thread {thread_id} - action: {action}"
+    """Manage email threads: fetch (show its messages), mark as read or unread, archive or unarchive."""
+    try:
+        verb = parse_thread_action(action)
+    except ValueError as e:
+        return f"❌ {e}"
+    if verb == "fetch":
+        messages = mailbox.fetch_thread(thread_id)
+        if not messages:
+            return f"❌ No email thread {thread_id}"
+        return _describe_thread(thread_id, messages)
+    change, done = {
+        "read": (mailbox.mark_read, "marked as read"),
+        "unread": (mailbox.mark_unread, "marked as unread"),
+        "archive": (mailbox.archive, "archived"),
+        "unarchive": (mailbox.unarchive, "moved back to the inbox"),
+    }[verb]
+    count = change(thread_id)
+    if not count:
+        return f"❌ No email thread {thread_id}"
+    return f"📬 Email thread {thread_id} ({count} messages) {done}"
+
+
+def track_tool_call(tool_call: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the recent_emails entry recorded for an email tool call."""
+    return {
+        "id": tool_call.get("id"),
+        "tool": tool_call.get("name", "unknown"),
+        "args": tool_call.get("args", {}),
+        "timestamp": "now",
+    }
 
 
 # System prompt for email agent
@@ -64,12 +125,15 @@ class EmailAgent:
     """Agent specialized in email management and communication."""
 
     def __init__(self):
-        self.tools = [
-            compose_email,
-            send_email,
-            schedule_email_send,
-            manage_email_thread,
-        ]
+        # Tool timings are exported on /metrics
+        self.tools = instrument_tools(
+            [
+                compose_email,
+                send_email,
+                schedule_email_send,
+                manage_email_thread,
+            ]
+        )
 
         # Create Azure OpenAI model
         # model = AzureChatOpenAI(
@@ -78,20 +142,19 @@ class EmailAgent:
         #     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
         #     api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
         # )
-        model = ChatOpenAI(
-            model=os.getenv("LOCAL_MODEL_NAME", "TheBloke/Mistral-7B-Instruct-v0.2-GGUF"),
-            temperature=0.7,
-            max_tokens=2048,
-            base_url=os.getenv("OPENAI_BASE_URL", "http://localhost:1234/v1"),
-            api_key=os.getenv("OPENAI_API_KEY", "lm-studio")
-        )
+        # Shared, pooled model for this role (see llm.py)
+        model = get_model("email")
+
+        # Static system prompt plus a trailing context message (prefix-cache friendly)
+        self.prompt = PromptBuilder(EMAIL_AGENT_PROMPT)
 
         # Create agent using LangChain's create_agent API
         self.agent = create_agent(
             model,
             tools=self.tools,
             state_schema=AgentState,
-            system_prompt=EMAIL_AGENT_PROMPT,
+            system_prompt=self.prompt.static_prompt,
+            middleware=[context_manager.middleware("email"), self.prompt.middleware()],
         )
 
     def get_tools(self):
@@ -108,24 +171,16 @@ class EmailAgent:
         # Invoke the agent with current state
         result = await self.agent.ainvoke(state, config)
 
-        # Track email activity from tool calls if any
-        new_emails = list(state.get("recent_emails", []))
-
-        # Extract tool call information from result messages
-        if "messages" in result:
-            for msg in result["messages"]:
-                if hasattr(msg, "tool_calls") and msg.tool_calls:
-                    for tool_call in msg.tool_calls:
-                        tool_name = tool_call.get("name", "unknown")
-                        new_logs.append({"message": f"Executing: {tool_name}", "done": True})
-
-                        new_emails.append(
-                            {
-                                "tool": tool_name,
-                                "args": tool_call.get("args", {}),
-                                "timestamp": "now",
-                            }
-                        )
+        # Track email activity from tool calls if any (the state reducer appends)
+        new_emails = []
+
+        # Only inspect messages produced by this invocation, not the whole history
+        produced = new_messages(state.get("messages", []), result.get("messages", []))
+        for tool_call in new_tool_calls(produced):
+            tool_name = tool_call.get("name", "unknown")
+            new_logs.append({"message": f"Executing: {tool_name}", "done": True})
+
+            new_emails.append(track_tool_call(tool_call))
 
         # Mark email agent processing as complete
         new_logs[0] = {"message": "📧 Email agent processing request...", "done": True}
@@ -134,7 +189,7 @@ class EmailAgent:
         return Command(
             goto=END,
             update={
-                "messages": result.get("messages", []),
+                "messages": produced,
                 "recent_emails": new_emails,
                 "logs": new_logs,
             },
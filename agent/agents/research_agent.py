@@ -7,18 +7,17 @@ from langchain.tools import tool
 from langchain_core.runnables import RunnableConfig
 # from langchain_openai import AzureChatOpenAI
 # from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
 from langgraph.types import Command
 from langgraph.graph import END
 from datetime import datetime
 from langchain.agents import create_agent
-import os
-from dotenv import load_dotenv
 
 from state import AgentState
-
-# Load environment variables
-load_dotenv()
+from llm import get_model
+from prompts import PromptBuilder
+from context_window import context_manager
+from tool_tracking import new_messages, new_tool_calls
+from metrics import instrument_tools
 
 
 @tool
@@ -51,6 +50,19 @@ def compare_documents(doc1_id: str, doc2_id: str, comparison_criteria: str) -> s
     return f"⚖️ Comparison complete between {doc1_id} and {doc2_id} on: {comparison_criteria}"
 
 
+def track_tool_call(tool_call: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the research_results entry recorded for a research tool call."""
+    args = tool_call.get("args", {})
+    return {
+        "id": tool_call.get("id"),
+        "tool": tool_call.get("name", "unknown"),
+        "query": args.get("query", ""),
+        "category": args.get("category", "general"),
+        "timestamp": datetime.now().isoformat(),
+        "status": "completed",
+    }
+
+
 # System prompt for research agent
 RESEARCH_AGENT_PROMPT = """You are a research and knowledge management specialist with advanced analytical capabilities.
 
@@ -71,13 +83,16 @@ class ResearchAgent:
     """Agent specialized in research, document analysis, and knowledge management."""
 
     def __init__(self):
-        self.tools = [
-            search_documents,
-            analyze_document,
-            create_research_summary,
-            extract_key_information,
-            compare_documents,
-        ]
+        # Tool timings are exported on /metrics
+        self.tools = instrument_tools(
+            [
+                search_documents,
+                analyze_document,
+                create_research_summary,
+                extract_key_information,
+                compare_documents,
+            ]
+        )
 
         # Create Azure OpenAI model
         # model = AzureChatOpenAI(
@@ -86,20 +101,19 @@ class ResearchAgent:
         #     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
         #     api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
         # )
-        model = ChatOpenAI(
-            model=os.getenv("LOCAL_MODEL_NAME", "TheBloke/Mistral-7B-Instruct-v0.2-GGUF"),
-            temperature=0.7,
-            max_tokens=2048,
-            base_url=os.getenv("OPENAI_BASE_URL", "http://localhost:1234/v1"),
-            api_key=os.getenv("OPENAI_API_KEY", "lm-studio")
-        )
+        # Shared, pooled model for this role (see llm.py)
+        model = get_model("research")
+
+        # Static system prompt plus a trailing context message (prefix-cache friendly)
+        self.prompt = PromptBuilder(RESEARCH_AGENT_PROMPT)
 
         # Create agent using LangChain's create_agent API
         self.agent = create_agent(
             model,
             tools=self.tools,
             state_schema=AgentState,
-            system_prompt=RESEARCH_AGENT_PROMPT,
+            system_prompt=self.prompt.static_prompt,
+            middleware=[context_manager.middleware("research"), self.prompt.middleware()],
         )
 
     def get_tools(self):
@@ -116,27 +130,16 @@ class ResearchAgent:
         # Invoke the agent with current state
         result = await self.agent.ainvoke(state, config)
 
-        # Track research activity from tool calls if any
-        new_research = list(state.get("research_results", []))
-
-        # Extract tool call information from result messages
-        if "messages" in result:
-            for msg in result["messages"]:
-                if hasattr(msg, "tool_calls") and msg.tool_calls:
-                    for tool_call in msg.tool_calls:
-                        tool_name = tool_call.get("name", "unknown")
-                        args = tool_call.get("args", {})
-                        new_logs.append({"message": f"Executing: {tool_name}", "done": True})
-
-                        new_research.append(
-                            {
-                                "tool": tool_name,
-                                "query": args.get("query", ""),
-                                "category": args.get("category", "general"),
-                                "timestamp": datetime.now().isoformat(),
-                                "status": "completed",
-                            }
-                        )
+        # Track research activity from tool calls if any (the state reducer appends)
+        new_research = []
+
+        # Only inspect messages produced by this invocation, not the whole history
+        produced = new_messages(state.get("messages", []), result.get("messages", []))
+        for tool_call in new_tool_calls(produced):
+            tool_name = tool_call.get("name", "unknown")
+            new_logs.append({"message": f"Executing: {tool_name}", "done": True})
+
+            new_research.append(track_tool_call(tool_call))
 
         # Mark research agent processing as complete
         new_logs[0] = {"message": "🔍 Research agent processing request...", "done": True}
@@ -145,7 +148,7 @@ class ResearchAgent:
         return Command(
             goto=END,
             update={
-                "messages": result.get("messages", []),
+                "messages": produced,
                 "research_results": new_research,
                 "logs": new_logs,
             },
@@ -2,23 +2,52 @@
 Scheduler agent specialized for calendar and event management.
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from langchain.tools import tool
 from langchain_core.runnables import RunnableConfig
 # from langchain_openai import AzureChatOpenAI
 # from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
 from langgraph.types import Command
 from langgraph.graph import END
-from datetime import datetime
+from datetime import datetime, timedelta
 from langchain.agents import create_agent
-import os
-from dotenv import load_dotenv
 
 from state import AgentState
+from llm import get_model
+from prompts import PromptBuilder
+from context_window import context_manager
+from tool_tracking import new_messages, new_tool_calls
+from metrics import instrument_tools
+from calendar_store import (
+    calendar_store,
+    format_time,
+    parse_date,
+    parse_duration,
+    parse_participants,
+    parse_repeat,
+    parse_time,
+)
+from freebusy import slot_search
 
-# Load environment variables
-load_dotenv()
+
+def _start(date: str, time: str) -> int:
+    """Epoch seconds of a date and time given in the calendar's time zone."""
+    day = parse_date(date, datetime.now(calendar_store.tz).date())
+    return int(datetime.combine(day, parse_time(time), calendar_store.tz).timestamp())
+
+
+def _window(date: str, time: str, duration: str):
+    start = _start(date, time)
+    return start, start + parse_duration(duration)
+
+
+def _describe_conflicts(conflicts) -> str:
+    tz = calendar_store.tz
+    return "; ".join(
+        f"{participant}: "
+        + ", ".join(f"'{e.title}' ({format_time(e.start, tz)}, {e.id})" for e in events)
+        for participant, events in conflicts.items()
+    )
 
 
 @tool
@@ -26,13 +55,80 @@ def create_event(
     title: str, date: str, time: str, duration: str, participants: str
 ) -> str:
     """Create a calendar event with specified details."""
-    return f"📅 Event '{title}' created for {date} at {time} ({duration}) with {participants}"
+    try:
+        start, end = _window(date, time, duration)
+        people = parse_participants(participants)
+    except ValueError as e:
+        return f"❌ Could not create event: {e}"
+    conflicts = calendar_store.conflicts(people, start, end)
+    event = calendar_store.create_event(title, start, end, people)
+    message = (
+        f"📅 Event '{title}' created for {format_time(start, calendar_store.tz)} "
+        f"({duration}) with {', '.join(people)} [id {event.id}]"
+    )
+    if conflicts:
+        message += f"\n⚠️ Overlaps with: {_describe_conflicts(conflicts)}"
+    return message
+
+
+@tool
+def create_recurring_event(
+    title: str, date: str, time: str, duration: str, participants: str, repeat: str
+) -> str:
+    """Create a recurring meeting series starting on `date`, repeating e.g. "weekly",
+    "every 2 weeks on monday and thursday", "weekdays until 2026-12-18", "daily for 10 times"
+    or an RRULE such as "FREQ=WEEKLY;BYDAY=MO,WE"."""
+    tz = calendar_store.tz
+    try:
+        start, end = _window(date, time, duration)
+        rule = parse_repeat(repeat, datetime.now(tz).date())
+        people = parse_participants(participants)
+        series = calendar_store.create_series(title, start, end - start, rule, people)
+    except ValueError as e:
+        return f"❌ Could not create series: {e}"
+    message = (
+        f"🔁 Series '{title}' created from {format_time(series.start, tz)} ({duration}, {rule}) "
+        f"with {', '.join(people)} [id {series.id}; occurrences are {series.id}@YYYY-MM-DD]"
+    )
+    conflicts = calendar_store.series_conflicts(series)
+    if conflicts:
+        message += f"\n⚠️ Overlaps with: {_describe_conflicts(conflicts)}"
+    return message
+
+
+@tool
+def cancel_event_occurrence(event_id: str) -> str:
+    """Cancel a single occurrence of a recurring series, by its id (series id@YYYY-MM-DD)."""
+    try:
+        calendar_store.cancel_occurrence(event_id)
+    except KeyError:
+        return f"❌ No occurrence with id {event_id}"
+    return f"🚫 Occurrence {event_id} cancelled; the rest of the series is unchanged"
 
 
 @tool
-def find_available_slots(date: str, duration: str, participants: str) -> str:
-    """Find available time slots for scheduling meetings."""
-    return f"🔍 Available {duration} slots found for {date} with {participants}"
+def find_available_slots(date: str, duration: str, participants: str, days: int = 1) -> str:
+    """Find available time slots for scheduling meetings, starting on `date` and searching `days` days."""
+    try:
+        tz = calendar_store.tz
+        day = parse_date(date, datetime.now(tz).date())
+        length = parse_duration(duration)
+        people = parse_participants(participants)
+    except ValueError as e:
+        return f"❌ Could not search slots: {e}"
+    start = int(datetime.combine(day, datetime.min.time(), tz).timestamp())
+    end = int(datetime.combine(day + timedelta(days=max(1, days)), datetime.min.time(), tz).timestamp())
+    # Never offer time that has already passed
+    slots = slot_search.search(people, start, end, length, not_before=int(datetime.now(tz).timestamp()))
+    if not slots:
+        return f"🔍 No {duration} slot from {day.isoformat()} where {', '.join(people)} can meet"
+    listed = "\n".join(
+        f"- {format_time(slot.start, tz)}-{datetime.fromtimestamp(slot.end, tz):%H:%M}"
+        + (f" (busy: {', '.join(slot.missing)})" if slot.missing else "")
+        for slot in slots
+    )
+    heading = "Best" if slots[0].missing else "Free"
+    return f"🔍 {heading} {duration} slots for {', '.join(people)} ({tz.key}):\n{listed}"
 
 
 @tool
@@ -43,14 +139,57 @@ def send_calendar_invites(event_id: str, participants: str, message: str = "") -
 
 @tool
 def reschedule_event(event_id: str, new_date: str, new_time: str) -> str:
-    """Reschedule an existing event to a new date and time."""
-    return f"🔄 Event {event_id} rescheduled to {new_date} at {new_time}"
+    """Reschedule an existing event, or one occurrence of a series (series id@YYYY-MM-DD), to a new date and time."""
+    event = calendar_store.get(event_id)
+    if event is None:
+        return f"❌ No event with id {event_id}"
+    try:
+        start = _start(new_date, new_time)
+    except ValueError as e:
+        return f"❌ Could not reschedule: {e}"
+    end = start + event.end - event.start
+    conflicts = calendar_store.conflicts(event.participants, start, end, exclude=event.id)
+    calendar_store.reschedule(event.id, start, end)
+    message = f"🔄 Event {event_id} rescheduled to {format_time(start, calendar_store.tz)}"
+    if conflicts:
+        message += f"\n⚠️ Overlaps with: {_describe_conflicts(conflicts)}"
+    return message
 
 
 @tool
-def check_calendar_conflicts(date: str, time: str, participants: str) -> str:
+def check_calendar_conflicts(
+    date: str, time: str, participants: str, duration: str = "1 hour"
+) -> str:
     """Check for scheduling conflicts with participants."""
-    return f"✅ No conflicts found for {date} at {time} with {participants}"
+    try:
+        start, end = _window(date, time, duration)
+        people = parse_participants(participants)
+    except ValueError as e:
+        return f"❌ Could not check conflicts: {e}"
+    conflicts = calendar_store.conflicts(people, start, end)
+    when = format_time(start, calendar_store.tz)
+    if not conflicts:
+        return f"✅ No conflicts found for {when} ({duration}) with {', '.join(people)}"
+    return f"⚠️ Conflicts for {when} ({duration}): {_describe_conflicts(conflicts)}"
+
+
+def track_tool_call(tool_call: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Build the scheduled_events entry for a scheduler tool call, if any."""
+    if tool_call.get("name") not in ("create_event", "create_recurring_event"):
+        return None
+    args = tool_call.get("args", {})
+    entry = {
+        "id": tool_call.get("id"),
+        "title": args.get("title", "New Event"),
+        "date": args.get("date", "TBD"),
+        "time": args.get("time", "TBD"),
+        "participants": args.get("participants", ""),
+        "duration": args.get("duration", "1 hour"),
+        "timestamp": datetime.now().isoformat(),
+    }
+    if "repeat" in args:
+        entry["repeat"] = args["repeat"]
+    return entry
 
 
 # System prompt for scheduler agent
@@ -72,13 +211,18 @@ class SchedulerAgent:
     """Agent specialized in calendar management and event scheduling."""
 
     def __init__(self):
-        self.tools = [
-            create_event,
-            find_available_slots,
-            send_calendar_invites,
-            reschedule_event,
-            check_calendar_conflicts,
-        ]
+        # Tool timings are exported on /metrics
+        self.tools = instrument_tools(
+            [
+                create_event,
+                create_recurring_event,
+                cancel_event_occurrence,
+                find_available_slots,
+                send_calendar_invites,
+                reschedule_event,
+                check_calendar_conflicts,
+            ]
+        )
 
         # Create Azure OpenAI model
         # model = AzureChatOpenAI(
@@ -87,20 +231,19 @@ class SchedulerAgent:
         #     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
         #     api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
         # )
-        model = ChatOpenAI(
-            model=os.getenv("LOCAL_MODEL_NAME", "TheBloke/Mistral-7B-Instruct-v0.2-GGUF"),
-            temperature=0.7,
-            max_tokens=2048,
-            base_url=os.getenv("OPENAI_BASE_URL", "http://localhost:1234/v1"),
-            api_key=os.getenv("OPENAI_API_KEY", "lm-studio")
-        )
+        # Shared, pooled model for this role (see llm.py)
+        model = get_model("scheduler")
+
+        # Static system prompt plus a trailing context message (prefix-cache friendly)
+        self.prompt = PromptBuilder(SCHEDULER_AGENT_PROMPT)
 
         # Create agent using LangChain's create_agent API
         self.agent = create_agent(
             model,
             tools=self.tools,
             state_schema=AgentState,
-            system_prompt=SCHEDULER_AGENT_PROMPT,
+            system_prompt=self.prompt.static_prompt,
+            middleware=[context_manager.middleware("scheduler"), self.prompt.middleware()],
         )
 
     def get_tools(self):
@@ -117,29 +260,18 @@ class SchedulerAgent:
         # Invoke the agent with current state
         result = await self.agent.ainvoke(state, config)
 
-        # Track scheduling activity from tool calls if any
-        new_events = list(state.get("scheduled_events", []))
-
-        # Extract tool call information from result messages
-        if "messages" in result:
-            for msg in result["messages"]:
-                if hasattr(msg, "tool_calls") and msg.tool_calls:
-                    for tool_call in msg.tool_calls:
-                        tool_name = tool_call.get("name", "unknown")
-                        new_logs.append({"message": f"Executing: {tool_name}", "done": True})
-
-                        if tool_name == "create_event":
-                            args = tool_call.get("args", {})
-                            new_events.append(
-                                {
-                                    "title": args.get("title", "New Event"),
-                                    "date": args.get("date", "TBD"),
-                                    "time": args.get("time", "TBD"),
-                                    "participants": args.get("participants", ""),
-                                    "duration": args.get("duration", "1 hour"),
-                                    "timestamp": datetime.now().isoformat(),
-                                }
-                            )
+        # Track scheduling activity from tool calls if any (the state reducer appends)
+        new_events = []
+
+        # Only inspect messages produced by this invocation, not the whole history
+        produced = new_messages(state.get("messages", []), result.get("messages", []))
+        for tool_call in new_tool_calls(produced):
+            tool_name = tool_call.get("name", "unknown")
+            new_logs.append({"message": f"Executing: {tool_name}", "done": True})
+
+            event = track_tool_call(tool_call)
+            if event is not None:
+                new_events.append(event)
 
         # Mark scheduler agent processing as complete
         new_logs[0] = {"message": "📅 Scheduler agent processing request...", "done": True}
@@ -148,7 +280,7 @@ class SchedulerAgent:
         return Command(
             goto=END,
             update={
-                "messages": result.get("messages", []),
+                "messages": produced,
                 "scheduled_events": new_events,
                 "logs": new_logs,
             },
@@ -0,0 +1,225 @@
+"""
+Load balancing across several OpenAI-compatible backends.
+
+OPENAI_BASE_URLS lists LM Studio / llama.cpp instances, comma-separated. It
+falls back to the single OPENAI_BASE_URL. Every role's model talks to one
+BalancingTransport, which sends each request to one backend:
+- least outstanding requests (in flight plus queued in its scheduler) wins
+- passive health checks: LLM_EJECT_AFTER_FAILURES (default 3) consecutive
+  connection errors or 5xx responses eject a backend for LLM_EJECT_SECONDS
+  (default 30). It then rejoins, and one more failure ejects it again. A
+  request that could not connect is retried once on another backend
+- with LLM_HEDGE_ROUTING=true, a supervisor routing call that is still running
+  after LLM_HEDGE_DELAY_MS is duplicated to a second backend, and the first
+  answer wins. One that fails sooner (connection error or 5xx) goes to the
+  second backend at once. The default delay (0) is the observed p95 of
+  routing calls. Routing answers are a few tokens, so hedged responses are read in full
+  before they are returned
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+from metrics import backend_ejections, llm_hedges
+from scheduling import ROUTING, classify
+
+# Hedge delay until enough routing calls have been seen to estimate a p95
+DEFAULT_HEDGE_DELAY = 0.5
+MIN_LATENCY_SAMPLES = 20
+
+
+def backend_urls() -> List[str]:
+    """Backend base URLs from OPENAI_BASE_URLS, or the single OPENAI_BASE_URL."""
+    urls = os.getenv("OPENAI_BASE_URLS") or os.getenv("OPENAI_BASE_URL", "http://localhost:1234/v1")
+    return [url.strip() for url in urls.split(",") if url.strip()]
+
+
+class BackendHealth:
+    """Consecutive-failure tracking and ejection for one backend."""
+
+    def __init__(self):
+        self.max_failures = int(os.getenv("LLM_EJECT_AFTER_FAILURES", "3"))
+        self.eject_seconds = float(os.getenv("LLM_EJECT_SECONDS", "30"))
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def succeeded(self):
+        self.consecutive_failures = 0
+
+    def failed(self, now: float) -> bool:
+        """Record a failure; returns True if it ejects the backend."""
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.max_failures and self.available(now):
+            self.ejected_until = now + self.eject_seconds
+            self.ejections += 1
+            return True
+        return False
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "healthy": self.available(now),
+            "consecutive_failures": self.consecutive_failures,
+            "ejections": self.ejections,
+            "ejected_for_s": round(max(0.0, self.ejected_until - now), 1),
+        }
+
+
+class LatencyWindow:
+    """Recent request durations, for the hedge delay."""
+
+    def __init__(self, size: int = 200):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if len(self.samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class BalancingTransport(httpx.AsyncBaseTransport):
+    """
+    Sends each request to the least-loaded healthy backend.
+
+    Requests are built by the OpenAI client against the first backend's URL,
+    then retargeted. `pools` are llm.BackendPool objects: each one brings its
+    own scheduler, connection pool and health.
+    """
+
+    def __init__(self, pools: List[Any]):
+        self.pools = pools
+        self.base_url = pools[0].base_url.rstrip("/")
+        self.hedge_routing = os.getenv("LLM_HEDGE_ROUTING", "false").lower() in ("1", "true", "yes")
+        self.hedge_delay_ms = float(os.getenv("LLM_HEDGE_DELAY_MS", "0"))
+        self.routing_latency = LatencyWindow()
+
+    def hedge_delay(self) -> float:
+        if self.hedge_delay_ms > 0:
+            return self.hedge_delay_ms / 1000
+        p95 = self.routing_latency.percentile(0.95)
+        return DEFAULT_HEDGE_DELAY if p95 is None else p95
+
+    def pick(self, exclude: Optional[Any] = None) -> Optional[Any]:
+        """Least outstanding healthy backend; any backend if all are ejected."""
+        now = time.monotonic()
+        others = [pool for pool in self.pools if pool is not exclude]
+        candidates = [pool for pool in others if pool.health.available(now)] or others
+        if not candidates:
+            return None
+        return min(
+            candidates,
+            key=lambda pool: (
+                pool.scheduler.in_flight + pool.scheduler.queued,
+                pool.stats.requests_total,
+            ),
+        )
+
+    def retarget(self, request: httpx.Request, pool: Any) -> httpx.Request:
+        if pool.base_url.rstrip("/") == self.base_url:
+            return request
+        url = httpx.URL(pool.base_url.rstrip("/") + str(request.url)[len(self.base_url) :])
+        headers = request.headers.copy()
+        headers["Host"] = url.netloc.decode("ascii")
+        return httpx.Request(
+            request.method,
+            url,
+            headers=headers,
+            content=request.content,
+            extensions=request.extensions,
+        )
+
+    async def send(self, pool: Any, request: httpx.Request, priority: int) -> httpx.Response:
+        """Send to one backend and update its health."""
+        try:
+            response = await pool.transport.send(self.retarget(request, pool), priority)
+        except httpx.TransportError:
+            self._failed(pool)
+            raise
+        if response.status_code >= 500:
+            self._failed(pool)
+        else:
+            pool.health.succeeded()
+        return response
+
+    def _failed(self, pool: Any):
+        if pool.health.failed(time.monotonic()):
+            backend_ejections.labels(pool.base_url).inc()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        priority = classify(request.content)
+        if priority == ROUTING and self.hedge_routing and len(self.pools) > 1:
+            return await self._hedged(request, priority)
+
+        pool = self.pick()
+        try:
+            return await self.send(pool, request, priority)
+        except httpx.ConnectError:
+            # Never reached the backend, so it is safe to try another one
+            fallback = self.pick(exclude=pool)
+            if fallback is None:
+                raise
+            return await self.send(fallback, request, priority)
+
+    async def _buffered(self, pool: Any, request: httpx.Request, priority: int) -> httpx.Response:
+        """Send and read the whole body, so the slot is released as soon as it is answered."""
+        start = time.perf_counter()
+        response = await self.send(pool, request, priority)
+        try:
+            body = b"".join([chunk async for chunk in response.stream])
+        finally:
+            await response.stream.aclose()
+        self.routing_latency.add(time.perf_counter() - start)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=httpx.ByteStream(body),
+            extensions=response.extensions,
+        )
+
+    async def _hedged(self, request: httpx.Request, priority: int) -> httpx.Response:
+        primary = self.pick()
+        first = asyncio.ensure_future(self._buffered(primary, request, priority))
+        attempts = {first: "primary"}
+        try:
+            # Hedge once the delay passes, or at once if the primary fails before it
+            done, _ = await asyncio.wait({first}, timeout=self.hedge_delay())
+            if done and _answered(first):
+                return first.result()
+            secondary = self.pick(exclude=primary)
+            if secondary is None:
+                return await first
+
+            second = asyncio.ensure_future(self._buffered(secondary, request, priority))
+            attempts[second] = "hedge"
+            pending = {attempt for attempt in attempts if not attempt.done()}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                answered = [attempt for attempt in done if _answered(attempt)]
+                if answered:
+                    llm_hedges.labels(attempts[answered[0]]).inc()
+                    return answered[0].result()
+            # Both failed: surface the primary's outcome
+            return first.result()
+        finally:
+            # Also runs when the caller is cancelled; a cancelled attempt's
+            # connection is closed, so its backend stops generating
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+
+def _answered(attempt: asyncio.Future) -> bool:
+    """Whether a finished attempt got a response that is not a server error."""
+    return attempt.exception() is None and attempt.result().status_code < 500
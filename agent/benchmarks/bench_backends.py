@@ -0,0 +1,204 @@
+"""
+Multi-backend benchmark: routing-call latency with and without hedging, and ejection.
+
+Starts several stand-in LLMs. Each one makes a share of its requests
+(--tail-ratio) wait an extra --tail-ms, like a local server that is busy
+prefilling someone else's long prompt. Concurrent supervisor routing calls go
+through the model registry, balanced over all stand-ins (OPENAI_BASE_URLS):
+- hedging off: every call waits for its backend, tail included
+- hedging on (LLM_HEDGE_ROUTING): a call still running after the hedge delay
+  is duplicated to another backend, and the first answer wins
+
+Then one stand-in is stopped mid-benchmark. Its connection errors are retried
+on another backend, and it is ejected after LLM_EJECT_AFTER_FAILURES failures.
+
+Last, hedged routing with an extra stand-in that answers every request with a
+503 at once and is never ejected: those calls should go straight to the hedge
+backend, not wait for the delay or the client's retry backoff. Callers that
+give up before the hedge delay must leave no request in flight.
+
+Run from the agent directory:
+    uv run python -m benchmarks.bench_backends --backends 3 --calls 600
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+from benchmarks.loadgen import percentile
+from benchmarks.standin_llm import StandinConfig, StandinLLM, StandinServer
+from llm import ModelRegistry
+from metrics import backend_ejections, current_node, llm_hedges
+from response_cache import response_cache
+
+
+async def route_calls(registry: ModelRegistry, urls: List[str], calls: int, concurrency: int) -> Dict[str, Any]:
+    model = registry.get_model("supervisor", urls)
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(calls))
+
+    async def worker():
+        nonlocal errors
+        # Marks the calls as routing calls, like supervisor_node does
+        current_node.set("supervisor_node")
+        for call in remaining:
+            start = time.perf_counter()
+            try:
+                await model.ainvoke([("user", f"Which agent handles request {call}?")])
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "calls_per_sec": calls / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": errors,
+    }
+
+
+async def run_mode(hedge: bool, servers: List[StandinServer], args) -> Dict[str, Any]:
+    os.environ["LLM_HEDGE_ROUTING"] = "true" if hedge else "false"
+    urls = [f"{server.url}/v1" for server in servers]
+    registry = ModelRegistry()
+    hedges_before = llm_hedges.labels("hedge").value
+    served_before = [server.llm.requests for server in servers]
+    try:
+        result = await route_calls(registry, urls, args.calls, args.concurrency)
+    finally:
+        await registry.aclose()
+    result["hedge_wins"] = llm_hedges.labels("hedge").value - hedges_before
+    result["served"] = [server.llm.requests - before for server, before in zip(servers, served_before)]
+    return result
+
+
+async def run_ejection(servers: List[StandinServer], args) -> Dict[str, Any]:
+    os.environ["LLM_HEDGE_ROUTING"] = "false"
+    urls = [f"{server.url}/v1" for server in servers]
+    registry = ModelRegistry()
+    victim = servers[-1]
+    ejections_before = backend_ejections.labels(urls[-1]).value
+    served_before = [server.llm.requests for server in servers]
+    try:
+        # Warm every pool, then take the last backend down
+        await route_calls(registry, urls, len(servers) * 2, len(servers))
+        await asyncio.to_thread(victim.stop)
+        result = await route_calls(registry, urls, args.calls // 2, args.concurrency)
+        result["health"] = registry.pool(urls[-1]).health.snapshot(time.monotonic())
+    finally:
+        await registry.aclose()
+    result["ejections"] = backend_ejections.labels(urls[-1]).value - ejections_before
+    result["served"] = [server.llm.requests - before for server, before in zip(servers, served_before)]
+    return result
+
+
+async def run_failover(servers: List[StandinServer], args) -> Dict[str, Any]:
+    failing = StandinServer(StandinLLM(StandinConfig(response_text="email", error_ratio=1.0))).start()
+    hedge_delay_ms = 4 * args.ttft_ms
+    # Keep the failing backend in rotation, so every call that picks it fails fast
+    os.environ.update(
+        LLM_HEDGE_ROUTING="true",
+        LLM_HEDGE_DELAY_MS=str(hedge_delay_ms),
+        LLM_EJECT_AFTER_FAILURES=str(args.calls),
+    )
+    urls = [f"{server.url}/v1" for server in (*servers, failing)]
+    registry = ModelRegistry()
+    hedges_before = llm_hedges.labels("hedge").value
+    served_before = [server.llm.requests for server in (*servers, failing)]
+
+    async def give_up(call: int) -> bool:
+        current_node.set("supervisor_node")
+        try:
+            await asyncio.wait_for(
+                registry.get_model("supervisor", urls).ainvoke([("user", f"Which agent handles request {call}?")]),
+                timeout=args.ttft_ms / 2000,
+            )
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    try:
+        result = await route_calls(registry, urls, args.calls // 2, args.concurrency)
+        result["hedge_wins"] = llm_hedges.labels("hedge").value - hedges_before
+        result["served"] = [
+            server.llm.requests - before for server, before in zip((*servers, failing), served_before)
+        ]
+        result["gave_up"] = sum(await asyncio.gather(*(give_up(call) for call in range(args.concurrency))))
+        # Cancelled attempts release their slots as they unwind
+        await asyncio.sleep(0.05)
+        result["left_in_flight"] = sum(registry.pool(url).scheduler.in_flight for url in urls)
+    finally:
+        await registry.aclose()
+        for name in ("LLM_HEDGE_DELAY_MS", "LLM_EJECT_AFTER_FAILURES"):
+            os.environ.pop(name, None)
+        failing.stop()
+    return result
+
+
+def print_mode(name: str, r: Dict[str, Any]):
+    print(
+        f"{name:<12}{r['calls_per_sec']:>9.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+        f"{r['errors']:>8}{r.get('hedge_wins', 0):>7}   {r['served']}"
+    )
+
+
+async def bench(args):
+    # Every call has to reach a backend; repeated prompts would be answered from the cache
+    response_cache.mode = "off"
+    servers = [
+        StandinServer(
+            StandinLLM(
+                StandinConfig(
+                    ttft_ms=args.ttft_ms,
+                    tokens_per_sec=2000.0,
+                    response_text="email",
+                    tail_ratio=args.tail_ratio,
+                    tail_ms=args.tail_ms,
+                )
+            )
+        ).start()
+        for _ in range(args.backends)
+    ]
+    try:
+        print(f"{'hedging':<12}{'calls/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'hedges':>7}   served per backend")
+        for hedge in (False, True):
+            print_mode("on" if hedge else "off", await run_mode(hedge, servers, args))
+
+        result = await run_ejection(servers, args)
+        print(f"\nbackend {args.backends} stopped:")
+        print_mode("off", result)
+        print(f"ejections: {result['ejections']}, health: {result['health']}")
+
+        result = await run_failover(servers[:-1], args)
+        print("\nextra backend failing every request with a 503:")
+        print_mode("on", result)
+        print(f"callers that gave up: {result['gave_up']}, requests left in flight: {result['left_in_flight']}")
+    finally:
+        for server in servers:
+            server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", type=int, default=3)
+    parser.add_argument("--calls", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ttft-ms", type=float, default=40.0)
+    parser.add_argument("--tail-ratio", type=float, default=0.05)
+    parser.add_argument("--tail-ms", type=float, default=1000.0)
+    args = parser.parse_args()
+    if args.backends < 2:
+        parser.error("--backends must be at least 2")
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
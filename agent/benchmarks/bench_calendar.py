@@ -0,0 +1,131 @@
+"""
+Calendar store benchmark: conflict checks and free-slot search at organisation scale.
+
+Generates a year of meetings for N participants (2-6 people each, on
+workdays), bulk-loads them into a CalendarStore backed by a SQLite file, then
+reports:
+- load: bulk insert and index time, file size, and cold reload from the file
+- conflicts: latency of check_calendar_conflicts-style queries for 1-5
+  participants over a one-hour window, against a linear scan of the same
+  calendars
+- free slots: merged busy sweep for 5 participants over one workday
+
+Run from the agent directory:
+    uv run python -m benchmarks.bench_calendar --participants 10000 --days 365
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from calendar_store import CalendarStore, Event
+
+DAY = 86400
+HOUR = 3600
+
+
+def generate(participants: List[str], days: int, meetings_per_day: float, start: int) -> List[Event]:
+    """Meetings between 08:00 and 18:00 UTC on workdays, 30-90 minutes long."""
+    rng = random.Random(42)
+    per_day = int(len(participants) * meetings_per_day / 4)
+    events = []
+    for day in range(days):
+        day_start = start + day * DAY
+        if datetime.fromtimestamp(day_start, timezone.utc).weekday() >= 5:
+            continue
+        for n in range(per_day):
+            begin = day_start + 8 * HOUR + rng.randrange(0, 37) * 900
+            length = rng.choice((1800, 1800, 3600, 3600, 5400))
+            people = tuple(rng.sample(participants, rng.randint(2, 6)))
+            events.append(Event(f"evt_{day}_{n}", "Meeting", begin, begin + length, people))
+    return events
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+        "mean_us": sum(samples) / len(samples) * 1e6,
+    }
+
+
+def timed(queries: List, run: Callable) -> List[float]:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        run(*query)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--participants", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--meetings-per-day", type=float, default=2.0, help="per participant, on workdays")
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+
+    participants = [f"user{i}@example.com" for i in range(args.participants)]
+    year_start = int(datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp())
+
+    started = time.perf_counter()
+    events = generate(participants, args.days, args.meetings_per_day, year_start)
+    print(f"generated {len(events):,} events in {time.perf_counter() - started:.1f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "calendar.sqlite")
+        store = CalendarStore(path, tz="UTC")
+        started = time.perf_counter()
+        store.add_events(events)
+        stats = store.stats()
+        print(
+            f"loaded {stats['entries']:,} participant entries in {time.perf_counter() - started:.1f}s, "
+            f"file {os.path.getsize(path) / 1e6:.0f} MB"
+        )
+        del events
+        store.close()
+
+        store = CalendarStore(path, tz="UTC")
+        started = time.perf_counter()
+        store.stats()
+        print(f"reloaded from file in {time.perf_counter() - started:.1f}s")
+
+        rng = random.Random(7)
+        queries = []
+        for _ in range(args.queries):
+            begin = year_start + rng.randrange(args.days) * DAY + 8 * HOUR + rng.randrange(0, 37) * 900
+            queries.append((rng.sample(participants, rng.randint(1, 5)), begin, begin + HOUR))
+
+        # First touch of each calendar builds its tree; measure warm queries
+        for people, begin, end in queries:
+            store.conflicts(people, begin, end)
+
+        def scan(people, begin, end):
+            for person in people:
+                calendar = store._calendars[person]
+                [i for i in range(len(calendar)) if calendar.starts[i] < end and begin < calendar.ends[i]]
+
+        matches = sum(sum(map(len, store.conflicts(*q).values())) for q in queries) / len(queries)
+        print(f"\nconflict checks (1-5 participants, 1 hour), {matches:.2f} matches per query:")
+        print(f"{'':<14}{'p50 us':>10}{'p99 us':>10}{'mean us':>10}")
+        for name, run in (("interval tree", store.conflicts), ("linear scan", scan)):
+            r = percentiles(timed(queries, run))
+            print(f"{name:<14}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}{r['mean_us']:>10.1f}")
+
+        slot_queries = []
+        for _ in range(args.queries // 10):
+            day_start = year_start + rng.randrange(args.days) * DAY
+            slot_queries.append((rng.sample(participants, 5), day_start + 9 * HOUR, day_start + 17 * HOUR, HOUR))
+        r = percentiles(timed(slot_queries, store.free_slots))
+        print(f"\nfree slots (5 participants, one workday): p50 {r['p50_us']:.1f} us, p99 {r['p99_us']:.1f} us")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
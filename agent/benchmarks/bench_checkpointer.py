@@ -0,0 +1,134 @@
+"""
+Checkpointer benchmark: write latency and on-disk size as threads grow.
+
+Runs a small chat-shaped graph (messages + logs, no LLM) for N threads x M
+turns against SqliteCompactingSaver, once with compaction and compression and
+once keeping every checkpoint uncompressed, and reports per-put latency
+percentiles, the database size and the rows left after each batch of threads.
+A third run puts the reply node in a subgraph, as a specialist's agent is:
+each turn checkpoints under a new namespace, and compaction must drop them.
+
+Run from the agent directory:
+    uv run python -m benchmarks.bench_checkpointer --threads 200 --turns 20
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, StateGraph
+
+from checkpointing import SqliteCompactingSaver
+from state import AgentState
+
+
+def reply(state: AgentState) -> Dict[str, Any]:
+    turn = len(state["messages"])
+    return {
+        "messages": [AIMessage(id=str(uuid.uuid4()), content=f"Reply {turn}: " + "lorem ipsum " * 40)],
+        "logs": [{"id": str(uuid.uuid4()), "message": "✅ Replied", "done": True}],
+    }
+
+
+class TimedSaver(SqliteCompactingSaver):
+    """Records the wall time of every checkpoint write."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.put_seconds: List[float] = []
+
+    def put(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().put(*args, **kwargs)
+        finally:
+            self.put_seconds.append(time.perf_counter() - start)
+
+
+def db_size(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def rows(saver: SqliteCompactingSaver) -> Dict[str, int]:
+    return {
+        "checkpoints": saver.conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0],
+        "namespaces": saver.conn.execute(
+            "SELECT COUNT(*) FROM (SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints)"
+        ).fetchone()[0],
+        "blobs": saver.conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0],
+    }
+
+
+def run(label: str, threads: int, turns: int, keep_last: int, compression_level: int, subgraph: bool = False):
+    path = os.path.join(tempfile.mkdtemp(), "bench.sqlite")
+    saver = TimedSaver(path=path, keep_last=keep_last, compression_level=compression_level)
+    node: Any = reply
+    if subgraph:
+        inner = StateGraph(AgentState)
+        inner.add_node("reply", reply)
+        inner.set_entry_point("reply")
+        inner.add_edge("reply", END)
+        node = inner.compile()
+    workflow = StateGraph(AgentState)
+    workflow.add_node("reply", node)
+    workflow.set_entry_point("reply")
+    workflow.add_edge("reply", END)
+    graph = workflow.compile(checkpointer=saver)
+
+    print(f"\n{label} (keep_last={keep_last}, compression={compression_level})")
+    print(
+        f"{'threads':>8} {'puts':>8} {'p50 ms':>8} {'p99 ms':>8} {'db MB':>8} "
+        f"{'ckpts':>8} {'ns':>6} {'blobs':>8}"
+    )
+    report_every = max(1, threads // 5)
+    for thread in range(1, threads + 1):
+        config = {"configurable": {"thread_id": f"thread-{thread}"}}
+        for turn in range(turns):
+            graph.invoke(
+                {"messages": [HumanMessage(id=str(uuid.uuid4()), content=f"Message {turn}")]},
+                config,
+            )
+        if thread % report_every == 0 or thread == threads:
+            samples = saver.put_seconds
+            saver.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            left = rows(saver)
+            print(
+                f"{thread:>8} {len(samples):>8} {percentile(samples, 0.5) * 1e3:>8.2f} "
+                f"{percentile(samples, 0.99) * 1e3:>8.2f} {db_size(path) / 1e6:>8.2f} "
+                f"{left['checkpoints']:>8} {left['namespaces']:>6} {left['blobs']:>8}"
+            )
+    print(f"{'':>8} mean put: {statistics.mean(saver.put_seconds) * 1e3:.2f} ms")
+    saver.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--keep-last", type=int, default=int(os.getenv("CHECKPOINT_KEEP_LAST", "20")))
+    args = parser.parse_args()
+
+    run("full history, uncompressed", args.threads, args.turns, keep_last=0, compression_level=0)
+    run("compacting, compressed", args.threads, args.turns, keep_last=args.keep_last, compression_level=6)
+    run(
+        "compacting, reply in a subgraph",
+        args.threads,
+        args.turns,
+        keep_last=args.keep_last,
+        compression_level=6,
+        subgraph=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Free/busy benchmark: common-slot search for large meetings over a four-week window.
+
+Builds an in-memory calendar of N participants spread over a few time zones
+(each with 09:00-17:00 local working hours), with meetings on workdays. Then,
+for group sizes from 5 to all N, it times FreeBusySearch.search for the top 5
+one-hour slots over the four weeks:
+- cold: every participant's bitmap is built from their interval index
+- warm: bitmaps come from the cache, so the search is the AND, the run scan
+  and ranking
+and compares it with the interval sweep (merged busy intervals, per workday),
+which ignores time zones and working hours and only finds gaps.
+
+Run from the agent directory:
+    uv run python -m benchmarks.bench_freebusy --participants 500 --weeks 4
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+
+from calendar_store import CalendarStore, Event
+from freebusy import FreeBusySearch
+
+DAY = 86400
+TIMEZONES = ("Europe/London", "Europe/Berlin", "America/New_York", "Asia/Kolkata")
+
+
+def build(participants: List[str], weeks: int, meetings_per_day: float, start: int) -> CalendarStore:
+    rng = random.Random(11)
+    store = CalendarStore(":memory:", tz="UTC")
+    for participant in participants:
+        store.set_working_hours(participant, rng.choice(TIMEZONES), "09:00-17:00")
+    events = []
+    per_day = int(len(participants) * meetings_per_day / 4)
+    for day in range(weeks * 7):
+        day_start = start + day * DAY
+        if datetime.fromtimestamp(day_start, timezone.utc).weekday() >= 5:
+            continue
+        for n in range(per_day):
+            begin = day_start + rng.randrange(4 * 4, 22 * 4) * 900
+            length = rng.choice((1800, 3600, 3600, 5400))
+            people = tuple(rng.sample(participants, rng.randint(2, 6)))
+            events.append(Event(f"evt_{day}_{n}", "Meeting", begin, begin + length, people))
+    store.add_events(events)
+    return store
+
+
+def median_ms(run: Callable, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--participants", type=int, default=500)
+    parser.add_argument("--weeks", type=int, default=4)
+    parser.add_argument("--meetings-per-day", type=float, default=3.0, help="per participant, on workdays")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    participants = [f"user{i}@example.com" for i in range(args.participants)]
+    window_start = int(datetime(2026, 11, 2, tzinfo=timezone.utc).timestamp())
+    window_end = window_start + args.weeks * 7 * DAY
+    store = build(participants, args.weeks, args.meetings_per_day, window_start)
+    print(f"{store.stats()['events']:,} events for {args.participants} participants over {args.weeks} weeks\n")
+
+    sizes = sorted({size for size in (5, 25, 100, args.participants) if size <= args.participants})
+    print(f"{'group':>6}{'cold ms':>10}{'warm ms':>10}{'sweep ms':>10}   best slot")
+    for size in sizes:
+        group = random.Random(size).sample(participants, size)
+
+        def cold():
+            FreeBusySearch(store).search(group, window_start, window_end, 3600)
+
+        search = FreeBusySearch(store)
+        slots = search.search(group, window_start, window_end, 3600)
+
+        def warm():
+            search.search(group, window_start, window_end, 3600)
+
+        def sweep():
+            day = datetime.fromtimestamp(window_start, timezone.utc).date()
+            for offset in range(args.weeks * 7):
+                current = day + timedelta(days=offset)
+                if current.weekday() < 5:
+                    store.free_slots(group, *store.workday_bounds(current), 3600)
+
+        if slots:
+            best = slots[0]
+            found = datetime.fromtimestamp(best.start, timezone.utc).strftime("%a %d %b %H:%M UTC")
+            if best.missing:
+                found += f", {size - len(best.missing)}/{size} free"
+        else:
+            found = "none"
+        print(
+            f"{size:>6}{median_ms(cold, args.repeat):>10.2f}{median_ms(warm, args.repeat):>10.2f}"
+            f"{median_ms(sweep, args.repeat):>10.2f}   {found}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+End-to-end latency and token usage: supervisor topology vs collapsed mode.
+
+Runs the same scripted conversations through both graphs against the
+stand-in LLM and reports per-request latency, LLM calls and total tokens.
+
+Run from the agent directory:
+    uv run python -m benchmarks.bench_graph_modes
+    uv run python -m benchmarks.bench_graph_modes --no-fast-path
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Dict, List
+
+from langchain_core.callbacks import get_usage_metadata_callback
+from langchain_core.messages import HumanMessage
+
+from benchmarks.standin_llm import StandinConfig, StandinLLM, StandinServer
+
+CONVERSATIONS: List[List[str]] = [
+    [
+        "Schedule a sync with the design team tomorrow at 10am",
+        "Email the attendees the agenda",
+        "Actually move it to Thursday",
+    ],
+    [
+        "Find the onboarding document and summarize it",
+        "Compare it with last year's version",
+    ],
+    [
+        "Can you set up a call with Dana on Friday afternoon?",
+        "Let her know about it",
+        "What did the security review conclude?",
+    ],
+    [
+        "Archive the newsletter thread",
+        "Draft a reply to the vendor about pricing",
+    ],
+]
+
+
+def build_graph(mode: str):
+    """Compile a fresh graph for the given topology."""
+    from langgraph.checkpoint.memory import MemorySaver
+
+    import main_graph
+    from agents.collapsed_agent import CollapsedAgent
+    from agents.email_agent import EmailAgent
+    from agents.research_agent import ResearchAgent
+    from agents.scheduler_agent import SchedulerAgent
+    from supervisor import SupervisorAgent
+
+    if mode == "collapsed":
+        workflow = main_graph.build_collapsed_workflow(CollapsedAgent())
+    else:
+        workflow = main_graph.build_supervisor_workflow(
+            SupervisorAgent(), EmailAgent(), SchedulerAgent(), ResearchAgent()
+        )
+    return workflow.compile(checkpointer=MemorySaver())
+
+
+async def run_mode(mode: str, llm: StandinLLM) -> Dict[str, float]:
+    graph = build_graph(mode)
+    latencies = []
+    requests_before = llm.requests
+    with get_usage_metadata_callback() as usage:
+        for index, conversation in enumerate(CONVERSATIONS):
+            config = {"configurable": {"thread_id": f"{mode}-{index}"}}
+            for text in conversation:
+                start = time.perf_counter()
+                await graph.ainvoke({"messages": [HumanMessage(content=text)]}, config)
+                latencies.append(time.perf_counter() - start)
+
+    total_tokens = sum(model_usage.get("total_tokens", 0) for model_usage in usage.usage_metadata.values())
+    return {
+        "requests": len(latencies),
+        "llm_calls": llm.requests - requests_before,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "total_tokens": total_tokens,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-latency-ms", type=float, default=150.0)
+    parser.add_argument(
+        "--no-fast-path",
+        action="store_true",
+        help="disable the local router so every supervisor turn calls the LLM",
+    )
+    args = parser.parse_args()
+    if args.no_fast_path:
+        os.environ["FAST_ROUTE_THRESHOLD"] = "1.1"
+
+    llm = StandinLLM(StandinConfig(base_latency_ms=args.base_latency_ms, response_text="Done."))
+    with StandinServer(llm) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "standin"
+        results = {mode: await run_mode(mode, llm) for mode in ("supervisor", "collapsed")}
+
+    print(f"{'mode':<12}{'requests':>9}{'llm calls':>11}{'mean ms':>10}{'p50 ms':>10}{'max ms':>10}{'tokens':>10}")
+    for mode, r in results.items():
+        print(
+            f"{mode:<12}{r['requests']:>9}{r['llm_calls']:>11}{r['mean_ms']:>10.1f}"
+            f"{r['p50_ms']:>10.1f}{r['max_ms']:>10.1f}{r['total_tokens']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+"""
+Mailbox benchmark: thread operations on a large mbox through its index.
+
+Writes an mbox of --messages messages in threads of 1-12 replies (References
+and In-Reply-To chains), then reports:
+- index: cold build time over the memory-mapped file, index size, peak RSS
+  against the file size, and the no-op check on reopening
+- append: indexing mail appended since the last access
+- thread operations: fetch (headers and bodies), mark-read and archive latency
+  for random threads, against one scan of the mapped file for a thread's root
+  Message-ID (a lower bound for any unindexed lookup)
+
+Run from the agent directory:
+    uv run python -m benchmarks.bench_mailbox --messages 1000000
+"""
+
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+from email.utils import formatdate
+from typing import Callable, Dict, List
+
+from mailbox_store import Mailbox, thread_id_of
+
+_BODY = (
+    "Hi,\n\nFollowing up on the points from yesterday. The draft is attached and the\n"
+    "numbers in section 3 are updated. Let me know if anything is missing.\n\nThanks\n"
+)
+
+
+def write_mbox(path: str, messages: int, start: int, seed: int = 42, first_thread: int = 0) -> List[str]:
+    """Append `messages` messages in threads; returns the thread ids."""
+    rng = random.Random(seed)
+    threads = []
+    written = 0
+    thread = first_thread
+    with open(path, "ab", buffering=1 << 20) as out:
+        while written < messages:
+            size = min(rng.randint(1, 12), messages - written)
+            root = f"<t{thread}.0@bench.example>"
+            threads.append(thread_id_of(root.encode()))
+            references = []
+            for reply in range(size):
+                date = start + thread * 60 + reply * 3600
+                message_id = f"<t{thread}.{reply}@bench.example>"
+                headers = [
+                    f"From user{thread % 997}@bench.example {time.asctime(time.gmtime(date))}",
+                    f"From: User {thread % 997} <user{thread % 997}@bench.example>",
+                    "To: team@bench.example",
+                    f"Subject: {'Re: ' if reply else ''}Project update {thread}",
+                    f"Date: {formatdate(date)}",
+                    f"Message-ID: {message_id}",
+                ]
+                if references:
+                    headers.append(f"In-Reply-To: {references[-1]}")
+                    # The root stays first, as mail clients trim long chains from the middle
+                    kept = references if len(references) <= 5 else [references[0], *references[-4:]]
+                    headers.append(f"References: {' '.join(kept)}")
+                out.write(("\n".join(headers) + "\n\n" + _BODY + "\n").encode())
+                references.append(message_id)
+            written += size
+            thread += 1
+    return threads
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+    }
+
+
+def timed(threads: List[str], run: Callable) -> Dict[str, float]:
+    timings = []
+    for thread_id in threads:
+        started = time.perf_counter()
+        run(thread_id)
+        timings.append(time.perf_counter() - started)
+    return percentiles(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--append", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "inbox.mbox")
+        started = time.perf_counter()
+        threads = write_mbox(path, args.messages, start=1_767_225_600)
+        size = os.path.getsize(path)
+        print(
+            f"wrote {args.messages:,} messages in {len(threads):,} threads, "
+            f"{size / 1e6:.0f} MB, in {time.perf_counter() - started:.1f}s"
+        )
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        box = Mailbox(path)
+        started = time.perf_counter()
+        stats = box.stats()
+        build = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(
+            f"indexed {stats['messages']:,} messages / {stats['threads']:,} threads in {build:.1f}s, "
+            f"index {os.path.getsize(box.index_path) / 1e6:.0f} MB, "
+            f"peak RSS +{(rss_after - rss_before) / 1024:.0f} MB (mapped file pages included)"
+        )
+        box.close()
+
+        box = Mailbox(path)
+        started = time.perf_counter()
+        box.fetch_thread(threads[0], bodies=False)
+        print(f"reopened and fetched a thread (nothing new to index) in {(time.perf_counter() - started) * 1e3:.1f} ms")
+
+        threads += write_mbox(path, args.append, start=1_800_000_000, seed=7, first_thread=len(threads) + 1)
+        started = time.perf_counter()
+        box.fetch_thread(threads[0], bodies=False)
+        print(f"indexed {args.append:,} appended messages in {(time.perf_counter() - started) * 1e3:.0f} ms")
+
+        rng = random.Random(3)
+        sample = [rng.choice(threads) for _ in range(args.queries)]
+        sizes = [len(box.fetch_thread(thread_id, bodies=False)) for thread_id in sample[:200]]
+        print(f"\nthread operations ({sum(sizes) / len(sizes):.1f} messages per thread):")
+        print(f"{'':<18}{'p50 us':>10}{'p99 us':>10}")
+        for name, run in (
+            ("fetch headers", lambda t: box.fetch_thread(t, bodies=False)),
+            ("fetch bodies", box.fetch_thread),
+            ("mark read", box.mark_read),
+            ("archive", box.archive),
+        ):
+            r = timed(sample, run)
+            print(f"{name:<18}{r['p50_us']:>10.0f}{r['p99_us']:>10.0f}")
+
+        # Unindexed: find every message referring to one root by scanning the map
+        mm = box._map()
+        root = b"<t%d.0@bench.example>" % (len(threads) // 2)
+        started = time.perf_counter()
+        hits, position = 0, mm.find(root)
+        while position >= 0:
+            hits += 1
+            position = mm.find(root, position + 1)
+        scan = time.perf_counter() - started
+        print(f"{'scan for a root':<18}{scan * 1e6:>10.0f}  ({hits} hits, one pass over {size / 1e6:.0f} MB)")
+        box.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Outbox benchmark: enqueue latency, delivery throughput and scheduled-send lateness.
+
+Starts a stand-in SMTP server whose connections cost --connect-ms to set up
+(handshake and AUTH to a remote relay) and which defers a share of recipients
+with 451. Tool-side enqueue latency is measured from worker threads, as the
+tools run. Then --messages messages to --domains domains are drained by the
+outbox worker:
+- per message: a fresh connection per message (batch size 1, no reuse)
+- pooled: batches per domain over reused connections
+
+Deferred recipients are retried with a short backoff, so both modes end with
+every message sent. Finally, messages scheduled a few seconds ahead measure
+how late the timer wheel releases them.
+
+Run from the agent directory:
+    uv run python -m benchmarks.bench_outbox --messages 5000 --domains 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.standin_smtp import SMTPConfig, StandinSMTP, StandinSMTPServer
+from outbox import Outbox
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def addresses(count: int, domains: int) -> List[str]:
+    rng = random.Random(42)
+    return [f"user{i}@domain{rng.randrange(domains)}.example" for i in range(count)]
+
+
+async def drain(outbox: Outbox, total: int, timeout: float) -> float:
+    """Seconds until `total` messages have been sent."""
+    started = time.perf_counter()
+    while outbox.counts["sent"] < total:
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError(f"only {outbox.counts['sent']} of {total} sent")
+        await asyncio.sleep(0.02)
+    return time.perf_counter() - started
+
+
+async def run_mode(
+    name: str, port: int, smtp: StandinSMTP, recipients: List[str], args: argparse.Namespace, **settings
+) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = Outbox(
+            os.path.join(tmp, "outbox.sqlite"),
+            route=("127.0.0.1", port),
+            routes={},
+            connections=args.connections,
+            retry_base_seconds=0.2,
+            tick_seconds=0.1,
+            **settings,
+        )
+        # Queue everything first, then measure the drain alone
+        for recipient in recipients:
+            outbox.enqueue(recipient, "Benchmark", "Hello from the outbox benchmark.")
+        opened, deferred = smtp.connections, smtp.deferred
+        worker = asyncio.create_task(outbox.run())
+        seconds = await drain(outbox, len(recipients), args.timeout)
+        await outbox.stop()
+        await worker
+        outbox.close()
+    return {
+        "mode": name,
+        "seconds": seconds,
+        "per_second": len(recipients) / seconds,
+        "connections": smtp.connections - opened,
+        "deferred": smtp.deferred - deferred,
+        "batches": outbox.counts["batches"],
+    }
+
+
+async def enqueue_latency(recipients: List[str], threads: int) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = Outbox(os.path.join(tmp, "outbox.sqlite"), route=None, routes={})
+        timings: List[float] = []
+
+        def enqueue(recipient: str):
+            started = time.perf_counter()
+            outbox.enqueue(recipient, "Benchmark", "Hello from the outbox benchmark.")
+            timings.append(time.perf_counter() - started)
+
+        semaphore = asyncio.Semaphore(threads)
+
+        async def call(recipient: str):
+            async with semaphore:
+                await asyncio.to_thread(enqueue, recipient)
+
+        await asyncio.gather(*(call(recipient) for recipient in recipients))
+        outbox.close()
+    return {"p50_ms": percentile(timings, 0.5) * 1e3, "p99_ms": percentile(timings, 0.99) * 1e3}
+
+
+async def scheduled_lateness(port: int, count: int, args: argparse.Namespace) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = Outbox(
+            os.path.join(tmp, "outbox.sqlite"), route=("127.0.0.1", port), routes={}, connections=args.connections
+        )
+        worker = asyncio.create_task(outbox.run())
+        now = time.time()
+        rng = random.Random(7)
+        ids = []
+        for recipient in addresses(count, args.domains):
+            ids.extend(outbox.enqueue(recipient, "Later", "Scheduled.", send_at=now + 2 + rng.random() * 2))
+        await drain(outbox, count, args.timeout)
+        await outbox.stop()
+        await worker
+        rows = [outbox.get(message_id) for message_id in ids]
+        outbox.close()
+    lateness = [row["sent_at"] - row["send_at"] for row in rows]
+    return {"p50_ms": percentile(lateness, 0.5) * 1e3, "p99_ms": percentile(lateness, 0.99) * 1e3}
+
+
+async def main_async(args: argparse.Namespace):
+    recipients = addresses(args.messages, args.domains)
+
+    latency = await enqueue_latency(recipients[: min(len(recipients), 2000)], threads=8)
+    print(f"enqueue from 8 tool threads: p50 {latency['p50_ms']:.2f} ms, p99 {latency['p99_ms']:.2f} ms")
+
+    smtp = StandinSMTP(SMTPConfig(args.connect_ms, args.message_ms, args.defer_ratio))
+    with StandinSMTPServer(smtp) as server:
+        results = [
+            await run_mode("per message", server.port, smtp, recipients, args, batch_size=1, idle_seconds=0),
+            await run_mode("pooled", server.port, smtp, recipients, args, batch_size=args.batch_size),
+        ]
+        print(
+            f"\n{args.messages:,} messages to {args.domains} domains, {args.connections} connections, "
+            f"connect {args.connect_ms:.0f} ms, {args.defer_ratio:.0%} deferred:"
+        )
+        print(f"{'':<13}{'seconds':>9}{'msg/s':>9}{'conns':>8}{'deferred':>10}{'batches':>9}")
+        for r in results:
+            print(
+                f"{r['mode']:<13}{r['seconds']:>9.2f}{r['per_second']:>9.0f}{r['connections']:>8}"
+                f"{r['deferred']:>10}{r['batches']:>9}"
+            )
+
+        late = await scheduled_lateness(server.port, args.scheduled, args)
+        print(f"\n{args.scheduled} scheduled sends, lateness: p50 {late['p50_ms']:.0f} ms, p99 {late['p99_ms']:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--domains", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--connections", type=int, default=4, help="per route")
+    parser.add_argument("--connect-ms", type=float, default=50.0)
+    parser.add_argument("--message-ms", type=float, default=2.0)
+    parser.add_argument("--defer-ratio", type=float, default=0.02)
+    parser.add_argument("--scheduled", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Time-to-first-token with and without prefix reuse for supervisor prompts.
+
+Compares the legacy layout (volatile state embedded in the middle of the system
+prompt) against PromptBuilder (static prefix + trailing context) on the
+prefix-caching stand-in server. Two more layouts window the history to the
+supervisor's token budget, with a rolling summary written by a stand-in
+summarizer every CONTEXT_KEEP_TURNS turns:
+- sliding window: the summary first, then the newest turns that fit (the
+  window drops its oldest turn on every turn once the budget is reached)
+- stepped window: ContextManager.window, whose start moves in steps of
+  CONTEXT_KEEP_TURNS turns, with the summary in the trailing context
+
+Run from the agent directory:
+    uv run python -m benchmarks.bench_prefix_cache --turns 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from benchmarks.standin_llm import StandinConfig, StandinLLM, StandinServer
+from context_window import ContextManager, estimate_tokens, split_turns
+from prompts import PromptBuilder
+from supervisor import SUPERVISOR_PROMPT, supervisor_context
+
+USER_TURNS = [
+    "Schedule a sync with the design team tomorrow afternoon",
+    "Email the attendees the agenda for that sync",
+    "Find the latest roadmap document and summarize it",
+    "Move the sync to Thursday at 3pm",
+    "Compare the Q2 and Q3 planning docs",
+]
+
+
+def legacy_prompt(state: dict, now: datetime) -> List[BaseMessage]:
+    """The pre-PromptBuilder layout: state and a seconds timestamp inside the system prompt."""
+    head, tail = SUPERVISOR_PROMPT.split("ROUTING INSTRUCTIONS:")
+    state_block = (
+        "Current system state:\n"
+        f"- Active task: {state.get('current_task', 'New request')}\n"
+        f"- Events scheduled: {len(state.get('scheduled_events', []))}\n"
+        f"- Emails processed: {len(state.get('recent_emails', []))}\n"
+        f"- Research items: {len(state.get('research_results', []))}\n"
+        f"- Current time: {now.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    )
+    system = SystemMessage(content=head + state_block + "ROUTING INSTRUCTIONS:" + tail)
+    return [system, *state["messages"]]
+
+
+def sliding_window(manager: ContextManager, state: Dict[str, Any], role: str) -> List[BaseMessage]:
+    """The earlier window: summary first, then the newest whole turns within the budget."""
+    messages = state["messages"]
+    recent = manager.unsummarized(state, messages)
+    summary = manager.summary_message(state) if len(recent) < len(messages) else None
+    remaining = manager.budget(role) - (estimate_tokens([summary]) if summary else 0)
+    kept: List[List[BaseMessage]] = []
+    for turn in reversed(split_turns(recent)):
+        cost = estimate_tokens(turn)
+        if kept and cost > remaining:
+            break
+        kept.insert(0, turn)
+        remaining -= cost
+    return ([summary] if summary else []) + [m for turn in kept for m in turn]
+
+
+class StandinSummarizer:
+    """Deterministic summary of the folded turns, in place of the summarizer model."""
+
+    async def ainvoke(self, prompt: List[BaseMessage]) -> AIMessage:
+        requests = [line[6:] for line in prompt[-1].content.splitlines() if line.startswith("User: ")]
+        return AIMessage(content="The user asked to: " + "; ".join(requests) + ". " + "All done. " * 40)
+
+
+class CountingLLM(StandinLLM):
+    """Stand-in that totals prompt and cache-hit tokens."""
+
+    def __init__(self, config: StandinConfig):
+        super().__init__(config)
+        self.prompt_tokens = self.cached_tokens = 0
+
+    def prefill(self, body: Dict[str, Any]) -> Dict[str, int]:
+        usage = super().prefill(body)
+        self.prompt_tokens += usage["prompt_tokens"]
+        self.cached_tokens += usage["cached_tokens"]
+        return usage
+
+
+async def time_to_first_token(model: ChatOpenAI, prompt: List[BaseMessage]) -> float:
+    start = time.perf_counter()
+    async for _ in model.astream(prompt):
+        return time.perf_counter() - start
+    return time.perf_counter() - start
+
+
+async def run_layout(base_url: str, layout: str, turns: int) -> List[float]:
+    model = ChatOpenAI(model="standin", base_url=base_url, api_key="standin", max_tokens=8)
+    builder = PromptBuilder(SUPERVISOR_PROMPT, supervisor_context)
+    manager = ContextManager()
+    manager._model = StandinSummarizer()
+    state = {"messages": [], "current_task": "", "scheduled_events": [], "recent_emails": []}
+    clock = datetime(2026, 1, 5, 9, 0, 0)
+    samples = []
+    for turn in range(turns):
+        text = USER_TURNS[turn % len(USER_TURNS)]
+        state["messages"].append(HumanMessage(id=str(uuid.uuid4()), content=text))
+        clock += timedelta(seconds=37)
+        if layout == "legacy":
+            prompt = legacy_prompt(state, clock)
+        elif layout == "prefix-stable":
+            prompt = builder.build(state)
+        else:
+            state.update(await manager.summarize(state))
+            if layout == "sliding window":
+                prompt = builder.build(state, sliding_window(manager, state, "supervisor"))
+            else:
+                prompt = builder.build(state, manager.window(state, "supervisor"))
+        samples.append(await time_to_first_token(model, prompt))
+
+        # Grow the thread the way a real conversation would
+        state["current_task"] = text
+        state["messages"].append(AIMessage(id=str(uuid.uuid4()), content=f"Done: {text.lower()}. " * 20))
+        state["scheduled_events"].append({"title": text})
+    return samples
+
+
+def report(name: str, samples: List[float], llm: CountingLLM):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{name:<15} mean={statistics.mean(samples) * 1000:7.1f} ms  "
+        f"p50={statistics.median(samples) * 1000:7.1f} ms  p95={p95 * 1000:7.1f} ms  "
+        f"prompt={llm.prompt_tokens / len(samples):6.0f} tok  "
+        f"uncached={(llm.prompt_tokens - llm.cached_tokens) / len(samples):5.0f} tok"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.5)
+    args = parser.parse_args()
+
+    results = {}
+    llms = {}
+    for layout in ("legacy", "prefix-stable", "sliding window", "stepped window"):
+        # Fresh server per layout so neither run warms the other's cache
+        llms[layout] = CountingLLM(StandinConfig(prefill_ms_per_token=args.prefill_ms_per_token))
+        with StandinServer(llms[layout]) as server:
+            results[layout] = await run_layout(server.base_url, layout, args.turns)
+
+    print(f"Supervisor TTFT over {args.turns} turns (stand-in with prefix cache)")
+    for layout, samples in results.items():
+        report(layout, samples, llms[layout])
+    speedup = statistics.mean(results["legacy"]) / statistics.mean(results["prefix-stable"])
+    print(f"speedup: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
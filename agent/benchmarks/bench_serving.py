@@ -0,0 +1,170 @@
+"""
+Serving throughput benchmark: runs/sec and latency percentiles per worker count.
+
+Starts a stand-in LLM, then for each worker count launches the production
+server (serve.py) with the shared SQLite checkpoint store. Concurrent clients
+post AG-UI runs to "/" and read each event stream to RUN_FINISHED. Each client
+keeps its own thread_id, so consecutive turns of a thread usually land on
+different workers. The server is then stopped with SIGTERM while a final
+wave of runs is in flight, and the report includes how long it takes to drain.
+
+Run from the agent directory:
+    uv run python -m benchmarks.bench_serving --workers 1,4 --concurrency 32 --runs 400
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.loadgen import PROMPTS, run_once
+from benchmarks.standin_llm import StandinConfig, StandinLLM, StandinServer
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def load(base_url: str, concurrency: int, runs: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(runs))
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async def client_loop(index: int, client: httpx.AsyncClient):
+        nonlocal errors
+        thread_id = f"bench-{uuid.uuid4().hex[:8]}-{index}"
+        history: List[Dict[str, Any]] = []
+        for run in remaining:
+            try:
+                seconds, history = await run_once(
+                    client, thread_id, history, PROMPTS[run % len(PROMPTS)]
+                )
+                latencies.append(seconds)
+            except Exception:
+                errors += 1
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(index, client) for index in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies) or [0.0]
+    return {
+        "runs": len(latencies),
+        "errors": errors,
+        "runs_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+    }
+
+
+def start_server(workers: int, port: int, llm_url: str, workdir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "SERVER_HOST": "127.0.0.1",
+        "SERVER_PORT": str(port),
+        "SERVER_WORKERS": str(workers),
+        "CHECKPOINTER": "sqlite",
+        "CHECKPOINT_DB_PATH": os.path.join(workdir, "checkpoints.sqlite"),
+        "OPENAI_BASE_URL": llm_url,
+        "OPENAI_API_KEY": "standin",
+    }
+    # Log to a file: an unread pipe fills up and blocks the server
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    return subprocess.Popen([sys.executable, "serve.py"], env=env, stdout=log, stderr=log)
+
+
+async def wait_ready(
+    base_url: str, process: subprocess.Popen, workdir: str, timeout: float = 120
+) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                with open(os.path.join(workdir, "server.log"), errors="replace") as log:
+                    raise RuntimeError(log.read()[-2000:])
+            try:
+                if (await client.get("/health")).json()["ready"]:
+                    return
+            except (httpx.HTTPError, KeyError):
+                pass
+            await asyncio.sleep(0.25)
+    raise TimeoutError("server did not become ready")
+
+
+async def drain(base_url: str, process: subprocess.Popen, concurrency: int) -> Dict[str, Any]:
+    """SIGTERM the server mid-load; in-flight runs should still complete."""
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        tasks = [
+            asyncio.create_task(run_once(client, f"drain-{uuid.uuid4().hex[:8]}", [], PROMPTS[0]))
+            for index in range(concurrency)
+        ]
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.to_thread(process.wait, 60)
+    return {
+        "completed": sum(1 for result in results if not isinstance(result, BaseException)),
+        "drain_s": time.perf_counter() - start,
+    }
+
+
+async def bench(workers: int, args, llm_url: str) -> Optional[Dict[str, Any]]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    workdir = tempfile.mkdtemp()
+    process = start_server(workers, port, llm_url, workdir)
+    try:
+        await wait_ready(base_url, process, workdir)
+        # One warm-up pass so every worker has built its agents and pools
+        await load(base_url, args.concurrency, args.concurrency * 2)
+        result = await load(base_url, args.concurrency, args.runs)
+        result.update(await drain(base_url, process, args.concurrency))
+        return result
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", default="1,4", help="comma-separated worker counts")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--runs", type=int, default=400)
+    parser.add_argument("--base-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    llm = StandinLLM(StandinConfig(base_latency_ms=args.base_latency_ms, response_text="Done."))
+    with StandinServer(llm) as server:
+        results = {}
+        for workers in (int(count) for count in args.workers.split(",")):
+            results[workers] = await bench(workers, args, server.base_url)
+
+    print(
+        f"{'workers':>8}{'runs':>7}{'errors':>8}{'runs/s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+        f"{'drained':>9}{'drain s':>9}"
+    )
+    for workers, r in results.items():
+        print(
+            f"{workers:>8}{r['runs']:>7}{r['errors']:>8}{r['runs_per_sec']:>9.1f}"
+            f"{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+            f"{r['completed']:>5}/{args.concurrency:<3}{r['drain_s']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
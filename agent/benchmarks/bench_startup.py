@@ -0,0 +1,110 @@
+"""
+Startup benchmark: cold import time per AGENT_INIT mode, with a per-module profile.
+
+Each mode runs in a fresh interpreter with `python -X importtime`. For each mode
+the report shows:
+- the wall time to import the entry module (what uvicorn waits for before it
+  binds the port)
+- the time to build the agents afterwards, for the deferred modes
+- the slowest top-level packages imported before the port can bind, by self
+  import time summed over their submodules
+
+Run from the agent directory:
+    uv run python -m benchmarks.bench_startup --module server --top 15
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+import_seconds = time.perf_counter() - start
+sys.stderr.write("BENCH-IMPORTED\\n")
+import main_graph
+start = time.perf_counter()
+builds = main_graph.warm_up()
+print("BENCH " + json.dumps({{
+    "import_seconds": import_seconds,
+    "warm_up_seconds": time.perf_counter() - start,
+    "builds": builds,
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Return (module, self_us, cumulative_us) rows from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        # Only the entry-module import, not what warm-up imports afterwards
+        if line == "BENCH-IMPORTED":
+            break
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def by_package(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """Sum self time per top-level package."""
+    totals: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        totals[name.split(".")[0]] += self_us
+    return totals
+
+
+def run(module: str, mode: str) -> Dict:
+    env = {**os.environ, "AGENT_INIT": mode}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(module=module)],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    result = next(
+        (json.loads(line[6:]) for line in proc.stdout.splitlines() if line.startswith("BENCH ")),
+        None,
+    )
+    if result is None:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        return {"error": "\n".join(errors[-3:])}
+    result["packages"] = by_package(parse_importtime(proc.stderr))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="server", help="entry module to import")
+    parser.add_argument("--top", type=int, default=15, help="packages to list in the profile")
+    args = parser.parse_args()
+
+    results = {mode: run(args.module, mode) for mode in ("eager", "lazy")}
+
+    print(f"Importing {args.module!r}")
+    print(f"{'mode':<8}{'import s':>10}{'build s':>10}")
+    for mode, result in results.items():
+        if "error" in result:
+            print(f"{mode:<8} failed:\n{result['error']}")
+            continue
+        # Eager mode built everything during import, so warm-up has nothing to do
+        print(f"{mode:<8}{result['import_seconds']:>10.3f}{result['warm_up_seconds']:>10.3f}")
+        for name, seconds in result["builds"].items():
+            print(f"{'':<8}  {name:<12}{seconds:>8.3f}")
+
+    profile = results["lazy"] if "packages" in results["lazy"] else results["eager"]
+    if "packages" in profile:
+        print("\nSlowest packages (self import time, ms)")
+        ranked = sorted(profile["packages"].items(), key=lambda item: item[1], reverse=True)
+        for name, self_us in ranked[: args.top]:
+            print(f"  {name:<32}{self_us / 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Regression benchmark: per-turn cost of specialist tool-call extraction.
+
+Drives EmailAgent.process over a long thread with a scripted inner agent (no
+LLM), so only the bookkeeping around the agent is measured. The legacy
+full-history rescan is reproduced for comparison. Per-turn cost should stay
+flat for the incremental path and grow with the thread for the legacy one.
+
+Run from the agent directory:
+    uv run python -m benchmarks.bench_tool_extraction --turns 500
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agents.email_agent import EmailAgent, track_tool_call
+from state import append_bounded
+
+
+class ScriptedAgent:
+    """Stands in for create_agent: appends one tool round trip to the history."""
+
+    async def ainvoke(self, state: Dict[str, Any], config=None) -> Dict[str, Any]:
+        call_id = f"call_{uuid.uuid4().hex}"
+        produced = [
+            AIMessage(
+                id=str(uuid.uuid4()),
+                content="",
+                tool_calls=[
+                    {
+                        "id": call_id,
+                        "name": "send_email",
+                        "args": {"recipient": "team@example.com", "subject": "Update", "content": "..."},
+                    }
+                ],
+            ),
+            ToolMessage(id=str(uuid.uuid4()), content="✅ Email sent", tool_call_id=call_id),
+            AIMessage(id=str(uuid.uuid4()), content="Sent."),
+        ]
+        return {**state, "messages": [*state["messages"], *produced]}
+
+
+def legacy_extract(state: Dict[str, Any], result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The pre-incremental behaviour: rescan and re-append the whole history."""
+    emails = list(state.get("recent_emails", []))
+    for msg in result["messages"]:
+        if hasattr(msg, "tool_calls") and msg.tool_calls:
+            for tool_call in msg.tool_calls:
+                emails.append(track_tool_call(tool_call))
+    return emails
+
+
+async def run(turns: int, legacy: bool) -> List[float]:
+    agent = EmailAgent()
+    agent.agent = ScriptedAgent()
+    # Same append-with-retention reducer the graph applies to recent_emails
+    reduce_emails = append_bounded("STATE_MAX_EMAILS", 200)
+    state: Dict[str, Any] = {"messages": [], "recent_emails": [], "logs": []}
+    samples = []
+    for turn in range(turns):
+        state["messages"].append(HumanMessage(id=str(uuid.uuid4()), content=f"email update {turn}"))
+        if legacy:
+            result = await agent.agent.ainvoke(state)
+            start = time.perf_counter()
+            emails = legacy_extract(state, result)
+            samples.append(time.perf_counter() - start)
+            state["messages"] = result["messages"]
+            state["recent_emails"] = emails
+        else:
+            start = time.perf_counter()
+            command = await agent.process(state, {})
+            samples.append(time.perf_counter() - start)
+            state["messages"].extend(command.update["messages"])
+            state["recent_emails"] = reduce_emails(
+                state["recent_emails"], command.update["recent_emails"]
+            )
+    print(
+        f"{'legacy' if legacy else 'incremental':<12} recent_emails after {turns} turns: "
+        f"{len(state['recent_emails'])}"
+    )
+    return samples
+
+
+def window_us(samples: List[float], start: int, size: int) -> float:
+    return statistics.mean(samples[start : start + size]) * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=500)
+    args = parser.parse_args()
+    window = max(1, args.turns // 10)
+
+    for legacy in (True, False):
+        samples = await run(args.turns, legacy)
+        first = window_us(samples, 0, window)
+        last = window_us(samples, args.turns - window, window)
+        print(
+            f"{'':<12} first {window} turns: {first:9.1f} us/turn   "
+            f"last {window} turns: {last:9.1f} us/turn   growth: {last / first:6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""
+Tracing overhead benchmark: per-request cost of LangChain instrumentation by sampling ratio.
+
+A request is a small LangGraph run shaped like a supervisor turn: a routing
+node, then a specialist node. Each node makes a fake chat-model call, so
+there is no network or LLM time. Spans go through the same sampled, bounded
+batch processor as the server (tracing.build_tracer_provider), but into an
+exporter that discards them. The numbers are therefore the in-process cost of
+creating, sampling and queueing spans.
+
+Each mode runs in a fresh interpreter, because instrumentation patches
+LangChain globally:
+- off: TRACING_ENABLED=false, nothing instrumented
+- 0%, 10%, 100%: instrumented at that TRACING_SAMPLE_RATIO
+
+Run from the agent directory:
+    uv run python -m benchmarks.bench_tracing --requests 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+MODES = {"off": None, "0%": 0.0, "10%": 0.1, "100%": 1.0}
+
+
+def build_graph():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langgraph.graph import END, MessagesState, StateGraph
+
+    router = FakeListChatModel(responses=["email"])
+    specialist = FakeListChatModel(responses=["Email sent to the team."])
+
+    async def route(state: MessagesState):
+        await router.ainvoke(state["messages"])
+        return {}
+
+    async def answer(state: MessagesState):
+        return {"messages": [await specialist.ainvoke(state["messages"])]}
+
+    workflow = StateGraph(MessagesState)
+    workflow.add_node("supervisor_node", route)
+    workflow.add_node("email_node", answer)
+    workflow.add_edge("supervisor_node", "email_node")
+    workflow.add_edge("email_node", END)
+    workflow.set_entry_point("supervisor_node")
+    return workflow.compile()
+
+
+def instrument(ratio: float):
+    """Instrument LangChain like tracing.setup_tracing, exporting nowhere."""
+    from openinference.instrumentation.langchain import LangChainInstrumentor
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    import tracing
+
+    class DiscardExporter(SpanExporter):
+        def __init__(self):
+            self.spans = 0
+
+        def export(self, spans):
+            self.spans += len(spans)
+            return SpanExportResult.SUCCESS
+
+    exporter = DiscardExporter()
+    os.environ["TRACING_SAMPLE_RATIO"] = str(ratio)
+    provider = tracing.build_tracer_provider(tracing.settings(), exporter)
+    LangChainInstrumentor().instrument(tracer_provider=provider)
+    return provider, exporter
+
+
+async def measure(requests: int, warmup: int) -> List[float]:
+    graph = build_graph()
+    payload = {"messages": [("user", "Send an email to the team about the launch")]}
+    for _ in range(warmup):
+        await graph.ainvoke(payload)
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await graph.ainvoke(payload)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def child(ratio: Optional[float], requests: int, warmup: int):
+    provider = exporter = None
+    if ratio is not None:
+        provider, exporter = instrument(ratio)
+    timings = sorted(asyncio.run(measure(requests, warmup)))
+    spans = 0
+    if provider is not None:
+        provider.force_flush()
+        spans = exporter.spans
+    print(
+        "BENCH "
+        + json.dumps(
+            {
+                "mean_us": sum(timings) / len(timings) * 1e6,
+                "p50_us": timings[len(timings) // 2] * 1e6,
+                "p99_us": timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1e6,
+                "spans_per_request": spans / (requests + warmup),
+            }
+        )
+    )
+
+
+def run(mode: str, args) -> Dict[str, Any]:
+    command = [sys.executable, "-m", "benchmarks.bench_tracing", "--child", mode]
+    command += ["--requests", str(args.requests), "--warmup", str(args.warmup)]
+    proc = subprocess.run(command, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH "):
+            return json.loads(line[6:])
+    return {"error": proc.stderr.strip().splitlines()[-1:] or ["no output"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--child", choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(MODES[args.child], args.requests, args.warmup)
+        return
+
+    results = {mode: run(mode, args) for mode in MODES}
+    baseline = results["off"].get("mean_us")
+    print(f"{'sampling':<10}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'overhead us':>13}{'spans/req':>11}")
+    for mode, r in results.items():
+        if "error" in r:
+            print(f"{mode:<10} failed: {r['error'][0]}")
+            continue
+        overhead = r["mean_us"] - baseline if baseline is not None else float("nan")
+        print(
+            f"{mode:<10}{r['mean_us']:>10.1f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}"
+            f"{overhead:>13.1f}{r['spans_per_request']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+End-to-end load generator for the AG-UI endpoint.
+
+Many concurrent clients each keep their own thread. For every turn a client
+posts a run to "/" and reads the event stream to RUN_FINISHED, resending the
+thread's history the way the frontend does. The report covers:
+- throughput (runs/sec) and errors
+- run latency p50/p90/p99 and time to first streamed text token
+- a per-node breakdown from the STEP_STARTED/STEP_FINISHED events the graph emits
+  (a specialist's inner agent loop shows up as its own "model" and "tools" steps)
+
+By default the server is started in-process (server:app with AGENT_INIT=lazy),
+with an offline stand-in LLM, so no LM Studio is needed. Pass --url to load an
+already running server instead; it must point at an LLM of its own.
+
+Run from the agent directory:
+    uv run python -m benchmarks.loadgen --threads 16 --turns 5
+    uv run python -m benchmarks.loadgen --url http://127.0.0.1:8123 --threads 64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.standin_llm import (
+    BackgroundServer,
+    StandinConfig,
+    StandinLLM,
+    StandinServer,
+    load_script,
+)
+
+PROMPTS = [
+    "Send an email to the team about the launch",
+    "Schedule a meeting with Alex tomorrow at 10am",
+    "Research the latest trends in vector databases",
+    "Reply to the vendor thread about pricing",
+]
+
+
+class RunResult:
+    """Timings of one AG-UI run."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.ttft: Optional[float] = None
+        self.nodes: Dict[str, float] = defaultdict(float)
+        self.messages: List[Dict[str, Any]] = []
+
+
+def run_input(thread_id: str, history: List[Dict[str, Any]], text: str) -> Dict[str, Any]:
+    """AG-UI RunAgentInput: like the frontend, resend the thread's history plus the new message."""
+    return {
+        "threadId": thread_id,
+        "runId": str(uuid.uuid4()),
+        "state": {},
+        "messages": [*history, {"id": str(uuid.uuid4()), "role": "user", "content": text}],
+        "tools": [],
+        "context": [],
+        "forwardedProps": {},
+    }
+
+
+async def run_events(
+    client: httpx.AsyncClient, thread_id: str, history: List[Dict[str, Any]], text: str
+) -> RunResult:
+    """Post one run and consume its event stream, timing each graph node."""
+    result = RunResult()
+    result.messages = history
+    started: Dict[str, float] = {}
+    start = time.perf_counter()
+    async with client.stream("POST", "/", json=run_input(thread_id, history, text)) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            event = json.loads(line[5:])
+            kind = event["type"]
+            now = time.perf_counter()
+            if kind == "STEP_STARTED":
+                started[event["stepName"]] = now
+            elif kind == "STEP_FINISHED" and event["stepName"] in started:
+                result.nodes[event["stepName"]] += now - started.pop(event["stepName"])
+            elif kind == "TEXT_MESSAGE_CONTENT" and result.ttft is None:
+                result.ttft = now - start
+            elif kind == "MESSAGES_SNAPSHOT":
+                result.messages = event["messages"]
+            elif kind == "RUN_ERROR":
+                raise RuntimeError(event.get("message"))
+            elif kind == "RUN_FINISHED":
+                break
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+async def run_once(
+    client: httpx.AsyncClient, thread_id: str, history: List[Dict[str, Any]], text: str
+) -> Tuple[float, List[Dict[str, Any]]]:
+    """Post one run; returns seconds to RUN_FINISHED and the thread's messages afterwards."""
+    result = await run_events(client, thread_id, history, text)
+    return result.seconds, result.messages
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def generate(base_url: str, threads: int, turns: int, timeout: float = 120) -> Dict[str, Any]:
+    """Drive `threads` concurrent conversations of `turns` runs each."""
+    results: List[RunResult] = []
+    errors: Dict[str, int] = defaultdict(int)
+    limits = httpx.Limits(max_connections=threads)
+
+    async def conversation(index: int, client: httpx.AsyncClient):
+        thread_id = f"load-{uuid.uuid4().hex[:8]}-{index}"
+        history: List[Dict[str, Any]] = []
+        for turn in range(turns):
+            try:
+                result = await run_events(
+                    client, thread_id, history, PROMPTS[(index + turn) % len(PROMPTS)]
+                )
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                continue
+            history = result.messages
+            results.append(result)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(conversation(index, client) for index in range(threads)))
+        elapsed = time.perf_counter() - start
+
+    latencies = sorted(result.seconds for result in results)
+    ttfts = sorted(result.ttft for result in results if result.ttft is not None)
+    per_node: Dict[str, List[float]] = defaultdict(list)
+    for result in results:
+        for node, seconds in result.nodes.items():
+            per_node[node].append(seconds)
+
+    return {
+        "runs": len(results),
+        "errors": dict(errors),
+        "elapsed_s": elapsed,
+        "runs_per_sec": len(results) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            name: percentile(latencies, fraction) * 1000
+            for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+        },
+        "ttft_p50_ms": percentile(ttfts, 0.5) * 1000,
+        "nodes": {
+            node: {
+                "count": len(values),
+                "mean_ms": statistics.fmean(values) * 1000,
+                "p50_ms": percentile(sorted(values), 0.5) * 1000,
+                "p95_ms": percentile(sorted(values), 0.95) * 1000,
+            }
+            for node, values in sorted(per_node.items())
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    errors = sum(report["errors"].values())
+    print(
+        f"{report['runs']} runs in {report['elapsed_s']:.1f}s: "
+        f"{report['runs_per_sec']:.1f} runs/s, {errors} errors {report['errors'] or ''}"
+    )
+    latency = report["latency_ms"]
+    print(
+        f"latency ms  p50 {latency['p50']:.1f}  p90 {latency['p90']:.1f}  p99 {latency['p99']:.1f}"
+        f"  | ttft p50 {report['ttft_p50_ms']:.1f}"
+    )
+    print(f"\n{'node':<18}{'count':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for node, stats in report["nodes"].items():
+        print(
+            f"{node:<18}{stats['count']:>7}{stats['mean_ms']:>10.1f}"
+            f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="running server to load (default: in-process server)")
+    parser.add_argument("--threads", type=int, default=16, help="concurrent conversations")
+    parser.add_argument("--turns", type=int, default=5, help="runs per conversation")
+    parser.add_argument("--base-latency-ms", type=float, default=50.0)
+    parser.add_argument("--ttft-ms", type=float, help="fixed stand-in time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0)
+    parser.add_argument("--script", help="JSON file of scripted stand-in responses")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.url:
+        report = await generate(args.url, args.threads, args.turns)
+    else:
+        llm = StandinLLM(
+            StandinConfig(
+                base_latency_ms=args.base_latency_ms,
+                ttft_ms=args.ttft_ms,
+                tokens_per_sec=args.tokens_per_sec,
+                response_text="Done.",
+                auto_tool_calls=True,
+                script=load_script(args.script) if args.script else None,
+            )
+        )
+        with StandinServer(llm) as standin:
+            os.environ["OPENAI_BASE_URL"] = standin.base_url
+            os.environ["OPENAI_API_KEY"] = "standin"
+            os.environ.setdefault("AGENT_INIT", "lazy")
+            from server import app
+
+            with BackgroundServer(app) as server:
+                report = await generate(server.url, args.threads, args.turns)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
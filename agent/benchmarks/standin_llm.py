@@ -0,0 +1,433 @@
+"""
+Local OpenAI-compatible stand-in for LM Studio / llama.cpp used by the benchmarks.
+
+Latency is simulated rather than computed. Every request pays a fixed base
+delay plus a prefill cost for each prompt token that is NOT already in the
+prefix cache, then decodes at a fixed tokens/sec. A fixed time-to-first-token
+(ttft_ms) can replace the prefill model, and a fraction of requests
+(tail_ratio) can be slowed by tail_ms to simulate a straggling backend, and a
+fraction (error_ratio) answered at once with a 503. The prefix cache mirrors llama.cpp's
+slot behaviour: the longest common token prefix with any recently seen prompt
+is treated as free.
+
+Responses come from, in order:
+- a script: rules matching the latest user message, each with text and/or tool calls
+- auto_tool_calls: a call to the best-matching offered tool, with arguments
+  built from its JSON schema. After the tool result, plain text. JSON-schema
+  response formats get a schema-valid object.
+- response_text
+
+Run standalone with:
+    uv run python -m benchmarks.standin_llm --port 1234 --auto-tool-calls --script script.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+
+_TOKEN_RE = re.compile(r"\S+")
+
+
+def count_tokens(text: str) -> int:
+    """Cheap whitespace token count; good enough for relative measurements."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def prompt_tokens(
+    messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None
+) -> List[str]:
+    """Flatten chat messages into the token sequence the backend would prefill."""
+    # Chat templates render tool schemas into the prompt ahead of the messages
+    tokens: List[str] = _TOKEN_RE.findall(json.dumps(tools)) if tools else []
+    for message in messages:
+        content = message.get("content") or ""
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        tokens.append(f"<|{message.get('role', 'user')}|>")
+        tokens.extend(_TOKEN_RE.findall(content))
+        if message.get("tool_calls"):
+            tokens.extend(_TOKEN_RE.findall(json.dumps(message["tool_calls"])))
+    return tokens
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z]+", text.lower()))
+
+
+def sample_value(schema: Dict[str, Any], text: str) -> Any:
+    """Build a value that satisfies a (simple) JSON schema, preferring words from `text`."""
+    if "enum" in schema:
+        words = _words(text)
+        return next((value for value in schema["enum"] if str(value).lower() in words), schema["enum"][0])
+    kind = schema.get("type", "string")
+    if kind == "object":
+        properties = schema.get("properties", {})
+        required = schema.get("required", list(properties))
+        return {name: sample_value(properties[name], text) for name in required if name in properties}
+    if kind == "array":
+        return [sample_value(schema.get("items", {}), text)]
+    if kind in ("integer", "number"):
+        return 1
+    if kind == "boolean":
+        return True
+    return text[:60] or "standin"
+
+
+class ScriptRule:
+    """A scripted response, used when `match` finds the latest user message at the given stage."""
+
+    STAGES = ("any", "first", "after_tool")
+
+    def __init__(
+        self,
+        match: str = ".*",
+        stage: str = "any",
+        content: str = "",
+        tool_calls: Optional[List[Dict[str, Any]]] = None,
+    ):
+        if stage not in self.STAGES:
+            raise ValueError(f"stage must be one of {self.STAGES}, got {stage!r}")
+        self.pattern = re.compile(match, re.IGNORECASE)
+        self.stage = stage
+        self.content = content
+        self.tool_calls = tool_calls or []
+
+    def applies(self, user_text: str, after_tool: bool) -> bool:
+        if self.stage == "first" and after_tool or self.stage == "after_tool" and not after_tool:
+            return False
+        return bool(self.pattern.search(user_text))
+
+
+def load_script(path: str) -> List[ScriptRule]:
+    """Read rules from a JSON list of {match, stage, content, tool_calls: [{name, arguments}]}."""
+    with open(path) as f:
+        return [ScriptRule(**rule) for rule in json.load(f)]
+
+
+class StandinConfig:
+    """Latency model and canned output of the stand-in server."""
+
+    def __init__(
+        self,
+        base_latency_ms: float = 20.0,
+        prefill_ms_per_token: float = 0.5,
+        tokens_per_sec: float = 200.0,
+        prefix_cache: bool = True,
+        cache_slots: int = 8,
+        response_text: str = "scheduler",
+        ttft_ms: Optional[float] = None,
+        auto_tool_calls: bool = False,
+        script: Optional[List[ScriptRule]] = None,
+        tail_ratio: float = 0.0,
+        tail_ms: float = 0.0,
+        error_ratio: float = 0.0,
+    ):
+        self.base_latency_ms = base_latency_ms
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.tokens_per_sec = tokens_per_sec
+        self.prefix_cache = prefix_cache
+        self.cache_slots = cache_slots
+        self.response_text = response_text
+        # Fixed time to first token; replaces the base + prefill model when set
+        self.ttft_ms = ttft_ms
+        self.auto_tool_calls = auto_tool_calls
+        self.script = script or []
+        # Share of requests that wait an extra tail_ms before the first token
+        self.tail_ratio = tail_ratio
+        self.tail_ms = tail_ms
+        # Share of requests failed with a 503 before any work
+        self.error_ratio = error_ratio
+
+
+class PrefixCache:
+    """Tracks recently prefilled prompts and reports how many tokens are reusable."""
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._prompts: "OrderedDict[int, List[str]]" = OrderedDict()
+        self._next_id = 0
+
+    def lookup_and_store(self, tokens: List[str]) -> int:
+        best_id, best = None, 0
+        for slot_id, cached in self._prompts.items():
+            shared = 0
+            for left, right in zip(cached, tokens):
+                if left != right:
+                    break
+                shared += 1
+            if shared > best:
+                best_id, best = slot_id, shared
+
+        # Reuse the best matching slot, otherwise evict the least recently used
+        if best_id is not None:
+            del self._prompts[best_id]
+        elif len(self._prompts) >= self.slots:
+            self._prompts.popitem(last=False)
+        self._prompts[self._next_id] = tokens
+        self._next_id += 1
+        return best
+
+
+class StandinLLM:
+    """Request handling and latency simulation for the stand-in server."""
+
+    def __init__(self, config: Optional[StandinConfig] = None):
+        self.config = config or StandinConfig()
+        self.cache = PrefixCache(self.config.cache_slots)
+        self.requests = 0
+
+    def prefill(self, body: Dict[str, Any]) -> Dict[str, int]:
+        tokens = prompt_tokens(body.get("messages", []), body.get("tools"))
+        cached = self.cache.lookup_and_store(tokens) if self.config.prefix_cache else 0
+        return {"prompt_tokens": len(tokens), "cached_tokens": cached}
+
+    def prefill_delay(self, usage: Dict[str, int]) -> float:
+        tail = self.config.tail_ms if random.random() < self.config.tail_ratio else 0.0
+        if self.config.ttft_ms is not None:
+            return (self.config.ttft_ms + tail) / 1000
+        uncached = usage["prompt_tokens"] - usage["cached_tokens"]
+        return (self.config.base_latency_ms + uncached * self.config.prefill_ms_per_token + tail) / 1000
+
+    def completion(self, body: Dict[str, Any]) -> str:
+        """Plain-text reply; benchmarks may override this."""
+        return self.config.response_text
+
+    def reply(self, body: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Return (content, tool_calls) for a request."""
+        messages = body.get("messages", [])
+        user_text = next(
+            (str(m.get("content") or "") for m in reversed(messages) if m.get("role") == "user"), ""
+        )
+        # A tool already answered this turn (prompts may append a system message after it)
+        last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+        after_tool = any(m.get("role") == "tool" for m in messages[last_user + 1 :])
+
+        for rule in self.config.script:
+            if rule.applies(user_text, after_tool):
+                return rule.content, [self._tool_call(c["name"], c.get("arguments", {})) for c in rule.tool_calls]
+
+        if self.config.auto_tool_calls:
+            tools = [tool["function"] for tool in body.get("tools") or [] if tool.get("type") == "function"]
+            if tools and not after_tool and body.get("tool_choice") != "none":
+                tool = self._pick_tool(tools, body.get("tool_choice"), user_text)
+                return "", [self._tool_call(tool["name"], sample_value(tool.get("parameters", {}), user_text))]
+            response_format = body.get("response_format") or {}
+            if response_format.get("type") == "json_schema":
+                schema = response_format["json_schema"].get("schema", {})
+                return json.dumps(sample_value(schema, user_text)), []
+
+        return self.completion(body), []
+
+    @staticmethod
+    def _pick_tool(tools: List[Dict[str, Any]], tool_choice: Any, text: str) -> Dict[str, Any]:
+        if isinstance(tool_choice, dict):
+            forced = tool_choice.get("function", {}).get("name")
+            return next((tool for tool in tools if tool["name"] == forced), tools[0])
+        words = _words(text)
+        # Most words shared between the tool name and the request wins; ties keep the first
+        return max(tools, key=lambda tool: len(_words(tool["name"].replace("_", " ")) & words))
+
+    @staticmethod
+    def _tool_call(name: str, arguments: Any) -> Dict[str, Any]:
+        return {
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "function",
+            "function": {
+                "name": name,
+                "arguments": arguments if isinstance(arguments, str) else json.dumps(arguments),
+            },
+        }
+
+    def create_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.get("/v1/models")
+        async def models():
+            return {"object": "list", "data": [{"id": "standin", "object": "model"}]}
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            try:
+                body = await request.json()
+            except ClientDisconnect:
+                # A hedged copy that lost the race was cancelled mid-upload
+                return Response(status_code=499)
+            self.requests += 1
+            if self.config.error_ratio and random.random() < self.config.error_ratio:
+                return JSONResponse({"error": {"message": "backend unavailable"}}, status_code=503)
+            usage = self.prefill(body)
+            text, tool_calls = self.reply(body)
+            usage["completion_tokens"] = max(
+                1, count_tokens(text) + sum(count_tokens(c["function"]["arguments"]) for c in tool_calls)
+            )
+            await asyncio.sleep(self.prefill_delay(usage))
+            if body.get("stream"):
+                return StreamingResponse(
+                    self._stream(body, text, tool_calls, usage), media_type="text/event-stream"
+                )
+            await asyncio.sleep(usage["completion_tokens"] / self.config.tokens_per_sec)
+            return JSONResponse(self._response(body, text, tool_calls, usage))
+
+        return app
+
+    def _usage(self, usage: Dict[str, int]) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": usage["prompt_tokens"],
+            "completion_tokens": usage["completion_tokens"],
+            "total_tokens": usage["prompt_tokens"] + usage["completion_tokens"],
+            "prompt_tokens_details": {"cached_tokens": usage["cached_tokens"]},
+        }
+
+    def _response(
+        self, body: Dict[str, Any], text: str, tool_calls: List[Dict[str, Any]], usage: Dict[str, int]
+    ) -> Dict[str, Any]:
+        message: Dict[str, Any] = {"role": "assistant", "content": text or None}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "standin"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if tool_calls else "stop",
+                }
+            ],
+            "usage": self._usage(usage),
+        }
+
+    async def _stream(
+        self, body: Dict[str, Any], text: str, tool_calls: List[Dict[str, Any]], usage: Dict[str, int]
+    ):
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra) -> str:
+            payload = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "standin"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        yield chunk({"role": "assistant", "content": ""})
+        delay = 1 / self.config.tokens_per_sec
+        for index, token in enumerate(_TOKEN_RE.findall(text)):
+            await asyncio.sleep(delay)
+            yield chunk({"content": token if index == 0 else " " + token})
+        for index, call in enumerate(tool_calls):
+            header = {"index": index, "id": call["id"], "type": "function"}
+            yield chunk({"tool_calls": [{**header, "function": {"name": call["function"]["name"], "arguments": ""}}]})
+            # Arguments stream in pieces, like a real backend
+            for piece in re.findall(r"\S+\s*", call["function"]["arguments"]):
+                await asyncio.sleep(delay)
+                yield chunk({"tool_calls": [{"index": index, "function": {"arguments": piece}}]})
+        yield chunk({}, "tool_calls" if tool_calls else "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield f"data: {json.dumps({'id': chunk_id, 'object': 'chat.completion.chunk', 'choices': [], 'usage': self._usage(usage)})}\n\n"
+        yield "data: [DONE]\n\n"
+
+
+class BackgroundServer:
+    """Runs an ASGI app with uvicorn on a background thread for the duration of a benchmark."""
+
+    def __init__(self, app: Any, host: str = "127.0.0.1", port: int = 0):
+        self.app = app
+        self.host = host
+        self.port = port
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "BackgroundServer":
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        # Resolve the ephemeral port picked by the OS
+        self.port = self._server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "BackgroundServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StandinServer(BackgroundServer):
+    """Runs a stand-in LLM on a background thread for the duration of a benchmark."""
+
+    def __init__(self, llm: Optional[StandinLLM] = None, host: str = "127.0.0.1", port: int = 0):
+        self.llm = llm or StandinLLM()
+        super().__init__(self.llm.create_app(), host, port)
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stand-in LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--base-latency-ms", type=float, default=20.0)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.5)
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0)
+    parser.add_argument("--no-prefix-cache", action="store_true")
+    parser.add_argument("--ttft-ms", type=float, help="fixed time to first token (overrides prefill model)")
+    parser.add_argument("--tail-ratio", type=float, default=0.0, help="share of requests slowed by --tail-ms")
+    parser.add_argument("--tail-ms", type=float, default=0.0)
+    parser.add_argument("--error-ratio", type=float, default=0.0, help="share of requests failed with a 503")
+    parser.add_argument("--response-text", default="scheduler")
+    parser.add_argument("--auto-tool-calls", action="store_true", help="call offered tools with schema-built arguments")
+    parser.add_argument("--script", help="JSON file of scripted response rules")
+    args = parser.parse_args()
+
+    llm = StandinLLM(
+        StandinConfig(
+            base_latency_ms=args.base_latency_ms,
+            prefill_ms_per_token=args.prefill_ms_per_token,
+            tokens_per_sec=args.tokens_per_sec,
+            prefix_cache=not args.no_prefix_cache,
+            response_text=args.response_text,
+            ttft_ms=args.ttft_ms,
+            auto_tool_calls=args.auto_tool_calls,
+            script=load_script(args.script) if args.script else None,
+            tail_ratio=args.tail_ratio,
+            tail_ms=args.tail_ms,
+            error_ratio=args.error_ratio,
+        )
+    )
+    uvicorn.run(llm.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Local SMTP stand-in used by the outbox benchmark.
+
+A minimal asyncio SMTP sink (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT)
+that counts connections and accepted messages per recipient domain and keeps
+nothing else. Costs are simulated: every new connection waits connect_ms
+before its greeting, like a TLS handshake and AUTH to a remote relay, and each
+message waits message_ms after DATA. A share of recipients (defer_ratio) is
+refused with 451 to exercise retries.
+
+Use aiosmtpd instead for anything beyond throughput measurements.
+
+Run standalone with:
+    uv run python -m benchmarks.standin_smtp --port 2525 --connect-ms 50
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class SMTPConfig:
+    connect_ms: float = 50.0
+    message_ms: float = 2.0
+    defer_ratio: float = 0.0
+    seed: int = 0
+
+
+class StandinSMTP:
+    """Protocol handler and counters; one instance serves every connection."""
+
+    def __init__(self, config: Optional[SMTPConfig] = None):
+        self.config = config or SMTPConfig()
+        self.connections = 0
+        self.messages = 0
+        self.deferred = 0
+        self.by_domain: Counter = Counter()
+        self._rng = random.Random(self.config.seed)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        await asyncio.sleep(self.config.connect_ms / 1000)
+
+        async def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        await reply("220 standin ESMTP")
+        recipients = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                command = line.decode(errors="replace").strip()
+                verb = command[:4].upper()
+                if verb == "EHLO":
+                    await reply("250-standin\r\n250-PIPELINING\r\n250 8BITMIME")
+                elif verb == "HELO":
+                    await reply("250 standin")
+                elif verb == "MAIL":
+                    recipients = []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    if self._rng.random() < self.config.defer_ratio:
+                        self.deferred += 1
+                        await reply("451 4.3.0 try again later")
+                    else:
+                        recipients.append(command.partition(":")[2].strip(" <>"))
+                        await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 end with <CRLF>.<CRLF>")
+                    while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+                        pass
+                    await asyncio.sleep(self.config.message_ms / 1000)
+                    self.messages += 1
+                    for recipient in recipients:
+                        self.by_domain[recipient.rpartition("@")[2].lower()] += 1
+                    recipients = []
+                    await reply("250 OK queued")
+                elif verb == "RSET":
+                    recipients = []
+                    await reply("250 OK")
+                elif verb == "NOOP":
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 bye")
+                    return
+                else:
+                    await reply("502 command not implemented")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class StandinSMTPServer:
+    """Runs a stand-in SMTP server on a background thread for the duration of a benchmark."""
+
+    def __init__(self, smtp: Optional[StandinSMTP] = None, host: str = "127.0.0.1", port: int = 0):
+        self.smtp = smtp or StandinSMTP()
+        self.host = host
+        self.port = port
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StandinSMTPServer":
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self.smtp.handle, self.host, self.port, backlog=1024)
+            )
+            # Resolve the ephemeral port picked by the OS
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "StandinSMTPServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMTP sink stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--connect-ms", type=float, default=50.0)
+    parser.add_argument("--message-ms", type=float, default=2.0)
+    parser.add_argument("--defer-ratio", type=float, default=0.0, help="share of recipients refused with 451")
+    args = parser.parse_args()
+
+    smtp = StandinSMTP(SMTPConfig(args.connect_ms, args.message_ms, args.defer_ratio))
+
+    async def serve():
+        server = await asyncio.start_server(smtp.handle, args.host, args.port)
+        print(f"stand-in SMTP on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,798 @@
+"""
+Local calendar store behind the scheduler tools.
+
+Events live in a SQLite file and, once loaded, in memory. Each participant has
+an IntervalIndex over their events: intervals sorted by start in flat arrays,
+read as an implicit interval tree (the cgranges layout). Every internal node
+stores the largest end in its subtree, so an overlap query visits O(log n)
+nodes plus the k matches. Writes insert into the sorted arrays and only mark
+the tree stale; it is rebuilt in O(n) by the next query of that participant.
+
+Recurring series are kept as rules (recurrence.py) and listed per
+participant; queries take only the occurrences inside their window from a lazy
+generator. An occurrence's id is "<series id>@YYYY-MM-DD", and it can be
+cancelled or moved on its own.
+
+Free time is a sweep over the participants' busy intervals in the window,
+merged in start order. Slot search for find_available_slots uses free/busy
+bitmaps instead (freebusy.py).
+
+Several worker processes can share the file. Every write also appends the
+ids it touched to a changes table; before each call a store compares SQLite's
+data_version with the one it last saw and, if another connection committed,
+re-reads only the rows named by the new changes. The log is trimmed to its
+last CHANGE_LOG_ROWS entries; a store that fell further behind reloads the
+whole file. Checking for conflicts and then booking are separate calls, so two
+workers booking the same slot at the same moment can still both succeed.
+
+Times are stored as UTC epoch seconds. Tool input ("tomorrow", "2pm",
+"1 hour") is read in CALENDAR_TIMEZONE. Participants may have their own time
+zone and working hours; the others work CALENDAR_WORKDAY, Monday to Friday,
+in CALENDAR_TIMEZONE.
+
+Environment:
+- CALENDAR_DB_PATH (default .calendar/calendar.sqlite, ":memory:" for none)
+- CALENDAR_TIMEZONE (default UTC)
+- CALENDAR_WORKDAY (default 09:00-17:00): default working hours
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from array import array
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date as Date, datetime, time as Time, timedelta, tzinfo
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from recurrence import Rule, Series, first_clash, occurrence_dates, parse_rrule
+
+# End of an open-ended series
+_FOREVER = 1 << 62
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    participants TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS series (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    rule TEXT NOT NULL,
+    participants TEXT NOT NULL,
+    exdates TEXT NOT NULL,
+    overrides TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS working_hours (
+    participant TEXT PRIMARY KEY,
+    timezone TEXT NOT NULL,
+    workday TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL
+);
+"""
+
+# Changes kept for other processes to catch up from
+CHANGE_LOG_ROWS = 10000
+
+# Subtrees this small are scanned linearly instead of descended
+_SCAN_LEVEL = 3
+
+
+@dataclass(slots=True)
+class Event:
+    id: str
+    title: str
+    start: int
+    end: int
+    participants: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class WorkingHours:
+    """When a participant can be booked: local opening hours on weekdays (0 = Monday)."""
+
+    tz: str
+    opening: Time
+    closing: Time
+    weekdays: Tuple[int, ...] = (0, 1, 2, 3, 4)
+
+
+class IntervalIndex:
+    """One participant's events as an implicit interval tree over sorted arrays."""
+
+    def __init__(self):
+        self.starts = array("q")
+        self.ends = array("q")
+        self.ids: List[str] = []
+        self._max_ends = array("q")
+        self._levels = -1
+        self._stale = False
+        # Bumped on every change, so derived data (free/busy bitmaps) can be reused
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, start: int, end: int, event_id: str):
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, event_id)
+        self._stale = True
+        self.version += 1
+
+    def extend(self, intervals: Iterable[Tuple[int, int, str]]):
+        """Bulk add; one sort instead of an insert per interval."""
+        merged = sorted([*zip(self.starts, self.ends, self.ids), *intervals])
+        self.starts = array("q", [interval[0] for interval in merged])
+        self.ends = array("q", [interval[1] for interval in merged])
+        self.ids = [interval[2] for interval in merged]
+        self._stale = True
+        self.version += 1
+
+    def clear(self):
+        self.starts, self.ends, self.ids = array("q"), array("q"), []
+        self._stale = True
+        self.version += 1
+
+    def remove(self, start: int, event_id: str) -> bool:
+        i = bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start:
+            if self.ids[i] == event_id:
+                del self.starts[i], self.ends[i], self.ids[i]
+                self._stale = True
+                self.version += 1
+                return True
+            i += 1
+        return False
+
+    def _build(self):
+        """Fill in the max end of every internal node, level by level."""
+        n = len(self.starts)
+        ends = self.ends
+        max_ends = array("q", ends)
+        levels = -1
+        if n:
+            # Leaves are the even positions; `last` tracks the rightmost subtree,
+            # whose right child may lie past the end of the array
+            last_i = (n - 1) & ~1
+            last = ends[last_i]
+            levels = 0
+            while (1 << (levels + 1)) <= n:
+                levels += 1
+                half = 1 << (levels - 1)
+                for i in range((half << 1) - 1, n, half << 2):
+                    right = max_ends[i + half] if i + half < n else last
+                    max_ends[i] = max(ends[i], max_ends[i - half], right)
+                last_i = last_i - half if (last_i >> levels) & 1 else last_i + half
+                if last_i < n and max_ends[last_i] > last:
+                    last = max_ends[last_i]
+        self._max_ends = max_ends
+        self._levels = levels
+        self._stale = False
+
+    def overlapping(self, start: int, end: int) -> List[int]:
+        """Positions of intervals overlapping [start, end), in start order."""
+        if self._stale:
+            self._build()
+        n = len(self.starts)
+        if not n:
+            return []
+        starts, ends, max_ends = self.starts, self.ends, self._max_ends
+        found: List[int] = []
+        # (node, level, left subtree done)
+        stack = [((1 << self._levels) - 1, self._levels, False)]
+        while stack:
+            node, level, left_done = stack.pop()
+            if level <= _SCAN_LEVEL:
+                i = node >> level << level
+                stop = min(i + (1 << (level + 1)) - 1, n)
+                while i < stop and starts[i] < end:
+                    if start < ends[i]:
+                        found.append(i)
+                    i += 1
+            elif not left_done:
+                stack.append((node, level, True))
+                left = node - (1 << (level - 1))
+                if left >= n or max_ends[left] > start:
+                    stack.append((left, level - 1, False))
+            elif node < n and starts[node] < end:
+                if start < ends[node]:
+                    found.append(node)
+                stack.append((node + (1 << (level - 1)), level - 1, False))
+        return found
+
+    def busy(self, start: int, end: int) -> List[Tuple[int, int, str]]:
+        return [(self.starts[i], self.ends[i], self.ids[i]) for i in self.overlapping(start, end)]
+
+
+def merge_busy(intervals: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Union of intervals, sorted and non-overlapping."""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_windows(
+    busy: Sequence[Tuple[int, int]], start: int, end: int, duration: int
+) -> List[Tuple[int, int]]:
+    """Gaps of at least `duration` seconds in [start, end) around merged busy intervals."""
+    windows = []
+    cursor = start
+    for busy_start, busy_end in busy:
+        if busy_start - cursor >= duration:
+            windows.append((cursor, min(busy_start, end)))
+        cursor = max(cursor, busy_end)
+        if cursor >= end:
+            break
+    if end - cursor >= duration:
+        windows.append((cursor, end))
+    return windows
+
+
+class CalendarStore:
+    """Events persisted in SQLite, indexed per participant in memory."""
+
+    def __init__(self, path: Optional[str] = None, tz: Optional[str] = None):
+        self.path = path or os.getenv("CALENDAR_DB_PATH", ".calendar/calendar.sqlite")
+        self.tz = ZoneInfo(tz or os.getenv("CALENDAR_TIMEZONE", "UTC"))
+        self.workday = parse_workday(os.getenv("CALENDAR_WORKDAY", "09:00-17:00"))
+        self.default_hours = WorkingHours(self.tz.key, *self.workday)
+        self._events: Dict[str, Event] = {}
+        self._hours: Dict[str, WorkingHours] = {}
+        self._calendars: Dict[str, IntervalIndex] = defaultdict(IntervalIndex)
+        self._series: Dict[str, Series] = {}
+        # series id -> (first start, last end); participant -> series ids
+        self._spans: Dict[str, Tuple[int, int]] = {}
+        self._series_of: Dict[str, List[str]] = defaultdict(list)
+        self._series_versions: Dict[str, int] = defaultdict(int)
+        self._conn: Optional[sqlite3.Connection] = None
+        # Last change applied, and SQLite's data_version when it was checked
+        self._seq = 0
+        self._data_version = 0
+        self._lock = threading.RLock()
+
+    def _db(self) -> sqlite3.Connection:
+        """Open the file and load every event on first use; then apply other processes' changes."""
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            self._load()
+        elif self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+            self._catch_up()
+        return self._conn
+
+    def _load(self):
+        conn = self._conn
+        self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        self._seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+        rows = conn.execute("SELECT id, title, start, end, participants FROM events")
+        self._index(self._load_event(*row) for row in rows)
+        for row in conn.execute("SELECT * FROM series"):
+            self._index_series(self._load_series(*row))
+        for participant, tz, workday in conn.execute("SELECT * FROM working_hours"):
+            self._hours[participant] = WorkingHours(tz, *parse_workday(workday))
+
+    def _catch_up(self):
+        """Re-read the rows changed by other connections since the last call."""
+        conn = self._conn
+        self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        oldest = conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+        if oldest is not None and oldest > self._seq + 1:
+            # Trimmed past what this store has seen
+            self._clear()
+            self._load()
+            return
+        changed = conn.execute(
+            "SELECT MAX(seq), kind, id FROM changes WHERE seq > ? GROUP BY kind, id", (self._seq,)
+        ).fetchall()
+        for seq, kind, row_id in changed:
+            self._seq = max(self._seq, seq)
+            if kind == "event":
+                old = self._events.pop(row_id, None)
+                if old is not None:
+                    for participant in old.participants:
+                        self._calendars[participant].remove(old.start, old.id)
+                row = conn.execute(
+                    "SELECT id, title, start, end, participants FROM events WHERE id = ?", (row_id,)
+                ).fetchone()
+                if row is not None:
+                    event = self._load_event(*row)
+                    self._events[event.id] = event
+                    for participant in event.participants:
+                        self._calendars[participant].add(event.start, event.end, event.id)
+            elif kind == "series":
+                row = conn.execute("SELECT * FROM series WHERE id = ?", (row_id,)).fetchone()
+                if row is not None:
+                    self._index_series(self._load_series(*row))
+            else:
+                row = conn.execute(
+                    "SELECT timezone, workday FROM working_hours WHERE participant = ?", (row_id,)
+                ).fetchone()
+                if row is not None:
+                    self._hours[row_id] = WorkingHours(row[0], *parse_workday(row[1]))
+
+    @contextmanager
+    def _writing(self) -> Iterator[sqlite3.Connection]:
+        """A transaction whose own changes the next _catch_up skips when nothing else committed first."""
+        conn = self._db()
+        with conn:
+            yield conn
+            # The write lock is held here: an unchanged data_version means no other commits
+            own = conn.execute("PRAGMA data_version").fetchone()[0] == self._data_version
+            last = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+        if own:
+            self._seq = last
+
+    def _log(self, conn: sqlite3.Connection, kind: str, ids: Iterable[str]):
+        """Record changed rows for other processes, in the caller's transaction."""
+        conn.executemany("INSERT INTO changes (kind, id) VALUES (?, ?)", ((kind, i) for i in ids))
+        last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        conn.execute("DELETE FROM changes WHERE seq <= ?", (last - CHANGE_LOG_ROWS,))
+
+    @staticmethod
+    def _load_event(event_id, title, start, end, participants) -> Event:
+        return Event(event_id, title, start, end, tuple(json.loads(participants)))
+
+    def _index(self, events: Iterable[Event]):
+        pending: Dict[str, List[Tuple[int, int, str]]] = defaultdict(list)
+        for event in events:
+            self._events[event.id] = event
+            for participant in event.participants:
+                pending[participant].append((event.start, event.end, event.id))
+        for participant, intervals in pending.items():
+            self._calendars[participant].extend(intervals)
+
+    def _load_series(self, series_id, title, start, duration, rule, participants, exdates, overrides) -> Series:
+        return Series(
+            series_id,
+            title,
+            start,
+            duration,
+            parse_rrule(rule),
+            tuple(json.loads(participants)),
+            self.tz,
+            {Date.fromisoformat(day) for day in json.loads(exdates)},
+            {Date.fromisoformat(day): tuple(span) for day, span in json.loads(overrides).items()},
+        )
+
+    def _save_series(self, conn: sqlite3.Connection, series: Series):
+        self._log(conn, "series", [series.id])
+        conn.execute(
+            "INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                series.id,
+                series.title,
+                series.start,
+                series.duration,
+                str(series.rule),
+                json.dumps(series.participants),
+                json.dumps(sorted(day.isoformat() for day in series.exdates)),
+                json.dumps({day.isoformat(): span for day, span in series.overrides.items()}),
+            ),
+        )
+
+    def _index_series(self, series: Series):
+        first, last = series.bounds()
+        self._spans[series.id] = (first, _FOREVER if last is None else last)
+        if series.id not in self._series:
+            for participant in series.participants:
+                self._series_of[participant].append(series.id)
+        self._series[series.id] = series
+        for participant in series.participants:
+            self._series_versions[participant] += 1
+
+    def _occurrences(self, participant: str, start: int, end: int) -> List[Tuple[int, int, str]]:
+        """Instances of the participant's series overlapping [start, end)."""
+        found = []
+        for series_id in self._series_of.get(participant, ()):
+            first, last = self._spans[series_id]
+            if first < end and start < last:
+                series = self._series[series_id]
+                found.extend((s, e, series.occurrence_id(day)) for s, e, day in series.occurrences(start, end))
+        return found
+
+    def _busy(self, participant: str, start: int, end: int) -> List[Tuple[int, int, str]]:
+        calendar = self._calendars.get(participant)
+        busy = [] if calendar is None else calendar.busy(start, end)
+        if participant in self._series_of:
+            busy.extend(self._occurrences(participant, start, end))
+        return busy
+
+    def _save(self, conn: sqlite3.Connection, events: Sequence[Event]):
+        self._log(conn, "event", (e.id for e in events))
+        conn.executemany(
+            "INSERT OR REPLACE INTO events (id, title, start, end, participants) VALUES (?, ?, ?, ?, ?)",
+            ((e.id, e.title, e.start, e.end, json.dumps(e.participants)) for e in events),
+        )
+
+    def add_events(self, events: Sequence[Event]):
+        """Bulk insert, for imports and benchmarks."""
+        with self._lock:
+            with self._writing() as conn:
+                self._save(conn, events)
+            self._index(events)
+
+    def create_event(self, title: str, start: int, end: int, participants: Sequence[str]) -> Event:
+        if end <= start:
+            raise ValueError("an event must end after it starts")
+        event = Event(f"evt_{uuid.uuid4().hex[:12]}", title, start, end, tuple(participants))
+        with self._lock:
+            with self._writing() as conn:
+                self._save(conn, [event])
+            self._events[event.id] = event
+            for participant in event.participants:
+                self._calendars[participant].add(start, end, event.id)
+        return event
+
+    def get(self, event_id: str) -> Optional[Event]:
+        """An event, or one occurrence of a series by its "<series id>@date" id."""
+        with self._lock:
+            self._db()
+            if "@" in event_id:
+                return self._occurrence(event_id)
+            return self._events.get(event_id)
+
+    def _instance(self, occurrence_id: str) -> Tuple[Series, Date]:
+        series_id, _, day = occurrence_id.partition("@")
+        series = self._series.get(series_id)
+        try:
+            day = Date.fromisoformat(day)
+        except ValueError:
+            raise KeyError(occurrence_id) from None
+        if series is None or day in series.exdates or not series.is_occurrence(day):
+            raise KeyError(occurrence_id)
+        return series, day
+
+    def _occurrence(self, occurrence_id: str) -> Optional[Event]:
+        try:
+            series, day = self._instance(occurrence_id)
+        except KeyError:
+            return None
+        start = series.at(day)
+        start, end = series.overrides.get(day, (start, start + series.duration))
+        return Event(occurrence_id, series.title, start, end, series.participants)
+
+    def create_series(
+        self, title: str, start: int, duration: int, rule: Rule, participants: Sequence[str]
+    ) -> Series:
+        """A recurring event from `start`, or from the rule's first date after it."""
+        if duration <= 0:
+            raise ValueError("an event must end after it starts")
+        series = Series(f"ser_{uuid.uuid4().hex[:12]}", title, start, duration, rule, tuple(participants), self.tz)
+        first = series.first.date()
+        day = next(occurrence_dates(rule, first, first), (0, None))[1]
+        if day is None:
+            raise ValueError(f"{rule} has no occurrence from {first:%Y-%m-%d}")
+        series.start = series.at(day)
+        with self._lock:
+            with self._writing() as conn:
+                self._save_series(conn, series)
+            self._index_series(series)
+        return series
+
+    def get_series(self, series_id: str) -> Optional[Series]:
+        with self._lock:
+            self._db()
+            return self._series.get(series_id)
+
+    def cancel_occurrence(self, occurrence_id: str) -> Series:
+        """Add an exception date: the occurrence no longer takes place."""
+        with self._lock:
+            self._db()
+            series, day = self._instance(occurrence_id)
+            series.exdates.add(day)
+            series.overrides.pop(day, None)
+            with self._writing() as conn:
+                self._save_series(conn, series)
+            self._index_series(series)
+            return series
+
+    def series_conflicts(self, series: Series) -> Dict[str, List[Event]]:
+        """First clashing occurrence with each event or series, per participant.
+
+        Single events are matched by jumping the series' generator to each of
+        them; other series by intersecting the two rules (first_clash).
+        """
+        with self._lock:
+            self._db()
+            first, last = series.bounds()
+            last = _FOREVER if last is None else last
+            found: Dict[str, List[Event]] = {}
+            clashes: Dict[str, Optional[Event]] = {}
+            for participant in series.participants:
+                events = []
+                calendar = self._calendars.get(participant)
+                for start, end, event_id in [] if calendar is None else calendar.busy(first, last):
+                    if next(series.occurrences(start, end), None) is not None:
+                        events.append(self._events[event_id])
+                for other_id in self._series_of.get(participant, ()):
+                    if other_id == series.id:
+                        continue
+                    if other_id not in clashes:
+                        other = self._series[other_id]
+                        clash = first_clash(series, other)
+                        clashes[other_id] = clash and self._occurrence(other.occurrence_id(clash[2]))
+                    if clashes[other_id] is not None:
+                        events.append(clashes[other_id])
+                if events:
+                    found[participant] = events
+            return found
+
+    def reschedule(self, event_id: str, start: int, end: int) -> Event:
+        """Move an event, or override one occurrence of a series."""
+        with self._lock:
+            self._db()
+            if "@" in event_id:
+                series, day = self._instance(event_id)
+                series.overrides[day] = (start, end)
+                with self._writing() as conn:
+                    self._save_series(conn, series)
+                self._index_series(series)
+                return self._occurrence(event_id)
+            event = self._events.get(event_id)
+            if event is None:
+                raise KeyError(event_id)
+            for participant in event.participants:
+                calendar = self._calendars[participant]
+                calendar.remove(event.start, event.id)
+                calendar.add(start, end, event.id)
+            event.start, event.end = start, end
+            with self._writing() as conn:
+                self._save(conn, [event])
+            return event
+
+    def conflicts(
+        self, participants: Sequence[str], start: int, end: int, exclude: Optional[str] = None
+    ) -> Dict[str, List[Event]]:
+        """Events overlapping [start, end) per participant, for those who have any."""
+        with self._lock:
+            self._db()
+            found: Dict[str, List[Event]] = {}
+            for participant in participants:
+                events = [
+                    self._occurrence(event_id) if "@" in event_id else self._events[event_id]
+                    for _, _, event_id in self._busy(participant, start, end)
+                    if event_id != exclude
+                ]
+                if events:
+                    found[participant] = events
+            return found
+
+    def busy(self, participants: Sequence[str], start: int, end: int) -> List[Tuple[int, int]]:
+        """Merged busy intervals of all `participants` within [start, end)."""
+        with self._lock:
+            self._db()
+            intervals = []
+            for participant in participants:
+                intervals.extend((s, e) for s, e, _ in self._busy(participant, start, end))
+        return merge_busy(intervals)
+
+    def free_slots(
+        self, participants: Sequence[str], start: int, end: int, duration: int
+    ) -> List[Tuple[int, int]]:
+        """Windows in [start, end) where every participant is free for `duration` seconds."""
+        return free_windows(self.busy(participants, start, end), start, end, duration)
+
+    def set_working_hours(self, participant: str, tz: str, workday: str):
+        """Time zone and "HH:MM-HH:MM" working hours of one participant."""
+        hours = WorkingHours(ZoneInfo(tz).key, *parse_workday(workday))
+        with self._lock:
+            with self._writing() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO working_hours VALUES (?, ?, ?)", (participant, tz, workday)
+                )
+                self._log(conn, "hours", [participant])
+            self._hours[participant] = hours
+
+    def working_hours(self, participant: str) -> WorkingHours:
+        with self._lock:
+            self._db()
+            return self._hours.get(participant, self.default_hours)
+
+    def versions(self, participants: Sequence[str]) -> List[int]:
+        """Change counters of the participants' calendars (0 for an empty one)."""
+        with self._lock:
+            self._db()
+            calendars, series = self._calendars, self._series_versions
+            return [
+                (calendars[p].version if p in calendars else 0) + (series[p] if p in series else 0)
+                for p in participants
+            ]
+
+    def busy_by_participant(
+        self, participants: Sequence[str], start: int, end: int
+    ) -> List[List[Tuple[int, int]]]:
+        """Unmerged busy intervals within [start, end), per participant."""
+        with self._lock:
+            self._db()
+            return [[(s, e) for s, e, _ in self._busy(participant, start, end)] for participant in participants]
+
+    def workday_bounds(self, day: Date) -> Tuple[int, int]:
+        opening, closing = self.workday
+        return (
+            int(datetime.combine(day, opening, self.tz).timestamp()),
+            int(datetime.combine(day, closing, self.tz).timestamp()),
+        )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._db()
+            return {
+                "events": len(self._events),
+                "series": len(self._series),
+                "participants": len(self._calendars),
+                "entries": sum(len(calendar) for calendar in self._calendars.values()),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._clear()
+
+    def _clear(self):
+        # Indexes are emptied rather than dropped, so their versions keep counting up
+        self._events.clear()
+        for calendar in self._calendars.values():
+            calendar.clear()
+        self._series.clear()
+        self._spans.clear()
+        self._series_of.clear()
+        for participant in self._series_versions:
+            self._series_versions[participant] += 1
+        self._hours.clear()
+
+
+# Parsing of tool arguments
+
+_WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%B %d %Y", "%b %d %Y", "%d %B %Y", "%d %b %Y")
+_TIME_RE = re.compile(r"^(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?$")
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(h|hrs?|hours?|m|mins?|minutes?)(?![a-z])")
+_EVERY_RE = re.compile(r"every\s+(?:(\d+|other)\s+)?(day|week|month|year)s?\b")
+_ADVERB_RE = re.compile(r"\b(daily|weekly|biweekly|fortnightly|monthly|yearly|annually)\b")
+_UNTIL_RE = re.compile(r"\buntil\s+(.+?)\s*$")
+_COUNT_RE = re.compile(r"\b(?:for\s+)?(\d+)\s+(?:times|occurrences|sessions|meetings)\b")
+
+
+def parse_date(text: str, today: Date) -> Date:
+    """ISO and common written dates, "today", "tomorrow" and weekday names."""
+    value = text.strip().lower().replace(",", "")
+    if value in ("today", ""):
+        return today
+    if value == "tomorrow":
+        return today + timedelta(days=1)
+    name = value.removeprefix("next ").removeprefix("this ")
+    if name in _WEEKDAYS:
+        ahead = (_WEEKDAYS.index(name) - today.weekday()) % 7
+        return today + timedelta(days=ahead or 7)
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    for fmt in ("%B %d", "%b %d"):
+        try:
+            parsed = datetime.strptime(value, fmt).date().replace(year=today.year)
+            return parsed if parsed >= today else parsed.replace(year=today.year + 1)
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognised date {text!r}; use YYYY-MM-DD, 'tomorrow' or a weekday")
+
+
+def parse_time(text: str) -> Time:
+    """24-hour "14:30", "2pm", "2:30 pm", "noon"."""
+    value = text.strip().lower()
+    if value == "noon":
+        return Time(12, 0)
+    match = _TIME_RE.match(value)
+    if not match:
+        raise ValueError(f"unrecognised time {text!r}; use HH:MM or e.g. 2pm")
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if match.group(3):
+        hour = hour % 12 + (12 if match.group(3).startswith("p") else 0)
+    if hour > 23 or minute > 59:
+        raise ValueError(f"unrecognised time {text!r}")
+    return Time(hour, minute)
+
+
+def parse_duration(text: str) -> int:
+    """Seconds in "1 hour", "30 minutes", "1h30m", "90 min"."""
+    matches = _DURATION_RE.findall(text.strip().lower())
+    if not matches:
+        raise ValueError(f"unrecognised duration {text!r}; use e.g. '30 minutes' or '1 hour'")
+    seconds = int(sum(float(amount) * (3600 if unit.startswith("h") else 60) for amount, unit in matches))
+    if seconds <= 0:
+        raise ValueError(f"duration {text!r} must be longer than zero")
+    return seconds
+
+
+def parse_participants(text: str) -> List[str]:
+    """Distinct, lowercased names or addresses from a comma or 'and' separated list."""
+    names = re.split(r",|;|\band\b|&", text.lower())
+    return list(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+def parse_repeat(text: str, today: Date) -> Rule:
+    """An RRULE, or "weekly", "every 2 weeks on monday and thursday",
+    "weekdays until 2026-12-18", "daily for 10 times" and the like."""
+    value = text.strip()
+    if value.upper().startswith(("FREQ=", "RRULE:")):
+        return parse_rrule(value)
+    value = value.lower()
+    until = count = None
+    match = _UNTIL_RE.search(value)
+    if match:
+        until = parse_date(match.group(1), today)
+        value = value[: match.start()]
+    match = _COUNT_RE.search(value)
+    if match:
+        count = int(match.group(1))
+        value = value[: match.start()] + value[match.end() :]
+    # "mon", "monday" or "mondays", but not "month"
+    byday = tuple(
+        i for i, day in enumerate(_WEEKDAYS) if re.search(rf"\b{day[:3]}(?:{day[3:]})?s?\b", value)
+    )
+
+    freq, interval = None, 1
+    match = _EVERY_RE.search(value)
+    if "weekday" in value:
+        freq, byday = "WEEKLY", (0, 1, 2, 3, 4)
+    elif match:
+        freq = {"day": "DAILY", "week": "WEEKLY", "month": "MONTHLY", "year": "YEARLY"}[match.group(2)]
+        amount = match.group(1)
+        interval = 2 if amount == "other" else int(amount or 1)
+    else:
+        match = _ADVERB_RE.search(value)
+        if match:
+            word = match.group(1)
+            freq = {"daily": "DAILY", "monthly": "MONTHLY", "yearly": "YEARLY", "annually": "YEARLY"}.get(
+                word, "WEEKLY"
+            )
+            interval = 2 if word in ("biweekly", "fortnightly") else 1
+        elif byday:
+            freq = "WEEKLY"
+    if freq is None:
+        raise ValueError(f"unrecognised repeat {text!r}; use e.g. 'weekly on monday' or an RRULE")
+    if freq == "DAILY" and byday:
+        freq, interval = "WEEKLY", 1
+    return Rule(freq, interval, byday if freq == "WEEKLY" else (), count, until)
+
+
+def parse_workday(text: str) -> Tuple[Time, Time]:
+    opening, _, closing = text.partition("-")
+    return parse_time(opening), parse_time(closing)
+
+
+def format_time(seconds: int, tz: tzinfo) -> str:
+    return datetime.fromtimestamp(seconds, tz).strftime("%a %Y-%m-%d %H:%M")
+
+
+# Process-wide store; the file is opened by the first tool call
+calendar_store = CalendarStore()
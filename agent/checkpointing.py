@@ -0,0 +1,710 @@
+"""
+Checkpointer selection: a bounded in-memory saver and a compacting SQLite saver.
+
+CHECKPOINTER picks the implementation used by main_graph:
+- "memory" (default): BoundedMemorySaver, an in-process saver with eviction
+- "sqlite": SqliteCompactingSaver, a local file shared by all worker processes
+
+In-memory settings:
+- MEMORY_SAVER_MAX_BYTES (default 256 MiB): budget for serialized checkpoint data
+- MEMORY_SAVER_MAX_THREADS (default 0, unlimited): resident thread cap
+- MEMORY_SAVER_TTL (default 3600s, 0 disables): evict threads idle this long
+- MEMORY_SAVER_SPILL_DIR (unset by default): spill evicted threads here instead of dropping them
+
+SQLite settings:
+- CHECKPOINT_DB_PATH (default .checkpoints/checkpoints.sqlite)
+- CHECKPOINT_KEEP_LAST (default 20): checkpoints retained per thread and namespace
+- CHECKPOINT_COMPRESSION_LEVEL (default 6): zlib level for stored blobs, 0 disables
+"""
+
+import asyncio
+import hashlib
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    data BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS refs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, channel)
+);
+CREATE INDEX IF NOT EXISTS refs_blob ON refs (thread_id, checkpoint_ns, channel, version);
+"""
+
+
+class SqliteCompactingSaver(BaseCheckpointSaver[str]):
+    """
+    SQLite (WAL) checkpointer that stores changed channels and prunes old checkpoints.
+
+    Like LangGraph's own savers, each checkpoint row only records channel
+    versions; a channel value is written to the blobs table once per version,
+    so a step that touches two channels stores two blobs rather than the whole
+    state. Deduplication stops there: a changed channel is stored whole, so
+    every turn serializes and compresses the full `messages` list again, and
+    with it the per-thread write grows with the conversation. Only `keep_last`
+    bounds what is kept. Blobs are zlib-compressed. The (channel, version)
+    pairs of each checkpoint are also recorded in the refs table, so pruning
+    finds orphaned blobs in SQL without deserializing the checkpoints it
+    keeps.
+
+    Compaction covers a thread's namespaces together. Each keeps its latest
+    `keep_last` checkpoints, and a subgraph namespace (a specialist's agent
+    writes under a new one every turn) is dropped once its newest checkpoint
+    is older than every retained root checkpoint. Pruning also drops the
+    pending writes of removed checkpoints and any blob no longer referenced.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        keep_last: Optional[int] = None,
+        compression_level: Optional[int] = None,
+        compact_every: int = 1,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path or os.getenv("CHECKPOINT_DB_PATH", ".checkpoints/checkpoints.sqlite")
+        self.keep_last = (
+            keep_last if keep_last is not None else int(os.getenv("CHECKPOINT_KEEP_LAST", "20"))
+        )
+        self.compression_level = (
+            compression_level
+            if compression_level is not None
+            else int(os.getenv("CHECKPOINT_COMPRESSION_LEVEL", "6"))
+        )
+        self.compact_every = compact_every
+        self._puts_since_compaction: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(_SCHEMA)
+
+    # -- serialization ------------------------------------------------------
+
+    def _dump(self, value: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        if self.compression_level > 0:
+            return f"z:{type_}", zlib.compress(data, self.compression_level)
+        return type_, data
+
+    def _load(self, type_: str, data: bytes) -> Any:
+        if type_.startswith("z:"):
+            return self.serde.loads_typed((type_[2:], zlib.decompress(data)))
+        return self.serde.loads_typed((type_, data))
+
+    # -- reads --------------------------------------------------------------
+
+    def _load_blobs(
+        self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions
+    ) -> Dict[str, Any]:
+        channel_values: Dict[str, Any] = {}
+        for channel, version in versions.items():
+            row = self.conn.execute(
+                "SELECT type, data FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row and row[0] != "empty":
+                channel_values[channel] = self._load(row[0], row[1])
+        return channel_values
+
+    def _tuple_from_row(self, row) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, data, metadata_type, metadata = row
+        checkpoint: Checkpoint = self._load(type_, data)
+        writes = self.conn.execute(
+            "SELECT task_id, channel, type, data FROM writes WHERE thread_id = ? "
+            "AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_blobs(
+                    thread_id, checkpoint_ns, checkpoint["channel_versions"]
+                ),
+            },
+            metadata=self._load(metadata_type, metadata),
+            pending_writes=[
+                (task_id, channel, self._load(w_type, w_data))
+                for task_id, channel, w_type, w_data in writes
+            ],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._tuple_from_row(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = "SELECT * FROM checkpoints"
+        clauses: List[str] = []
+        params: List[Any] = []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+            results = []
+            for row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                if filter:
+                    metadata = self._load(row[6], row[7])
+                    if not all(metadata.get(key) == value for key, value in filter.items()):
+                        continue
+                results.append(self._tuple_from_row(row))
+        yield from results
+
+    # -- writes -------------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values: Dict[str, Any] = stored.pop("channel_values")  # type: ignore[misc]
+
+        # Only channels that changed in this step get a new blob
+        blobs = []
+        for channel, version in new_versions.items():
+            type_, data = self._dump(values[channel]) if channel in values else ("empty", b"")
+            blobs.append((thread_id, checkpoint_ns, channel, str(version), type_, data))
+
+        refs = [
+            (thread_id, checkpoint_ns, checkpoint["id"], channel, str(version))
+            for channel, version in checkpoint["channel_versions"].items()
+        ]
+
+        type_, data = self._dump(stored)
+        metadata_type, metadata_data = self._dump(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            # Take the write lock up front; other worker processes share this file
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint["id"],
+                        config["configurable"].get("checkpoint_id"),
+                        type_,
+                        data,
+                        metadata_type,
+                        metadata_data,
+                    ),
+                )
+                self.conn.execute(
+                    "DELETE FROM refs WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint["id"]),
+                )
+                self.conn.executemany("INSERT INTO refs VALUES (?, ?, ?, ?, ?)", refs)
+                self._puts_since_compaction[thread_id] += 1
+                if self._puts_since_compaction[thread_id] >= self.compact_every:
+                    self._puts_since_compaction[thread_id] = 0
+                    self._compact(thread_id)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def _compact(self, thread_id: str):
+        """Drop a thread's checkpoints beyond keep_last, stale subgraph namespaces, their writes and orphaned blobs."""
+        if self.keep_last <= 0:
+            return
+        # Oldest root checkpoint still retained; ids are time-ordered across namespaces
+        cutoff = self.conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, self.keep_last - 1),
+        ).fetchone()
+        stale = self.conn.execute(
+            """
+            SELECT checkpoint_ns, checkpoint_id FROM (
+                SELECT checkpoint_ns, checkpoint_id,
+                    ROW_NUMBER() OVER (PARTITION BY checkpoint_ns ORDER BY checkpoint_id DESC) AS age,
+                    MAX(checkpoint_id) OVER (PARTITION BY checkpoint_ns) AS newest
+                FROM checkpoints WHERE thread_id = ?
+            )
+            WHERE age > ? OR (checkpoint_ns != '' AND newest < ?)
+            """,
+            (thread_id, self.keep_last, cutoff[0] if cutoff else ""),
+        ).fetchall()
+        if not stale:
+            return
+
+        for table in ("checkpoints", "writes", "refs"):
+            self.conn.executemany(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_ns, checkpoint_id in stale],
+            )
+        self.conn.execute(
+            "DELETE FROM blobs WHERE thread_id = ? AND NOT EXISTS ("
+            "SELECT 1 FROM refs WHERE refs.thread_id = blobs.thread_id "
+            "AND refs.checkpoint_ns = blobs.checkpoint_ns AND refs.channel = blobs.channel "
+            "AND refs.version = blobs.version)",
+            (thread_id,),
+        )
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special writes (errors, interrupts) replace; regular writes are idempotent
+        verb = "INSERT OR REPLACE" if all(c in WRITES_IDX_MAP for c, _ in writes) else "INSERT OR IGNORE"
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self._dump(value)
+            rows.append(
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint_id,
+                    task_id,
+                    WRITES_IDX_MAP.get(channel, idx),
+                    channel,
+                    type_,
+                    data,
+                    task_path,
+                )
+            )
+        with self._lock:
+            self.conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for table in ("checkpoints", "blobs", "writes", "refs"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same sortable "<counter>.<random>" scheme as MemorySaver
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # -- async API (SQLite calls run in a worker thread) ----------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def close(self):
+        self.conn.close()
+
+
+def _typed_size(typed: Tuple[str, bytes]) -> int:
+    return len(typed[0]) + len(typed[1])
+
+
+# Copied to examples/coagents-research-canvas/agent/research_canvas/langgraph/checkpointer.py,
+# which cannot import this package; keep the two in step
+class BoundedMemorySaver(MemorySaver):
+    """
+    MemorySaver that forgets idle threads and stays within a byte budget.
+
+    Each thread's footprint is the serialized size of its checkpoints, channel
+    blobs and pending writes. After every write, threads idle for longer than
+    `ttl` are evicted, then least-recently-used threads until the total fits
+    `max_bytes` and `max_threads`. The thread being written is never evicted,
+    so a single thread larger than the budget stays resident until it goes
+    idle. With a spill directory, evicted threads are pickled there and loaded
+    back transparently on their next access; otherwise they are dropped.
+
+    `list(None)` only sees resident threads.
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        max_threads: Optional[int] = None,
+        ttl: Optional[float] = None,
+        spill_dir: Optional[str] = None,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.max_bytes = (
+            max_bytes
+            if max_bytes is not None
+            else int(os.getenv("MEMORY_SAVER_MAX_BYTES", str(256 * 1024 * 1024)))
+        )
+        self.max_threads = (
+            max_threads if max_threads is not None else int(os.getenv("MEMORY_SAVER_MAX_THREADS", "0"))
+        )
+        self.ttl = ttl if ttl is not None else float(os.getenv("MEMORY_SAVER_TTL", "3600"))
+        self.spill_dir = spill_dir or os.getenv("MEMORY_SAVER_SPILL_DIR") or None
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+        # thread_id -> last access (monotonic), least recently used first
+        self._resident: "OrderedDict[str, float]" = OrderedDict()
+        self._sizes: Dict[str, int] = defaultdict(int)
+        self._blob_keys: Dict[str, Set[tuple]] = defaultdict(set)
+        self._write_keys: Dict[str, Set[tuple]] = defaultdict(set)
+        self._bytes = 0
+        self._rlock = threading.RLock()
+        self.counters = {"evictions": 0, "ttl_evictions": 0, "spills": 0, "reloads": 0, "dropped": 0}
+
+    # -- bookkeeping --------------------------------------------------------
+
+    def _spill_path(self, thread_id: str) -> str:
+        return os.path.join(self.spill_dir, hashlib.sha256(thread_id.encode()).hexdigest() + ".pkl")
+
+    def _touch(self, thread_id: str, create: bool = False):
+        """Mark a thread as used, reloading it from the spill directory if needed."""
+        if thread_id not in self._resident and self.spill_dir:
+            if os.path.exists(self._spill_path(thread_id)):
+                self._reload(thread_id)
+                self._enforce(thread_id)
+        if thread_id in self._resident or create:
+            self._resident[thread_id] = time.monotonic()
+            self._resident.move_to_end(thread_id)
+
+    def _forget_unknown(self, thread_id: str):
+        # MemorySaver's reads create empty defaultdict entries for unknown threads
+        if thread_id not in self._resident:
+            self.storage.pop(thread_id, None)
+
+    def _grow(self, thread_id: str, delta: int):
+        self._sizes[thread_id] += delta
+        self._bytes += delta
+
+    def _evict(self, thread_id: str, expired: bool = False):
+        payload = {
+            "storage": dict(self.storage.pop(thread_id, {})),
+            "writes": {key: self.writes.pop(key) for key in self._write_keys.pop(thread_id, ()) if key in self.writes},
+            "blobs": {key: self.blobs.pop(key) for key in self._blob_keys.pop(thread_id, ()) if key in self.blobs},
+        }
+        size = self._sizes.pop(thread_id, 0)
+        self._bytes -= size
+        del self._resident[thread_id]
+
+        self.counters["evictions"] += 1
+        if expired:
+            self.counters["ttl_evictions"] += 1
+        if self.spill_dir:
+            payload["size"] = size
+            path = self._spill_path(thread_id)
+            with open(path + ".tmp", "wb") as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + ".tmp", path)
+            self.counters["spills"] += 1
+        else:
+            self.counters["dropped"] += 1
+
+    def _reload(self, thread_id: str):
+        path = self._spill_path(thread_id)
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        os.remove(path)
+
+        self.storage[thread_id] = defaultdict(dict, payload["storage"])
+        self.writes.update(payload["writes"])
+        self.blobs.update(payload["blobs"])
+        self._write_keys[thread_id] = set(payload["writes"])
+        self._blob_keys[thread_id] = set(payload["blobs"])
+        self._grow(thread_id, payload["size"])
+        self._resident[thread_id] = time.monotonic()
+        self.counters["reloads"] += 1
+
+    def _enforce(self, current: str):
+        """Evict expired threads, then LRU threads until within budget."""
+        if self.ttl > 0:
+            now = time.monotonic()
+            for thread_id, last_access in list(self._resident.items()):
+                if now - last_access <= self.ttl:
+                    break
+                if thread_id != current:
+                    self._evict(thread_id, expired=True)
+
+        def over_budget() -> bool:
+            return self._bytes > self.max_bytes or (
+                self.max_threads > 0 and len(self._resident) > self.max_threads
+            )
+
+        while over_budget() and len(self._resident) > 1:
+            oldest = next(iter(self._resident))
+            if oldest == current:
+                break
+            self._evict(oldest)
+
+    # -- saver API ----------------------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._rlock:
+            self._touch(thread_id)
+            result = super().get_tuple(config)
+            self._forget_unknown(thread_id)
+            return result
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        with self._rlock:
+            if config:
+                self._touch(config["configurable"]["thread_id"])
+            results = list(super().list(config, filter=filter, before=before, limit=limit))
+            if config:
+                self._forget_unknown(config["configurable"]["thread_id"])
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._rlock:
+            self._touch(thread_id, create=True)
+            result = super().put(config, checkpoint, metadata, new_versions)
+
+            saved, saved_metadata, _ = self.storage[thread_id][checkpoint_ns][checkpoint["id"]]
+            size = _typed_size(saved) + _typed_size(saved_metadata)
+            for channel, version in new_versions.items():
+                key = (thread_id, checkpoint_ns, channel, version)
+                if key not in self._blob_keys[thread_id]:
+                    self._blob_keys[thread_id].add(key)
+                    size += _typed_size(self.blobs[key])
+            self._grow(thread_id, size)
+            self._enforce(thread_id)
+            return result
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        key = (
+            thread_id,
+            config["configurable"].get("checkpoint_ns", ""),
+            config["configurable"]["checkpoint_id"],
+        )
+
+        def writes_size() -> int:
+            return sum(_typed_size(write[2]) for write in self.writes.get(key, {}).values())
+
+        with self._rlock:
+            self._touch(thread_id, create=True)
+            before = writes_size()
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys[thread_id].add(key)
+            self._grow(thread_id, writes_size() - before)
+            self._enforce(thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._rlock:
+            super().delete_thread(thread_id)
+            self._bytes -= self._sizes.pop(thread_id, 0)
+            self._resident.pop(thread_id, None)
+            self._blob_keys.pop(thread_id, None)
+            self._write_keys.pop(thread_id, None)
+            if self.spill_dir and os.path.exists(self._spill_path(thread_id)):
+                os.remove(self._spill_path(thread_id))
+
+    def stats(self) -> Dict[str, Any]:
+        """Resident footprint and eviction/reload counters."""
+        with self._rlock:
+            return {
+                "resident_threads": len(self._resident),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_threads": self.max_threads,
+                "ttl_seconds": self.ttl,
+                "spill_dir": self.spill_dir,
+                **self.counters,
+            }
+
+
+CHECKPOINTERS = ("memory", "sqlite")
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """Build the checkpointer selected by the CHECKPOINTER environment variable."""
+    kind = os.getenv("CHECKPOINTER", "memory")
+    if kind not in CHECKPOINTERS:
+        raise ValueError(f"CHECKPOINTER must be one of {CHECKPOINTERS}, got {kind!r}")
+    if kind == "sqlite":
+        return SqliteCompactingSaver()
+    return BoundedMemorySaver()
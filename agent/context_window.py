@@ -0,0 +1,258 @@
+"""
+Token-budgeted conversation windowing with a rolling summary.
+
+Every LLM call used to receive the whole `state["messages"]`, so prompt size
+(and prefill latency) grew without bound over a thread. Two pieces keep it flat:
+
+- context_node runs once per turn before the first LLM-calling node. Once more
+  than 2 x CONTEXT_KEEP_TURNS turns are unsummarized, it folds all but the
+  last CONTEXT_KEEP_TURNS into `conversation_summary`. The summary is marked
+  by `summary_cursor`, the id of the last message it covers. The message
+  history itself is left untouched for the frontend.
+- window() builds each call's view: whole turns from a start turn to the
+  newest, then the summary. The current turn is always kept, so tool calls and
+  their results are never split.
+
+Prompts are [static system prompt] + [history] + [volatile context] so local
+backends can reuse their prefix cache (prompts.py). A window that dropped its
+oldest turn every turn would change the history's first message on every call
+and discard the cached prefix. The window therefore starts at the first
+unsummarized turn or at a turn index that is a multiple of CONTEXT_KEEP_TURNS,
+the earliest of these that fits the budget: it stays put while the
+conversation grows and jumps CONTEXT_KEEP_TURNS turns at a time. The summary is
+rewritten every few turns, so it goes at the end of the window, in the volatile
+tail, rather than ahead of the history. A call then carries between roughly
+the budget less CONTEXT_KEEP_TURNS turns and the full budget.
+
+Environment:
+- CONTEXT_KEEP_TURNS (default 4): turns kept verbatim after summarizing, and
+  the step in which the window's start moves
+- CONTEXT_BUDGET_<ROLE>: per-role token budget, 0 disables windowing
+  (defaults: supervisor 1024, specialists 6000, assistant 8000)
+"""
+
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+
+from llm import get_model
+
+# Routing needs the latest request, not the whole thread
+ROLE_BUDGETS: Dict[str, int] = {
+    "supervisor": 1024,
+    "email": 6000,
+    "scheduler": 6000,
+    "research": 6000,
+    "assistant": 8000,
+}
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and a multi-agent assistant (email, scheduling, research).
+Merge the new conversation turns into the existing summary. Keep names, email recipients, dates, times, meeting details, research topics, decisions and open requests. Drop pleasantries and tool formatting.
+Reply with the updated summary only, at most 200 words."""
+
+
+def estimate_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Approximate prompt tokens for a list of messages."""
+    return count_tokens_approximately(messages) if messages else 0
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into turns, each starting at a user message."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def render_transcript(messages: Sequence[BaseMessage]) -> str:
+    """Compact plain-text transcript used as summarizer input."""
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {message.content}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"Tool result: {str(message.content)[:300]}")
+        elif isinstance(message, AIMessage):
+            for tool_call in message.tool_calls or []:
+                lines.append(f"Assistant called {tool_call['name']}({tool_call.get('args', {})})")
+            if message.content:
+                lines.append(f"Assistant: {message.content}")
+    return "\n".join(lines)
+
+
+class ContextStats:
+    """Prompt tokens before and after windowing, per role."""
+
+    def __init__(self):
+        self.by_role: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"calls": 0, "tokens_full": 0, "tokens_sent": 0}
+        )
+        self.turns = 0
+        self.summaries = 0
+        self._lock = threading.Lock()
+
+    def record(self, role: str, tokens_full: int, tokens_sent: int):
+        with self._lock:
+            stats = self.by_role[role]
+            stats["calls"] += 1
+            stats["tokens_full"] += tokens_full
+            stats["tokens_sent"] += tokens_sent
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            roles = {}
+            for role, stats in self.by_role.items():
+                saved = stats["tokens_full"] - stats["tokens_sent"]
+                roles[role] = {
+                    **stats,
+                    "tokens_saved": saved,
+                    "mean_saved_per_call": round(saved / stats["calls"], 1),
+                }
+            total_saved = sum(role["tokens_saved"] for role in roles.values())
+            return {
+                "turns": self.turns,
+                "summaries": self.summaries,
+                "tokens_saved": total_saved,
+                "mean_saved_per_turn": round(total_saved / self.turns, 1) if self.turns else 0.0,
+                "by_role": roles,
+            }
+
+
+class ContextManager:
+    """Applies per-role token budgets and maintains the rolling summary."""
+
+    def __init__(self):
+        self.keep_turns = max(1, int(os.getenv("CONTEXT_KEEP_TURNS", "4")))
+        self.stats = ContextStats()
+        self._model = None
+
+    @property
+    def model(self):
+        # Resolved lazily so importing this module never builds a client
+        if self._model is None:
+            self._model = get_model("summarizer")
+        return self._model
+
+    def budget(self, role: str) -> int:
+        default = ROLE_BUDGETS.get(role, ROLE_BUDGETS["assistant"])
+        return int(os.getenv(f"CONTEXT_BUDGET_{role.upper()}", str(default)))
+
+    def unsummarized(self, state: Dict[str, Any], messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """Messages after the summary cursor (all of them if there is no summary)."""
+        cursor = state.get("summary_cursor")
+        if state.get("conversation_summary") and cursor:
+            for index in range(len(messages) - 1, -1, -1):
+                if getattr(messages[index], "id", None) == cursor:
+                    return list(messages[index + 1 :])
+        return list(messages)
+
+    def summary_message(self, state: Dict[str, Any]) -> Optional[SystemMessage]:
+        summary = state.get("conversation_summary")
+        if not summary:
+            return None
+        return SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+
+    def window(
+        self,
+        state: Dict[str, Any],
+        role: str,
+        messages: Optional[Sequence[BaseMessage]] = None,
+    ) -> List[BaseMessage]:
+        """Return the newest whole turns that fit the role's budget, from a stable start turn, then the summary."""
+        messages = list(state.get("messages", []) if messages is None else messages)
+        budget = self.budget(role)
+        if budget <= 0:
+            return messages
+
+        recent = self.unsummarized(state, messages)
+        summary = self.summary_message(state) if len(recent) < len(messages) else None
+        remaining = budget - (estimate_tokens([summary]) if summary else 0)
+
+        turns = split_turns(messages)
+        # Turn indices count from the start of the thread, so they do not move when the summary does
+        first = len(turns) - len(split_turns(recent))
+        costs = [estimate_tokens(turn) for turn in turns[first:]]
+        candidates = [first, *range(first - first % self.keep_turns + self.keep_turns, len(turns), self.keep_turns)]
+        # The current turn is always sent, even when it alone exceeds the budget
+        start = max(first, len(turns) - 1)
+        for candidate in candidates:
+            if sum(costs[candidate - first :]) <= remaining:
+                start = candidate
+                break
+
+        windowed = [m for turn in turns[start:] for m in turn] + ([summary] if summary else [])
+        self.stats.record(role, estimate_tokens(messages), estimate_tokens(windowed))
+        return windowed
+
+    async def summarize(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Graph node: fold turns older than the verbatim window into the summary."""
+        self.stats.turns += 1
+        messages = state.get("messages", [])
+        recent = self.unsummarized(state, messages)
+        turns = split_turns(recent)
+        # Summarize in batches of keep_turns so this costs one call every few turns
+        if len(turns) < 2 * self.keep_turns:
+            return {}
+
+        aged = [message for turn in turns[: -self.keep_turns] for message in turn]
+        cursor = getattr(aged[-1], "id", None)
+        if cursor is None:
+            return {}
+        previous = state.get("conversation_summary") if len(recent) < len(messages) else ""
+        try:
+            response = await self.model.ainvoke(
+                [
+                    SystemMessage(content=SUMMARY_PROMPT),
+                    HumanMessage(
+                        content=f"Existing summary:\n{previous or '(none)'}\n\n"
+                        f"New conversation turns:\n{render_transcript(aged)}"
+                    ),
+                ]
+            )
+        except Exception:
+            # Windowing still enforces the budget; retry on a later turn
+            return {}
+
+        self.stats.summaries += 1
+        return {"conversation_summary": str(response.content).strip(), "summary_cursor": cursor}
+
+    def middleware(self, role: str) -> AgentMiddleware:
+        """Middleware that windows create_agent model requests to the role's budget."""
+        return _WindowMiddleware(self, role)
+
+
+class _WindowMiddleware(AgentMiddleware):
+    """Replaces each model request's messages with the budgeted window."""
+
+    def __init__(self, manager: ContextManager, role: str):
+        super().__init__()
+        self.manager = manager
+        self.role = role
+
+    def _windowed(self, request: ModelRequest) -> ModelRequest:
+        return request.override(
+            messages=self.manager.window(request.state or {}, self.role, request.messages)
+        )
+
+    def wrap_model_call(self, request, handler):
+        return handler(self._windowed(request))
+
+    async def awrap_model_call(self, request, handler):
+        return await handler(self._windowed(request))
+
+
+# Process-wide manager shared by all agents
+context_manager = ContextManager()
@@ -0,0 +1,273 @@
+"""
+Free/busy bitmaps for multi-participant slot search.
+
+Each participant's availability over a search window is a bitmap of
+CALENDAR_SLOT_MINUTES slots: set where they are within their working hours (in
+their own time zone) and have no event. Bitmaps are packed eight slots to a
+byte and cached per participant until their calendar changes. A search ANDs
+the packed rows of all participants, unpacks the single result, and finds
+every start with enough free slots in a row from a cumulative sum.
+
+Candidates are ranked by:
+- fewest participants in the first or last hour of their working day
+- starting on the hour or half hour
+- earliest
+The top k are picked so that they do not overlap each other. When the
+calendars leave no common slot, the slots where the most participants are
+free are offered instead, with who would miss them.
+
+Environment:
+- CALENDAR_SLOT_MINUTES (default 15)
+- CALENDAR_TOP_SLOTS (default 5)
+- CALENDAR_BITMAP_CACHE (default 4096): participant bitmaps kept
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from calendar_store import CalendarStore, WorkingHours, calendar_store
+
+# Slots at either end of the working day that count against a candidate
+EDGE_SECONDS = 3600
+
+
+@dataclass(frozen=True)
+class SlotGrid:
+    """`slots` consecutive slots of `slot_seconds` from epoch second `start`."""
+
+    start: int
+    slots: int
+    slot_seconds: int
+
+    @classmethod
+    def covering(cls, start: int, end: int, slot_seconds: int) -> "SlotGrid":
+        first = start // slot_seconds * slot_seconds
+        return cls(first, -(-(end - first) // slot_seconds), slot_seconds)
+
+    def time(self, slot: int) -> int:
+        return self.start + slot * self.slot_seconds
+
+
+@dataclass(frozen=True)
+class Slot:
+    start: int
+    end: int
+    missing: Tuple[str, ...] = ()
+
+
+@lru_cache(maxsize=256)
+def working_mask(hours: WorkingHours, grid: SlotGrid) -> Tuple[np.ndarray, np.ndarray]:
+    """Slots inside the working hours, and those within EDGE_SECONDS of either end."""
+    mask = np.zeros(grid.slots, dtype=bool)
+    edge = np.zeros(grid.slots, dtype=bool)
+    tz = ZoneInfo(hours.tz)
+    end = grid.time(grid.slots)
+    day = datetime.fromtimestamp(grid.start, tz).date()
+    while True:
+        opening = int(datetime.combine(day, hours.opening, tz).timestamp())
+        if opening >= end:
+            break
+        if day.weekday() in hours.weekdays:
+            closing = int(datetime.combine(day, hours.closing, tz).timestamp())
+            first = max(0, -(-(opening - grid.start) // grid.slot_seconds))
+            last = min(grid.slots, (closing - grid.start) // grid.slot_seconds)
+            if last > first:
+                mask[first:last] = True
+                edge_slots = EDGE_SECONDS // grid.slot_seconds
+                edge[first : first + edge_slots] = True
+                edge[max(first, last - edge_slots) : last] = True
+        day += timedelta(days=1)
+    mask.flags.writeable = edge.flags.writeable = False
+    return mask, edge & mask
+
+
+def busy_rows(busy: Sequence[Sequence[Tuple[int, int]]], grid: SlotGrid) -> np.ndarray:
+    """Boolean matrix, one row per participant, set on slots an event touches."""
+    width = grid.slots + 1
+    size = len(busy) * width
+    rows = np.repeat(np.arange(len(busy), dtype=np.int64) * width, [len(intervals) for intervals in busy])
+    if not len(rows):
+        return np.zeros((len(busy), grid.slots), dtype=bool)
+    bounds = np.array([interval for intervals in busy for interval in intervals], dtype=np.int64)
+    first = np.clip((bounds[:, 0] - grid.start) // grid.slot_seconds, 0, grid.slots)
+    last = np.clip(-(-(bounds[:, 1] - grid.start) // grid.slot_seconds), 0, grid.slots)
+    # Difference array: +1 where an event starts, -1 after it ends
+    counts = np.bincount(rows + first, minlength=size) - np.bincount(rows + last, minlength=size)
+    return np.cumsum(counts.reshape(len(busy), width), axis=1)[:, : grid.slots] > 0
+
+
+def run_starts(free: np.ndarray, length: int) -> np.ndarray:
+    """Slots that begin `length` free slots in a row."""
+    if length <= 0:
+        raise ValueError(f"run length must be positive, got {length}")
+    if length > len(free):
+        return np.zeros(0, dtype=np.int64)
+    totals = np.concatenate(([0], np.cumsum(free, dtype=np.int64)))
+    return np.flatnonzero(totals[length:] - totals[:-length] == length)
+
+
+class FreeBusySearch:
+    """Top-k common free slots for a group, from cached per-participant bitmaps."""
+
+    def __init__(
+        self,
+        store: CalendarStore,
+        slot_minutes: Optional[int] = None,
+        top_k: Optional[int] = None,
+        cache_size: Optional[int] = None,
+    ):
+        self.store = store
+        self.slot_seconds = 60 * (slot_minutes or int(os.getenv("CALENDAR_SLOT_MINUTES", "15")))
+        if EDGE_SECONDS % self.slot_seconds or 1800 % self.slot_seconds:
+            raise ValueError("CALENDAR_SLOT_MINUTES must divide 30")
+        self.top_k = top_k or int(os.getenv("CALENDAR_TOP_SLOTS", "5"))
+        self.cache_size = cache_size or int(os.getenv("CALENDAR_BITMAP_CACHE", "4096"))
+        # participant -> (calendar version, hours, grid, packed free bitmap)
+        self._cache: "OrderedDict[str, Tuple[int, WorkingHours, SlotGrid, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def bitmaps(self, participants: Sequence[str], grid: SlotGrid) -> np.ndarray:
+        """Packed free bitmaps, one row per participant."""
+        versions = self.store.versions(participants)
+        hours = [self.store.working_hours(participant) for participant in participants]
+        packed = np.empty((len(participants), -(-grid.slots // 8)), dtype=np.uint8)
+        stale = []
+        with self._lock:
+            for row, participant in enumerate(participants):
+                cached = self._cache.get(participant)
+                if cached is not None and cached[:3] == (versions[row], hours[row], grid):
+                    self._cache.move_to_end(participant)
+                    packed[row] = cached[3]
+                    self.hits += 1
+                else:
+                    stale.append(row)
+            self.misses += len(stale)
+        if not stale:
+            return packed
+
+        busy = self.store.busy_by_participant(
+            [participants[row] for row in stale], grid.start, grid.time(grid.slots)
+        )
+        free = ~busy_rows(busy, grid)
+        for i, row in enumerate(stale):
+            free[i] &= working_mask(hours[row], grid)[0]
+        fresh = np.packbits(free, axis=1)
+        packed[stale] = fresh
+        with self._lock:
+            for i, row in enumerate(stale):
+                self._cache[participants[row]] = (versions[row], hours[row], grid, fresh[i])
+                self._cache.move_to_end(participants[row])
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return packed
+
+    def search(
+        self,
+        participants: Sequence[str],
+        start: int,
+        end: int,
+        duration: int,
+        top_k: Optional[int] = None,
+        not_before: Optional[int] = None,
+    ) -> List[Slot]:
+        """Best non-overlapping slots of `duration` seconds in [start, end).
+
+        `not_before` (such as now) trims the window without moving the grid, so
+        cached bitmaps stay valid.
+        """
+        top_k = top_k or self.top_k
+        grid = SlotGrid.covering(start, end, self.slot_seconds)
+        length = -(-duration // self.slot_seconds)
+        # Slots before this one start too early
+        first = max(0, -(-(max(start, not_before or start) - grid.start) // self.slot_seconds))
+        packed = self.bitmaps(participants, grid)
+        common = np.unpackbits(np.bitwise_and.reduce(packed, axis=0), count=grid.slots).astype(bool)
+        common[:first] = False
+        candidates = run_starts(common, length)
+        # Per participant, whether they are free at each candidate (partial matches only)
+        attends: Optional[np.ndarray] = None
+        if not len(candidates):
+            candidates, attends = self._partial(packed, grid, first, length)
+        if not len(candidates):
+            return []
+
+        order = np.lexsort(
+            (
+                candidates,
+                self._misaligned(candidates, grid),
+                self._edge_penalty(participants, candidates, grid, length),
+            )
+        )
+        if attends is not None:
+            # Most participants first, then the usual ranking
+            order = order[np.argsort(-attends.sum(axis=0)[order], kind="stable")]
+        picked: List[int] = []
+        for i in order:
+            slot = int(candidates[i])
+            if all(abs(slot - other) >= length for other, _ in picked):
+                picked.append((slot, i))
+                if len(picked) == top_k:
+                    break
+        return [
+            Slot(
+                grid.time(slot),
+                grid.time(slot) + duration,
+                () if attends is None else tuple(participants[row] for row in np.flatnonzero(~attends[:, i])),
+            )
+            for slot, i in picked
+        ]
+
+    def _partial(
+        self, packed: np.ndarray, grid: SlotGrid, first: int, length: int
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Starts free for the most participants, and who is free at each."""
+        if length > grid.slots:
+            return np.zeros(0, dtype=np.int64), None
+        free = np.unpackbits(packed, axis=1, count=grid.slots).astype(bool)
+        free[:, :first] = False
+        # whole[p, i]: participant p is free for `length` slots from slot i
+        span = grid.slots - length + 1
+        whole = free[:, :span].copy()
+        for shift in range(1, length):
+            whole &= free[:, shift : shift + span]
+        attending = whole.sum(axis=0)
+        best = attending.max()
+        if best == 0:
+            return np.zeros(0, dtype=np.int64), None
+        # Anything within one participant of the best is worth offering
+        candidates = np.flatnonzero(attending >= max(1, best - 1))
+        return candidates, whole[:, candidates]
+
+    def _misaligned(self, candidates: np.ndarray, grid: SlotGrid) -> np.ndarray:
+        return ((grid.start + candidates * grid.slot_seconds) % 1800 != 0).astype(np.int8)
+
+    def _edge_penalty(
+        self, participants: Sequence[str], candidates: np.ndarray, grid: SlotGrid, length: int
+    ) -> np.ndarray:
+        """Participants for whom a candidate touches the first or last working hour."""
+        groups: Dict[WorkingHours, int] = {}
+        for participant in participants:
+            hours = self.store.working_hours(participant)
+            groups[hours] = groups.get(hours, 0) + 1
+        penalty = np.zeros(len(candidates), dtype=np.int64)
+        for hours, count in groups.items():
+            edge = working_mask(hours, grid)[1]
+            totals = np.concatenate(([0], np.cumsum(edge, dtype=np.int64)))
+            penalty += count * (totals[candidates + length] - totals[candidates] > 0)
+        return penalty
+
+    def stats(self) -> Dict[str, int]:
+        return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+# Slot search over the process-wide calendar
+slot_search = FreeBusySearch(calendar_store)
@@ -0,0 +1,72 @@
+"""
+Deferred agent construction for fast server startup.
+
+AGENT_INIT selects when main_graph builds the supervisor and specialists:
+- "eager" (default): at import, before uvicorn binds the port
+- "lazy": on the first request that reaches the agent, in a worker thread so the
+  event loop keeps serving other requests meanwhile
+- "warm": like lazy, and server.py also builds them in a background thread once
+  the server is up, so the first request rarely pays for construction
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+AGENT_INIT_MODES = ("eager", "lazy", "warm")
+
+
+class LazyAgent:
+    """
+    Stand-in for an agent that is built by `factory` on first use.
+
+    Exposes the graph entry points (`process`, `route_request`) without building
+    anything, so the workflow can be wired up at import time. Any other
+    attribute access builds the agent and delegates to it.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self._factory = factory
+        self._agent: Optional[Any] = None
+        self._lock = threading.Lock()
+        self.build_seconds: Optional[float] = None
+
+    @property
+    def built(self) -> bool:
+        return self._agent is not None
+
+    def get(self) -> Any:
+        """Return the agent, building it once (thread-safe)."""
+        if self._agent is None:
+            with self._lock:
+                if self._agent is None:
+                    start = time.perf_counter()
+                    self._agent = self._factory()
+                    self.build_seconds = time.perf_counter() - start
+        return self._agent
+
+    async def aget(self) -> Any:
+        """Return the agent, building it in a worker thread if needed."""
+        if self._agent is None:
+            # Construction imports SDKs and builds clients; keep it off the event loop
+            await asyncio.to_thread(self.get)
+        return self._agent
+
+    async def process(self, state: Dict[str, Any], config: RunnableConfig):
+        return await (await self.aget()).process(state, config)
+
+    async def route_request(self, state: Dict[str, Any], config: RunnableConfig):
+        return await (await self.aget()).route_request(state, config)
+
+    def __getattr__(self, attr: str) -> Any:
+        # Only reached for attributes not defined on the proxy itself
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+    def __repr__(self) -> str:
+        return f"LazyAgent({self.name!r}, built={self.built})"
@@ -0,0 +1,286 @@
+"""
+Process-wide model registry with pooled HTTP clients per LLM backend.
+
+Every agent asks the registry for its model by role instead of building its own
+ChatOpenAI. All models share one keep-alive, size-limited connection pool per
+backend, and roles only differ in their generation settings (temperature,
+max_tokens, ...). With several backends (OPENAI_BASE_URLS), requests are
+balanced across them; see balancing.py.
+
+Environment:
+- OPENAI_BASE_URLS: comma-separated backends (default: OPENAI_BASE_URL)
+- LLM_POOL_MAX_CONNECTIONS (default 32): hard cap on sockets per backend
+- LLM_POOL_MAX_KEEPALIVE (default 16): idle connections kept open per backend
+- LLM_POOL_KEEPALIVE_EXPIRY (default 30s): how long an idle connection is kept
+- LLM_TIMEOUT (default 120s): request timeout
+- LLM_MAX_IN_FLIGHT (default 4, 0 = no limit): requests sent to a backend at
+  once; the rest wait in its priority queue (see scheduling.py)
+- LLM_MAX_QUEUE (default 64, 0 = no limit): queued requests beyond which new
+  runs are refused with a Retry-After hint
+- LLM_<ROLE>_TEMPERATURE / LLM_<ROLE>_MAX_TOKENS: per-role overrides
+- LLM_CACHE and LLM_CACHE_*: response cache, see response_cache.py
+"""
+
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from balancing import BackendHealth, BalancingTransport, backend_urls
+from metrics import metrics, metrics_handler
+from response_cache import response_cache
+from scheduling import AdmissionController, LLMScheduler, classify, current_thread
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+# Generation settings per agent role
+ROLE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    # Routing only needs a single enum value: greedy decoding, tiny budget
+    "supervisor": {
+        "temperature": 0.0,
+        "max_tokens": int(os.getenv("ROUTING_MAX_TOKENS", "16")),
+        "logprobs": True,
+    },
+    "email": {"temperature": 0.7, "max_tokens": 2048},
+    "scheduler": {"temperature": 0.7, "max_tokens": 2048},
+    "research": {"temperature": 0.7, "max_tokens": 2048},
+    "assistant": {"temperature": 0.7, "max_tokens": 2048},
+    # Rolling conversation summary (context_window.py)
+    "summarizer": {
+        "temperature": 0.0,
+        "max_tokens": int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "400")),
+    },
+}
+
+
+class PoolStats:
+    """Request counters for one backend's connection pool."""
+
+    def __init__(self):
+        self.requests_total = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def started(self):
+        self.requests_total += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self):
+        self.in_flight -= 1
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Response body wrapper that reports when the request releases its connection."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+class _TrackedTransport(httpx.AsyncHTTPTransport):
+    """Async transport that schedules requests and counts them for pool metrics."""
+
+    def __init__(self, stats: PoolStats, scheduler: LLMScheduler, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+        self.scheduler = scheduler
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.send(request, classify(request.content))
+
+    async def send(self, request: httpx.Request, priority: int) -> httpx.Response:
+        # The slot is held until the response body has been read or closed
+        await self.scheduler.acquire(priority, current_thread.get())
+        start = time.perf_counter()
+
+        def finished():
+            self.stats.finished()
+            self.scheduler.release(time.perf_counter() - start)
+
+        self.stats.started()
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            finished()
+            raise
+        response.stream = _TrackedStream(response.stream, finished)
+        return response
+
+    def connection_counts(self) -> Dict[str, int]:
+        connections = list(self._pool.connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+class BackendPool:
+    """Shared sync and async HTTP clients for one OpenAI-compatible backend."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.max_connections = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "32"))
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "16")),
+            keepalive_expiry=float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "30")),
+        )
+        timeout = httpx.Timeout(float(os.getenv("LLM_TIMEOUT", "120")), connect=10.0)
+
+        self.stats = PoolStats()
+        self.scheduler = LLMScheduler(int(os.getenv("LLM_MAX_IN_FLIGHT", "4")))
+        self.transport = _TrackedTransport(self.stats, self.scheduler, limits=limits)
+        # Passive health, updated by the balancer
+        self.health = BackendHealth()
+        self.async_client = httpx.AsyncClient(
+            transport=self.transport, limits=limits, timeout=timeout
+        )
+        self.sync_client = httpx.Client(limits=limits, timeout=timeout)
+
+    def metrics(self) -> Dict[str, Any]:
+        connections = self.transport.connection_counts()
+        return {
+            "base_url": self.base_url,
+            "max_connections": self.max_connections,
+            "requests_total": self.stats.requests_total,
+            "in_flight": self.stats.in_flight,
+            "peak_in_flight": self.stats.peak_in_flight,
+            "connections": connections,
+            "utilisation": round(connections["active"] / self.max_connections, 4),
+            "scheduler": self.scheduler.snapshot(),
+            "health": self.health.snapshot(time.monotonic()),
+        }
+
+    async def aclose(self):
+        await self.async_client.aclose()
+        self.sync_client.close()
+
+
+class BackendGroup:
+    """Backends serving one model; the async client balances requests across them."""
+
+    def __init__(self, pools: List[BackendPool]):
+        self.pools = pools
+        self.base_url = pools[0].base_url
+        self.transport = BalancingTransport(pools)
+        self.async_client = httpx.AsyncClient(
+            transport=self.transport, timeout=pools[0].async_client.timeout
+        )
+        # Sync calls are not used by the server; they go to the first backend
+        self.sync_client = pools[0].sync_client
+
+    async def aclose(self):
+        await self.async_client.aclose()
+
+
+class ModelRegistry:
+    """Hands out one ChatOpenAI per role, all sharing pooled clients per backend."""
+
+    def __init__(self):
+        self._pools: Dict[str, BackendPool] = {}
+        self._groups: Dict[Tuple[str, ...], BackendGroup] = {}
+        self._models: Dict[str, "ChatOpenAI"] = {}
+        self._lock = threading.Lock()
+
+    def pool(self, base_url: str) -> BackendPool:
+        with self._lock:
+            if base_url not in self._pools:
+                self._pools[base_url] = BackendPool(base_url)
+            return self._pools[base_url]
+
+    def group(self, base_urls: Sequence[str]) -> BackendGroup:
+        pools = [self.pool(base_url) for base_url in base_urls]
+        with self._lock:
+            key = tuple(base_urls)
+            if key not in self._groups:
+                self._groups[key] = BackendGroup(pools)
+            return self._groups[key]
+
+    def role_settings(self, role: str) -> Dict[str, Any]:
+        """Role defaults with LLM_<ROLE>_TEMPERATURE / _MAX_TOKENS overrides applied."""
+        settings = dict(ROLE_DEFAULTS.get(role, ROLE_DEFAULTS["assistant"]))
+        prefix = f"LLM_{role.upper()}_"
+        if os.getenv(prefix + "TEMPERATURE"):
+            settings["temperature"] = float(os.getenv(prefix + "TEMPERATURE"))
+        if os.getenv(prefix + "MAX_TOKENS"):
+            settings["max_tokens"] = int(os.getenv(prefix + "MAX_TOKENS"))
+        return settings
+
+    def get_model(self, role: str, base_urls: Optional[Sequence[str]] = None) -> "ChatOpenAI":
+        """Return the shared chat model for an agent role, balanced over `base_urls`."""
+        base_urls = list(base_urls or backend_urls())
+        key = f"{role}@{','.join(base_urls)}"
+        if key in self._models:
+            return self._models[key]
+
+        # Imported on first use: langchain_openai pulls in the whole OpenAI SDK
+        from langchain_openai import ChatOpenAI
+
+        group = self.group(base_urls)
+        model = ChatOpenAI(
+            model=os.getenv("LOCAL_MODEL_NAME", "TheBloke/Mistral-7B-Instruct-v0.2-GGUF"),
+            base_url=group.base_url,
+            api_key=os.getenv("OPENAI_API_KEY", "lm-studio"),
+            http_client=group.sync_client,
+            http_async_client=group.async_client,
+            # Usage in the final stream chunk feeds the per-node token metrics
+            stream_usage=True,
+            callbacks=[metrics_handler],
+            cache=response_cache if response_cache.enabled else False,
+            **self.role_settings(role),
+        )
+        with self._lock:
+            return self._models.setdefault(key, model)
+
+    def schedulers(self) -> List[LLMScheduler]:
+        return [pool.scheduler for pool in list(self._pools.values())]
+
+    def queue_depths(self) -> Dict[Any, float]:
+        return {(base_url,): pool.scheduler.queued for base_url, pool in list(self._pools.items())}
+
+    def pool_metrics(self) -> Dict[str, Any]:
+        """Utilisation of every backend pool, keyed by base URL."""
+        return {base_url: pool.metrics() for base_url, pool in self._pools.items()}
+
+    async def aclose(self):
+        for group in self._groups.values():
+            await group.aclose()
+        for pool in self._pools.values():
+            await pool.aclose()
+        self._groups.clear()
+        self._pools.clear()
+        self._models.clear()
+
+
+# Process-wide registry shared by all agents
+registry = ModelRegistry()
+
+# Refuses new runs while the LLM queue is too deep (server.py)
+admission = AdmissionController(registry.schedulers, int(os.getenv("LLM_MAX_QUEUE", "64")))
+
+metrics.gauge(
+    "agent_llm_queue_depth",
+    "LLM requests waiting for a backend slot.",
+    ["backend"],
+    registry.queue_depths,
+)
+
+
+def get_model(role: str) -> "ChatOpenAI":
+    """Shared, pooled chat model for an agent role."""
+    return registry.get_model(role)
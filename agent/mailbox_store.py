@@ -0,0 +1,354 @@
+"""
+Local mbox mailbox with a persistent thread index, behind manage_email_thread.
+
+The mailbox is one mbox file, read through a memory map: only the bytes of the
+messages being indexed or fetched are touched, however large the file. Its
+index is a SQLite file with one row per message: byte offset and length,
+thread id, Message-ID, sender, date, subject and flags. Looking up a thread
+uses the (thread_id, date) index, so fetch, mark-read and archive cost
+O(thread size) instead of a scan of the mailbox.
+
+A message's thread is the first Message-ID in its References header, else its
+In-Reply-To, else its own Message-ID; the thread id is a short hash of that
+root. Flags live in the index rather than in Status headers, so changing them
+never rewrites the mbox. A Status header with R marks a message read when it
+is first indexed.
+
+The mbox is treated as append-only: new mail past the indexed size is indexed
+on the next access. A file that shrank or was replaced is indexed again from
+scratch.
+
+Environment:
+- MAILBOX_PATH (default .mailbox/inbox.mbox)
+- MAILBOX_INDEX_PATH (default MAILBOX_PATH + ".index.sqlite")
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import sqlite3
+import threading
+from email import message_from_bytes, policy
+from email.header import decode_header, make_header
+from email.utils import mktime_tz, parsedate_tz
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    offset INTEGER PRIMARY KEY,
+    length INTEGER NOT NULL,
+    thread_id TEXT NOT NULL,
+    message_id TEXT,
+    sender TEXT NOT NULL,
+    date INTEGER,
+    subject TEXT NOT NULL,
+    flags INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+_THREAD_INDEX = "CREATE INDEX IF NOT EXISTS messages_thread ON messages (thread_id, date)"
+
+SEEN = 1
+ARCHIVED = 2
+
+# Rows written per transaction while indexing
+_BATCH = 20000
+
+_SEPARATOR = b"\nFrom "
+_HEADER_RE = re.compile(
+    rb"^(message-id|in-reply-to|references|from|date|subject|status):[ \t]*(.*(?:\r?\n[ \t].*)*)",
+    re.IGNORECASE | re.MULTILINE,
+)
+_MSGID_RE = re.compile(rb"<[^<>\s]+>")
+# The address in "Name <addr>" or a bare addr; email.utils.parseaddr costs most of the indexing time
+_ADDRESS_RE = re.compile(r"<([^<>\s]+@[^<>\s]+)>|([^\s<>\",;:]+@[^\s<>\",;:]+)")
+
+
+def thread_root(headers: Dict[bytes, bytes]) -> Optional[bytes]:
+    """Message-ID at the root of the message's thread, as far as its headers tell."""
+    for name in (b"references", b"in-reply-to", b"message-id"):
+        found = _MSGID_RE.search(headers.get(name, b""))
+        if found:
+            return found.group(0)
+    return None
+
+
+def thread_id_of(root: bytes) -> str:
+    return "thr_" + hashlib.sha1(root).hexdigest()[:16]
+
+
+def _text(value: bytes) -> str:
+    """Header value as text, with RFC 2047 encoded words decoded."""
+    raw = re.sub(rb"\r?\n[ \t]+", b" ", value).decode("utf-8", errors="replace").strip()
+    if "=?" not in raw:
+        return raw
+    try:
+        return str(make_header(decode_header(raw)))
+    except (ValueError, LookupError):
+        return raw
+
+
+def _epoch(value: bytes) -> Optional[int]:
+    parsed = parsedate_tz(value.decode("ascii", errors="replace"))
+    return None if parsed is None else mktime_tz(parsed)
+
+
+def _address(value: str) -> str:
+    found = _ADDRESS_RE.search(value)
+    return (found.group(1) or found.group(2)) if found else value
+
+
+def index_entry(mm: mmap.mmap, start: int, end: int) -> Tuple:
+    """Index row of the message in mm[start:end], from its headers only."""
+    header_end = mm.find(b"\n\n", start, end)
+    if header_end < 0:
+        header_end = end
+    headers: Dict[bytes, bytes] = {}
+    for name, value in _HEADER_RE.findall(mm[start:header_end]):
+        headers.setdefault(name.lower(), value)
+    message_id = _MSGID_RE.search(headers.get(b"message-id", b""))
+    root = thread_root(headers) or b"<offset-%d>" % start
+    return (
+        start,
+        end - start,
+        thread_id_of(root),
+        message_id.group(0).decode(errors="replace") if message_id else None,
+        _address(_text(headers.get(b"from", b""))),
+        _epoch(headers[b"date"]) if b"date" in headers else None,
+        _text(headers.get(b"subject", b"")),
+        SEEN if b"R" in headers.get(b"status", b"") else 0,
+    )
+
+
+def message_spans(mm: mmap.mmap, start: int, end: int) -> Iterator[Tuple[int, int]]:
+    """(start, end) of each message in mm[start:end]; anything before the first "From " line is skipped."""
+    if mm[start : start + 5] != b"From ":
+        found = mm.find(_SEPARATOR, start, end)
+        start = end if found < 0 else found + 1
+    while start < end:
+        found = mm.find(_SEPARATOR, start, end)
+        stop = end if found < 0 else found + 1
+        yield start, stop
+        start = stop
+
+
+class Mailbox:
+    """An mbox file and its thread index."""
+
+    def __init__(self, path: Optional[str] = None, index_path: Optional[str] = None):
+        self.path = path or os.getenv("MAILBOX_PATH", ".mailbox/inbox.mbox")
+        self.index_path = index_path or os.getenv("MAILBOX_INDEX_PATH", self.path + ".index.sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._lock = threading.RLock()
+
+    def _db(self) -> sqlite3.Connection:
+        """Open the index on first use, and index mail appended since the last one."""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.index_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Consistent under WAL without a sync per flag change; a crash may lose the last few
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        self._refresh()
+        return self._conn
+
+    def _state(self, key: str) -> int:
+        row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _map(self) -> Optional[mmap.mmap]:
+        """Map the whole file again if it grew since it was mapped."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return None
+        if self._mm is not None and len(self._mm) == size:
+            return self._mm
+        self._unmap()
+        if size == 0:
+            return None
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def _unmap(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+
+    def _refresh(self):
+        conn = self._conn
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+        size = stat.st_size if stat else 0
+        inode = stat.st_ino if stat else 0
+        indexed = self._state("size")
+        if size == indexed and inode == self._state("inode"):
+            return
+        if size < indexed or inode != self._state("inode"):
+            # Not the file that was indexed: start over
+            self._unmap()
+            with conn:
+                conn.execute("DELETE FROM messages")
+            indexed = 0
+        mm = self._map()
+        if mm is not None and size > indexed:
+            self._index(mm, indexed, size)
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO state VALUES (?, ?)", (("size", size), ("inode", inode))
+            )
+
+    def _index(self, mm: mmap.mmap, start: int, end: int):
+        conn = self._conn
+        fresh = start == 0
+        if fresh:
+            # Building the thread index once at the end beats updating it per row
+            conn.execute("DROP INDEX IF EXISTS messages_thread")
+        batch: List[Tuple] = []
+        for span in message_spans(mm, start, end):
+            batch.append(index_entry(mm, *span))
+            if len(batch) >= _BATCH:
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                batch = []
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            conn.execute(_THREAD_INDEX)
+
+    def _rows(self, thread_id: str) -> List[Tuple]:
+        return self._db().execute(
+            "SELECT offset, length, message_id, sender, date, subject, flags FROM messages "
+            "WHERE thread_id = ? ORDER BY date, offset",
+            (thread_id,),
+        ).fetchall()
+
+    def fetch_thread(self, thread_id: str, bodies: bool = True) -> List[Dict[str, Any]]:
+        """Messages of a thread, oldest first; bodies are read from the map."""
+        with self._lock:
+            rows = self._rows(thread_id)
+            mm = self._map() if bodies and rows else None
+            messages = []
+            for offset, length, message_id, sender, date, subject, flags in rows:
+                message = {
+                    "message_id": message_id,
+                    "sender": sender,
+                    "date": date,
+                    "subject": subject,
+                    "seen": bool(flags & SEEN),
+                    "archived": bool(flags & ARCHIVED),
+                }
+                if mm is not None:
+                    message["body"] = body_text(mm[offset : offset + length])
+                messages.append(message)
+            return messages
+
+    def set_flags(self, thread_id: str, add: int = 0, remove: int = 0) -> int:
+        """Set and clear flags on every message of a thread; returns how many it has."""
+        with self._lock:
+            conn = self._db()
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE messages SET flags = (flags | ?) & ~? WHERE thread_id = ?", (add, remove, thread_id)
+                )
+            return cursor.rowcount
+
+    def mark_read(self, thread_id: str) -> int:
+        return self.set_flags(thread_id, add=SEEN)
+
+    def mark_unread(self, thread_id: str) -> int:
+        return self.set_flags(thread_id, remove=SEEN)
+
+    def archive(self, thread_id: str) -> int:
+        return self.set_flags(thread_id, add=ARCHIVED)
+
+    def unarchive(self, thread_id: str) -> int:
+        return self.set_flags(thread_id, remove=ARCHIVED)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            conn = self._db()
+            messages, threads, unread = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT thread_id), SUM(flags & ? = 0) FROM messages", (SEEN,)
+            ).fetchone()
+            return {"messages": messages, "threads": threads, "unread": unread or 0, "bytes": self._state("size")}
+
+    def close(self):
+        with self._lock:
+            self._unmap()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def body_text(raw: bytes, limit: int = 2000) -> str:
+    """Plain-text body of one mbox message (its "From " line included), cut at `limit` characters."""
+    message = message_from_bytes(raw.partition(b"\n")[2], policy=policy.default)
+    part = message.get_body(preferencelist=("plain", "html"))
+    if part is None:
+        return ""
+    try:
+        text = part.get_content()
+    except (LookupError, ValueError):
+        text = part.get_payload(decode=True).decode("utf-8", errors="replace")
+    # mboxrd quoting of body lines that start with "From "
+    text = re.sub(r"(?m)^>(>*From )", r"\1", text).strip()
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+# Parsing of tool arguments
+
+THREAD_ACTIONS = ("fetch", "read", "unread", "archive", "unarchive")
+_ACTION_WORDS = {
+    "fetch": "fetch",
+    "show": "fetch",
+    "open": "fetch",
+    "get": "fetch",
+    "view": "fetch",
+    "archive": "archive",
+    "unarchive": "unarchive",
+    "restore": "unarchive",
+    "read": "read",
+    "seen": "read",
+    "unread": "unread",
+    "unseen": "unread",
+}
+
+
+def parse_thread_action(text: str) -> str:
+    """One of THREAD_ACTIONS from a phrase such as "mark as read" or "archive the thread".
+
+    Whole words are matched, archiving before reading ("thread" is not "read"):
+
+    >>> [parse_thread_action(a) for a in ("archive thread", "archive the thread", "unarchive thread")]
+    ['archive', 'archive', 'unarchive']
+    >>> [parse_thread_action(a) for a in ("mark as read", "Mark thread unread", "un-archive", "show thread")]
+    ['read', 'unread', 'unarchive', 'fetch']
+    >>> parse_thread_action("mark as not read")
+    'unread'
+    """
+    words = re.findall(r"[a-z]+", re.sub(r"\bun-", "un", text.lower()))
+    found = [_ACTION_WORDS[word] for word in words if word in _ACTION_WORDS]
+    if "not" in words and "read" in found:
+        found.append("unread")
+    for action in ("fetch", "unarchive", "archive", "unread", "read"):
+        if action in found:
+            return action
+    raise ValueError(
+        f"unsupported thread action {text!r}; use fetch, mark as read, mark as unread, archive or unarchive"
+    )
+
+
+# Process-wide mailbox; the index is opened by the first tool call
+mailbox = Mailbox()
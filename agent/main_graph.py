@@ -1,46 +1,133 @@
 """
 CopilotKit-compatible multi-agent system with specialized agents.
 This orchestrates a supervisor agent that coordinates email, scheduling, and research specialists.
+
+GRAPH_MODE selects the topology:
+- "supervisor" (default): supervisor routing call, then a specialist agent
+- "collapsed": a single agent bound to every specialist tool (one LLM loop per request)
+
+AGENT_INIT selects when agents are built (eager, lazy or warm; see lazy_agents.py).
 """
 
-from dotenv import load_dotenv
+import os
+from typing import Any, Callable, Dict
+
 from langgraph.graph import StateGraph, END
 from state import AgentState
 from supervisor import SupervisorAgent
 from agents.email_agent import EmailAgent
 from agents.scheduler_agent import SchedulerAgent
 from agents.research_agent import ResearchAgent
-from langgraph.checkpoint.memory import MemorySaver
+from agents.collapsed_agent import CollapsedAgent
+from parallel import ParallelDispatcher
+from context_window import context_manager
+from checkpointing import create_checkpointer
+from lazy_agents import AGENT_INIT_MODES, LazyAgent
+from metrics import instrument_node
+
+GRAPH_MODES = ("supervisor", "collapsed")
+
+
+def add_node(workflow: StateGraph, name: str, node: Callable) -> None:
+    """Add a node whose latency and LLM/tool calls are recorded under its name."""
+    workflow.add_node(name, instrument_node(name, node))
+
+
+def build_supervisor_workflow(
+    supervisor: SupervisorAgent,
+    email_agent: EmailAgent,
+    scheduler_agent: SchedulerAgent,
+    research_agent: ResearchAgent,
+) -> StateGraph:
+    """Supervisor routes each request to one specialist, or fans out to several."""
+    # Runs several specialists concurrently for multi-domain requests
+    dispatcher = ParallelDispatcher(
+        {"email": email_agent, "scheduler": scheduler_agent, "research": research_agent}
+    )
+
+    # Define the workflow graph
+    workflow = StateGraph(AgentState)
+
+    # Rolling summary of older turns, refreshed before any LLM call
+    add_node(workflow, "context_node", context_manager.summarize)
+
+    # Add agent nodes only - tools are called within agents
+    add_node(workflow, "supervisor_node", supervisor.route_request)
+    add_node(workflow, "email_node", email_agent.process)
+    add_node(workflow, "scheduler_node", scheduler_agent.process)
+    add_node(workflow, "research_node", research_agent.process)
+    add_node(workflow, "branch_node", dispatcher.run_branch)
+    add_node(workflow, "merge_node", dispatcher.merge)
+
+    # Direct agent-to-END flow (tools called internally)
+    workflow.add_edge("email_node", END)
+    workflow.add_edge("scheduler_node", END)
+    workflow.add_edge("research_node", END)
+
+    # Parallel branches (LangGraph Send) join in merge_node
+    workflow.add_edge("branch_node", "merge_node")
+    workflow.add_edge("merge_node", END)
+
+    # Summarize first, then let the supervisor route
+    workflow.add_edge("context_node", "supervisor_node")
+    workflow.set_entry_point("context_node")
+    return workflow
+
+
+def build_collapsed_workflow(assistant: CollapsedAgent) -> StateGraph:
+    """One agent with all namespaced tools; no routing round trip."""
+    workflow = StateGraph(AgentState)
+    add_node(workflow, "context_node", context_manager.summarize)
+    add_node(workflow, "assistant_node", assistant.process)
+    workflow.add_edge("context_node", "assistant_node")
+    workflow.add_edge("assistant_node", END)
+    workflow.set_entry_point("context_node")
+    return workflow
+
+
+GRAPH_MODE = os.getenv("GRAPH_MODE", "supervisor")
+if GRAPH_MODE not in GRAPH_MODES:
+    raise ValueError(f"GRAPH_MODE must be one of {GRAPH_MODES}, got {GRAPH_MODE!r}")
+
+AGENT_INIT = os.getenv("AGENT_INIT", "eager")
+if AGENT_INIT not in AGENT_INIT_MODES:
+    raise ValueError(f"AGENT_INIT must be one of {AGENT_INIT_MODES}, got {AGENT_INIT!r}")
 
-# Load environment variables from .env file
-load_dotenv()
+# Agents built (or to be built) for this process, by name
+agents: Dict[str, Any] = {}
 
 
-# Initialize all agents
-supervisor = SupervisorAgent()
-email_agent = EmailAgent()
-scheduler_agent = SchedulerAgent()
-research_agent = ResearchAgent()
+def init_agent(name: str, factory: Callable[[], Any]) -> Any:
+    """Build the agent now, or return a LazyAgent that builds it on first use."""
+    agents[name] = factory() if AGENT_INIT == "eager" else LazyAgent(name, factory)
+    return agents[name]
 
-# Define the workflow graph
-workflow = StateGraph(AgentState)
 
-# Add agent nodes only - tools are called within agents
-workflow.add_node("supervisor_node", supervisor.route_request)
-workflow.add_node("email_node", email_agent.process)
-workflow.add_node("scheduler_node", scheduler_agent.process)
-workflow.add_node("research_node", research_agent.process)
+def warm_up() -> Dict[str, float]:
+    """Build every lazy agent now; returns build seconds per agent."""
+    timings = {}
+    for name, agent in agents.items():
+        if isinstance(agent, LazyAgent):
+            agent.get()
+            timings[name] = agent.build_seconds
+    return timings
 
-# Direct agent-to-END flow (tools called internally)
-workflow.add_edge("email_node", END)
-workflow.add_edge("scheduler_node", END)
-workflow.add_edge("research_node", END)
 
-# Set supervisor as the entry point
-workflow.set_entry_point("supervisor_node")
+if GRAPH_MODE == "collapsed":
+    supervisor = None
+    workflow = build_collapsed_workflow(init_agent("assistant", CollapsedAgent))
+else:
+    # Initialize all agents
+    supervisor = init_agent("supervisor", SupervisorAgent)
+    email_agent = init_agent("email", EmailAgent)
+    scheduler_agent = init_agent("scheduler", SchedulerAgent)
+    research_agent = init_agent("research", ResearchAgent)
+    workflow = build_supervisor_workflow(
+        supervisor, email_agent, scheduler_agent, research_agent
+    )
 
 # Compile the graph for execution
-# Add checkpointer before compiling
-checkpointer = MemorySaver()
+# Add checkpointer before compiling (CHECKPOINTER=memory|sqlite)
+checkpointer = create_checkpointer()
 graph = workflow.compile(checkpointer=checkpointer)
 # graph = workflow.compile()
@@ -0,0 +1,424 @@
+"""
+Aggregated latency and token metrics, exported in the Prometheus text format.
+
+Phoenix traces show single runs. These are the production aggregates served on
+GET /metrics:
+- agent_node_duration_seconds{node}: every graph node (supervisor routing,
+  specialists, context summary, fan-out branches)
+- agent_llm_ttft_seconds{node} / agent_llm_duration_seconds{node}: per LLM call,
+  attributed to the graph node that made it
+- agent_llm_tokens_total{node,kind}: prompt and completion tokens per node
+- agent_llm_errors_total{node}
+- agent_tool_duration_seconds{tool} / agent_tool_errors_total{tool}
+- agent_routing_decisions_total{agent,source}: routing distribution
+- agent_runs_cancelled_total / agent_llm_reclaimed_total{node}: runs abandoned
+  because the client disconnected, and the LLM generations aborted with them
+- agent_llm_queue_seconds{priority}, agent_llm_queue_depth{backend},
+  agent_runs_rejected_total: LLM scheduler waits and admission control
+- agent_llm_backend_ejections_total{backend}, agent_llm_hedges_total{winner}:
+  multi-backend health and hedged routing calls
+- agent_llm_cache_lookups_total{result}, agent_llm_cache_bytes: response cache
+  (response_cache.py). Answers served from it are left out of the LLM timings
+  and token counts
+
+Recording is cheap. Each label set gets its series object once, with
+preallocated bucket counts. An observation is then a bisect and three integer
+additions under the series' own lock: sync nodes (merge_node) and sync tools
+run in worker threads, so a series is updated from more than the event loop.
+The lock is uncontended in practice, and creating a series is a single atomic
+dict insert. Bucket counts are made cumulative only when /metrics is rendered.
+
+Nodes are wrapped with instrument_node() in main_graph.py. LLM and tool timings
+come from one shared callback handler: the registry in llm.py attaches it to
+every model, and the agents attach it to their tools with instrument_tools().
+The calling node is taken from a context variable set by the node wrapper.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Seconds; spans fast-path routing (sub-ms) to long local generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Graph node currently running in this task (inherited by LLM and tool calls)
+current_node: ContextVar[str] = ContextVar("current_node", default="none")
+
+# AG-UI run being served by this task, so its LLM calls can be settled if it is cancelled
+current_run: ContextVar[Optional[str]] = ContextVar("current_run", default=None)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class CounterSeries:
+    """One labelled counter value."""
+
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+
+class HistogramSeries:
+    """Bucket counts, sum and count of one labelled histogram."""
+
+    __slots__ = ("bounds", "counts", "sum", "count", "lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # Non-cumulative; the last slot is the +Inf overflow bucket
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        # Prometheus buckets are inclusive upper bounds: value <= le
+        bucket = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[bucket] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Metric:
+    """A named metric family with one series per label combination."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], Any] = {}
+
+    def _new_series(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> Any:
+        """Series for these label values (created on first use, then reused)."""
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in sorted(self._series.items()):
+            lines.extend(self._render_series(values, series))
+        return lines
+
+    def _render_series(self, values: Tuple[str, ...], series: Any) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_series(self) -> CounterSeries:
+        return CounterSeries()
+
+    def _render_series(self, values: Tuple[str, ...], series: CounterSeries) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {series.value}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_series(self) -> HistogramSeries:
+        return HistogramSeries(self.bounds)
+
+    def _render_series(self, values: Tuple[str, ...], series: HistogramSeries) -> List[str]:
+        # Snapshot first so the buckets agree with count even if a run records meanwhile
+        with series.lock:
+            counts, total, count = list(series.counts), series.sum, series.count
+        lines = []
+        cumulative = 0
+        for bound, bucket in zip((*self.bounds, "+Inf"), counts):
+            cumulative += bucket
+            labels = _format_labels(self.labelnames, values, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {total}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge(Metric):
+    """Current values read from `collect` at render time, so nothing is recorded per request."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Dict[Tuple[str, ...], float]],
+    ):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them for GET /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name!r} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Dict[Tuple[str, ...], float]],
+    ) -> Gauge:
+        return self._register(Gauge(name, help, labelnames, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry; each uvicorn worker serves its own
+metrics = MetricsRegistry()
+
+node_duration = metrics.histogram(
+    "agent_node_duration_seconds", "Graph node execution time.", ["node"]
+)
+llm_ttft = metrics.histogram(
+    "agent_llm_ttft_seconds", "Time to the first streamed chunk of an LLM call.", ["node"]
+)
+llm_duration = metrics.histogram(
+    "agent_llm_duration_seconds", "Total LLM call time.", ["node"]
+)
+llm_tokens = metrics.counter(
+    "agent_llm_tokens_total", "LLM tokens by calling node and kind (prompt, completion).", ["node", "kind"]
+)
+llm_errors = metrics.counter("agent_llm_errors_total", "Failed LLM calls.", ["node"])
+tool_duration = metrics.histogram(
+    "agent_tool_duration_seconds", "Tool execution time.", ["tool"]
+)
+tool_errors = metrics.counter("agent_tool_errors_total", "Tool calls that raised.", ["tool"])
+routing_decisions = metrics.counter(
+    "agent_routing_decisions_total", "Supervisor routing decisions.", ["agent", "source"]
+)
+llm_queue_time = metrics.histogram(
+    "agent_llm_queue_seconds", "Time LLM requests wait for a backend slot.", ["priority"]
+)
+runs_rejected = metrics.counter(
+    "agent_runs_rejected_total", "Runs refused because the LLM queue was too deep."
+)
+backend_ejections = metrics.counter(
+    "agent_llm_backend_ejections_total", "Backends ejected after consecutive failures.", ["backend"]
+)
+llm_hedges = metrics.counter(
+    "agent_llm_hedges_total", "Hedged routing calls by which copy answered first.", ["winner"]
+)
+llm_cache_lookups = metrics.counter(
+    "agent_llm_cache_lookups_total", "LLM response cache lookups (exact, semantic, miss, bypass).", ["result"]
+)
+runs_cancelled = metrics.counter(
+    "agent_runs_cancelled_total", "Runs cancelled because the client disconnected."
+)
+llm_reclaimed = metrics.counter(
+    "agent_llm_reclaimed_total", "LLM generations aborted when their run was cancelled.", ["node"]
+)
+
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """Wrap a graph node so its duration is recorded and its LLM/tool calls are attributed to it."""
+    series = node_duration.labels(name)
+
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_node(*args, **kwargs):
+            token = current_node.set(name)
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                series.observe(time.perf_counter() - start)
+                current_node.reset(token)
+
+        return async_node
+
+    @functools.wraps(fn)
+    def node(*args, **kwargs):
+        token = current_node.set(name)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            series.observe(time.perf_counter() - start)
+            current_node.reset(token)
+
+    return node
+
+
+def record_routing(agent: str, source: str):
+    routing_decisions.labels(agent, source).inc()
+
+
+def _token_usage(response: Any) -> Optional[Tuple[int, int]]:
+    """(prompt, completion) tokens of an LLMResult, if the backend reported them."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage")
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return None
+
+
+def _cached(response: Any) -> bool:
+    """Whether an LLMResult was replayed from the response cache."""
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is not None and message.response_metadata.get("cache"):
+                return True
+    return False
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records LLM TTFT, duration and tokens, and tool durations."""
+
+    # Called directly on the event loop rather than via an executor
+    run_inline = True
+
+    def __init__(self):
+        # run_id -> [node, start, first chunk time, AG-UI run]
+        self._llm_runs: Dict[UUID, List[Any]] = {}
+        # run_id -> (tool, start)
+        self._tool_runs: Dict[UUID, Tuple[str, float]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._llm_runs[run_id] = [current_node.get(), time.perf_counter(), None, current_run.get()]
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._llm_runs[run_id] = [current_node.get(), time.perf_counter(), None, current_run.get()]
+
+    def on_llm_new_token(self, token, *, run_id: UUID, **kwargs):
+        run = self._llm_runs.get(run_id)
+        if run is not None and run[2] is None:
+            run[2] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        run = self._llm_runs.pop(run_id, None)
+        if run is None:
+            return
+        node, start, first_chunk, _ = run
+        if _cached(response):
+            return
+        end = time.perf_counter()
+        llm_duration.labels(node).observe(end - start)
+        # Without streaming the whole response is the first token
+        llm_ttft.labels(node).observe((first_chunk or end) - start)
+        usage = _token_usage(response)
+        if usage:
+            llm_tokens.labels(node, "prompt").inc(usage[0])
+            llm_tokens.labels(node, "completion").inc(usage[1])
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        run = self._llm_runs.pop(run_id, None)
+        if run is not None:
+            llm_errors.labels(run[0]).inc()
+
+    def reclaim(self, run: str) -> int:
+        """Settle the LLM calls of a cancelled AG-UI run; returns how many were in flight.
+
+        A call cancelled while awaited never reaches on_llm_error, so its entry is
+        dropped here.
+        """
+        abandoned = [key for key, entry in self._llm_runs.items() if entry[3] == run]
+        for key in abandoned:
+            llm_reclaimed.labels(self._llm_runs.pop(key)[0]).inc()
+        runs_cancelled.labels().inc()
+        return len(abandoned)
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        self._tool_runs[run_id] = (name, time.perf_counter())
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs):
+        run = self._tool_runs.pop(run_id, None)
+        if run is not None:
+            tool_duration.labels(run[0]).observe(time.perf_counter() - run[1])
+
+    def on_tool_error(self, error, *, run_id: UUID, **kwargs):
+        run = self._tool_runs.pop(run_id, None)
+        if run is not None:
+            tool_duration.labels(run[0]).observe(time.perf_counter() - run[1])
+            tool_errors.labels(run[0]).inc()
+
+
+# Shared by every model and tool
+metrics_handler = MetricsCallbackHandler()
+
+
+def instrument_tools(tools: List[Any]) -> List[Any]:
+    """Attach the metrics handler to each tool (in place); returns the list."""
+    for tool in tools:
+        callbacks = list(tool.callbacks or [])
+        if metrics_handler not in callbacks:
+            tool.callbacks = [*callbacks, metrics_handler]
+    return tools
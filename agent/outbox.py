@@ -0,0 +1,671 @@
+"""
+Durable outbound email queue with a batched delivery worker.
+
+send_email and schedule_email_send only enqueue: each recipient's copy is
+committed to a local SQLite outbox and the tool returns. A background asyncio
+worker, started in the server's lifespan, drains it:
+- send times wait on a hashed timer wheel of OUTBOX_TICK_SECONDS ticks, which
+  the worker advances once a tick while anything is scheduled
+- due messages are grouped by recipient domain and sent in batches of up to
+  OUTBOX_BATCH_SIZE over one SMTP connection, RSET between messages
+- connections are pooled per SMTP route and reused across batches until idle
+  for OUTBOX_IDLE_SECONDS; at most OUTBOX_CONNECTIONS per route are in use
+- a 4xx reply or a dropped connection retries with exponential backoff and
+  jitter, up to OUTBOX_MAX_ATTEMPTS; a 5xx reply fails the message
+
+Rows are claimed with a lease before they are sent, so server workers can share
+the file: each sends only what it claimed. A batch can outlast the lease (50
+messages against a slow server), so before each message that might not finish
+within it (five SMTP timeouts) the rest of the batch is leased again; rows
+another worker took meanwhile are left to it. Rows whose lease expired (a
+worker died mid-batch) or that no running worker has seen are found by a
+rescan every OUTBOX_RESCAN_SECONDS. Delivery is at least once.
+
+smtplib runs on worker threads, one per connection in use.
+
+Environment:
+- OUTBOX_DB_PATH (default .outbox/outbox.sqlite)
+- SMTP_HOST (unset: messages are queued but not delivered), SMTP_PORT (default 25)
+- SMTP_USERNAME / SMTP_PASSWORD, SMTP_STARTTLS (default off)
+- SMTP_ROUTES: per-domain relays, "example.com=mx.example.com:25,..."
+- OUTBOX_SENDER (default assistant@localhost)
+- OUTBOX_BATCH_SIZE (default 50), OUTBOX_CONNECTIONS (default 4)
+- OUTBOX_IDLE_SECONDS (default 30), OUTBOX_SMTP_TIMEOUT (default 30s)
+- OUTBOX_MAX_ATTEMPTS (default 6), OUTBOX_RETRY_BASE_SECONDS (default 30)
+- OUTBOX_TICK_SECONDS (default 1), OUTBOX_LEASE_SECONDS (default 300),
+  OUTBOX_RESCAN_SECONDS (default 60)
+"""
+
+import asyncio
+import os
+import random
+import re
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, tzinfo
+from email.message import EmailMessage
+from email.utils import formatdate, getaddresses, make_msgid
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from calendar_store import parse_date, parse_duration, parse_time
+
+# Failures of the connection rather than of one message; smtplib.SMTPException is an OSError too
+_TRANSPORT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+# SMTP round trips per message (MAIL, RCPT, DATA, message, RSET), each bounded by the timeout
+_ROUND_TRIPS = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    sender TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    to_header TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    send_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    claimed_by TEXT,
+    lease_until REAL,
+    created REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, send_at);
+"""
+
+# (host, port) of an SMTP relay
+Route = Tuple[str, int]
+
+
+@dataclass(frozen=True)
+class Outcome:
+    """Result of one delivery attempt; `retry` when a failure is worth another try."""
+
+    id: str
+    sent: bool
+    error: Optional[str] = None
+    retry: bool = False
+
+
+class TimerWheel:
+    """Hashed timing wheel: O(1) scheduling, one bucket visited per tick.
+
+    A key due `ahead` ticks from now goes in bucket (now + ahead) % slots with
+    the number of full turns still to wait.
+    """
+
+    def __init__(self, tick: float, slots: int = 3600):
+        self.tick = tick
+        self._buckets: List[List[Tuple[int, Any]]] = [[] for _ in range(slots)]
+        self._current = 0
+        self.pending = 0
+
+    def _ticks(self, seconds: float) -> int:
+        return int(seconds // self.tick)
+
+    def schedule(self, key: Any, due: float, now: float):
+        if not self.pending:
+            self._current = self._ticks(now)
+        # Rounded up: the key is released at the first tick boundary after it is due, never before
+        ahead = max(1, -int(-due // self.tick) - self._current)
+        slots = len(self._buckets)
+        self._buckets[(self._current + ahead) % slots].append(((ahead - 1) // slots, key))
+        self.pending += 1
+
+    def advance(self, now: float) -> List[Any]:
+        """Keys that came due up to `now`."""
+        due: List[Any] = []
+        target = self._ticks(now)
+        slots = len(self._buckets)
+        while self.pending and self._current < target:
+            self._current += 1
+            bucket = self._buckets[self._current % slots]
+            if not bucket:
+                continue
+            waiting = []
+            for turns, key in bucket:
+                if turns:
+                    waiting.append((turns - 1, key))
+                else:
+                    due.append(key)
+            self._buckets[self._current % slots] = waiting
+            self.pending -= len(bucket) - len(waiting)
+        return due
+
+
+def parse_routes(text: str) -> Dict[str, Route]:
+    """"example.com=mx.example.com:25,..." -> {domain: (host, port)}."""
+    routes = {}
+    for entry in filter(None, (part.strip() for part in text.split(","))):
+        domain, _, relay = entry.partition("=")
+        host, _, port = relay.strip().partition(":")
+        routes[domain.strip().lower()] = (host, int(port or 25))
+    return routes
+
+
+class SMTPPool:
+    """Reusable SMTP connections per route, used from worker threads."""
+
+    def __init__(
+        self,
+        timeout: float,
+        idle_seconds: float,
+        starttls: bool = False,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+    ):
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self.starttls = starttls
+        self.username = username
+        self.password = password
+        self._idle: Dict[Route, List[Tuple[smtplib.SMTP, float]]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.opened = self.reused = 0
+
+    def _connect(self, route: Route) -> smtplib.SMTP:
+        conn = smtplib.SMTP(*route, timeout=self.timeout)
+        try:
+            conn.ehlo()
+            if self.starttls:
+                conn.starttls()
+                conn.ehlo()
+            if self.username:
+                conn.login(self.username, self.password or "")
+        except Exception:
+            conn.close()
+            raise
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def acquire(self, route: Route) -> Tuple[smtplib.SMTP, bool]:
+        """A connection to `route`, and whether it was reused."""
+        expired = []
+        found = None
+        with self._lock:
+            idle = self._idle[route]
+            cutoff = time.monotonic() - self.idle_seconds
+            while idle:
+                conn, last_used = idle.pop()
+                if last_used >= cutoff:
+                    found = conn
+                    self.reused += 1
+                    break
+                expired.append(conn)
+        for conn in expired:
+            self._quit(conn)
+        if found is not None:
+            return found, True
+        return self._connect(route), False
+
+    def release(self, route: Route, conn: smtplib.SMTP, broken: bool = False):
+        if broken or self.idle_seconds <= 0:
+            self._quit(conn)
+            return
+        with self._lock:
+            self._idle[route].append((conn, time.monotonic()))
+
+    def close(self):
+        with self._lock:
+            idle = [conn for conns in self._idle.values() for conn, _ in conns]
+            self._idle.clear()
+        for conn in idle:
+            self._quit(conn)
+
+    def connections(self) -> int:
+        with self._lock:
+            return sum(len(conns) for conns in self._idle.values())
+
+    @staticmethod
+    def _quit(conn: smtplib.SMTP):
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.close()
+
+
+class Outbox:
+    """Outbound messages in SQLite, delivered by `run()` on the event loop."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        route: Optional[Route] = None,
+        routes: Optional[Dict[str, Route]] = None,
+        sender: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        connections: Optional[int] = None,
+        idle_seconds: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        retry_base_seconds: Optional[float] = None,
+        tick_seconds: Optional[float] = None,
+        lease_seconds: Optional[float] = None,
+        rescan_seconds: Optional[float] = None,
+    ):
+        self.path = path or os.getenv("OUTBOX_DB_PATH", ".outbox/outbox.sqlite")
+        host = os.getenv("SMTP_HOST")
+        self.route: Optional[Route] = route or ((host, int(os.getenv("SMTP_PORT", "25"))) if host else None)
+        self.routes = routes if routes is not None else parse_routes(os.getenv("SMTP_ROUTES", ""))
+        self.sender = sender or os.getenv("OUTBOX_SENDER", "assistant@localhost")
+        self.batch_size = batch_size or int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+        self.connections = connections or int(os.getenv("OUTBOX_CONNECTIONS", "4"))
+        self.max_attempts = max_attempts or int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+        self.retry_base_seconds = retry_base_seconds or float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "30"))
+        self.lease_seconds = lease_seconds or float(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+        self.rescan_seconds = rescan_seconds or float(os.getenv("OUTBOX_RESCAN_SECONDS", "60"))
+        self.pool = SMTPPool(
+            timeout=float(os.getenv("OUTBOX_SMTP_TIMEOUT", "30")),
+            idle_seconds=idle_seconds if idle_seconds is not None else float(os.getenv("OUTBOX_IDLE_SECONDS", "30")),
+            starttls=os.getenv("SMTP_STARTTLS", "").lower() in ("1", "true", "yes", "on"),
+            username=os.getenv("SMTP_USERNAME"),
+            password=os.getenv("SMTP_PASSWORD"),
+        )
+        self.wheel = TimerWheel(tick_seconds or float(os.getenv("OUTBOX_TICK_SECONDS", "1")))
+        # Identifies this process's claims
+        self.worker_id = uuid.uuid4().hex
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        # Worker state, touched on the event loop only
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._ready: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._known: Set[str] = set()
+        self._busy: Dict[Route, int] = defaultdict(int)
+        self._tasks: Set[asyncio.Task] = set()
+        self.counts = {"enqueued": 0, "sent": 0, "retried": 0, "failed": 0, "batches": 0, "errors": 0}
+        self.last_error: Optional[str] = None
+
+    @property
+    def delivering(self) -> bool:
+        return self.route is not None or bool(self.routes)
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Autocommit; claims take the write lock with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def route_for(self, domain: str) -> Optional[Route]:
+        return self.routes.get(domain, self.route)
+
+    # Enqueueing, from any thread
+
+    def enqueue(
+        self, recipients: str, subject: str, body: str, send_at: Optional[float] = None
+    ) -> List[str]:
+        """Queue one copy per recipient address; returns their ids once committed."""
+        addresses = [address for _, address in getaddresses([recipients]) if address]
+        if not addresses or any("@" not in address for address in addresses):
+            raise ValueError(f"no valid email address in {recipients!r}")
+        now = time.time()
+        send_at = now if send_at is None else send_at
+        to_header = ", ".join(addresses)
+        rows = [
+            (
+                f"msg_{uuid.uuid4().hex[:16]}",
+                self.sender,
+                address,
+                address.rpartition("@")[2].lower(),
+                to_header,
+                subject,
+                body,
+                send_at,
+                "queued",
+                now,
+            )
+            for address in addresses
+        ]
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO outbox (id, sender, recipient, domain, to_header, subject, body, send_at, status, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._admit_many, [(row[0], row[3], send_at) for row in rows])
+        return [row[0] for row in rows]
+
+    # Worker, on the event loop
+
+    def _admit_many(self, entries: Sequence[Tuple[str, str, float]]):
+        now = time.time()
+        self.counts["enqueued"] += len(entries)
+        for message_id, domain, send_at in entries:
+            self._admit(message_id, domain, send_at, now)
+        self._wake.set()
+
+    def _admit(self, message_id: str, domain: str, send_at: float, now: float):
+        if message_id in self._known:
+            return
+        self._known.add(message_id)
+        if send_at <= now:
+            self._ready.setdefault(domain, deque()).append(message_id)
+        else:
+            self.wheel.schedule((message_id, domain), send_at, now)
+
+    async def run(self):
+        """Deliver until stop(); claims nothing when no SMTP route is configured."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        next_scan = 0.0
+        while not self._stopping:
+            now = time.time()
+            if time.monotonic() >= next_scan:
+                next_scan = time.monotonic() + self.rescan_seconds
+                for message_id, domain, send_at in await asyncio.to_thread(self._unclaimed, now):
+                    self._admit(message_id, domain, send_at, now)
+            for message_id, domain in self.wheel.advance(now):
+                self._ready.setdefault(domain, deque()).append(message_id)
+            self._dispatch()
+            self._wake.clear()
+            # Wake on the next tick boundary, when the wheel's next bucket comes due
+            tick = self.wheel.tick
+            timeout = tick - time.time() % tick if self.wheel.pending else self.rescan_seconds
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, min(timeout, next_scan - time.monotonic())))
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self, timeout: float = 30.0):
+        """Stop taking new batches, wait for those in flight, close connections."""
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=timeout)
+        await asyncio.to_thread(self.pool.close)
+        self._loop = None
+
+    def _dispatch(self):
+        """Start a batch for each domain with due messages, while its route has a free connection."""
+        started = True
+        while started and self._ready:
+            started = False
+            for domain in list(self._ready):
+                route = self.route_for(domain)
+                if route is None or self._busy[route] >= self.connections:
+                    continue
+                queue = self._ready[domain]
+                batch = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+                if not queue:
+                    del self._ready[domain]
+                self._busy[route] += 1
+                task = asyncio.create_task(self._deliver(route, batch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                started = True
+
+    async def _deliver(self, route: Route, batch: List[str]):
+        try:
+            outcomes = await asyncio.to_thread(self._send_batch, route, batch)
+        except Exception as error:
+            # Rows claimed before the failure come back through the rescan once their lease expires
+            outcomes = []
+            self.counts["errors"] += 1
+            self.last_error = repr(error)
+        finally:
+            self._busy[route] -= 1
+        self.counts["batches"] += 1
+        # Rows another worker claimed are its to deliver
+        self._known.difference_update(batch)
+        now = time.time()
+        for outcome, send_at, domain in outcomes:
+            if outcome.sent:
+                self.counts["sent"] += 1
+            elif send_at is not None:
+                self.counts["retried"] += 1
+                self._admit(outcome.id, domain, send_at, now)
+            elif outcome.error is not None:
+                self.counts["failed"] += 1
+        self._wake.set()
+
+    # Delivery, on worker threads
+
+    def _claim(self, ids: Sequence[str]) -> List[Tuple]:
+        """Lease queued rows among `ids` to this worker; returns those it got."""
+        now = time.time()
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"UPDATE outbox SET status = 'sending', claimed_by = ?, lease_until = ? "
+                    f"WHERE id IN ({marks}) AND (status = 'queued' OR (status = 'sending' AND lease_until < ?))",
+                    (self.worker_id, now + self.lease_seconds, *ids, now),
+                )
+                rows = conn.execute(
+                    f"SELECT id, sender, recipient, domain, to_header, subject, body, attempts FROM outbox "
+                    f"WHERE id IN ({marks}) AND status = 'sending' AND claimed_by = ?",
+                    (*ids, self.worker_id),
+                ).fetchall()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _renew(self, ids: Sequence[str]) -> Set[str]:
+        """Extend this worker's lease on `ids`; returns those it still holds."""
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"UPDATE outbox SET lease_until = ? "
+                    f"WHERE id IN ({marks}) AND status = 'sending' AND claimed_by = ?",
+                    (time.time() + self.lease_seconds, *ids, self.worker_id),
+                )
+                held = {
+                    row[0]
+                    for row in conn.execute(
+                        f"SELECT id FROM outbox WHERE id IN ({marks}) AND status = 'sending' AND claimed_by = ?",
+                        (*ids, self.worker_id),
+                    )
+                }
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return held
+
+    def _send_batch(self, route: Route, ids: Sequence[str]) -> List[Tuple[Outcome, Optional[float], str]]:
+        leased = time.time()
+        rows = self._claim(ids)
+        if not rows:
+            return []
+        outcomes: List[Outcome] = []
+        try:
+            conn, reused = self.pool.acquire(route)
+        except (smtplib.SMTPException, OSError) as error:
+            outcomes = [Outcome(row[0], False, f"connect: {error!r}", retry=True) for row in rows]
+            return self._record(rows, outcomes)
+        broken = False
+        per_message = _ROUND_TRIPS * self.pool.timeout
+        i = 0
+        while i < len(rows):
+            if time.time() + per_message > leased + self.lease_seconds:
+                leased = time.time()
+                held = self._renew([row[0] for row in rows[i:]])
+                # Rows another worker reclaimed are its to send
+                rows = rows[:i] + [row for row in rows[i:] if row[0] in held]
+                if i == len(rows):
+                    break
+            row = rows[i]
+            i += 1
+            try:
+                outcomes.append(self._send_one(conn, row))
+            except _TRANSPORT_ERRORS as error:
+                failure = error
+                if reused and i == 1:
+                    # The server dropped the idle connection; reconnect once
+                    self.pool.release(route, conn, broken=True)
+                    try:
+                        conn, reused = self.pool.acquire(route)
+                        outcomes.append(self._send_one(conn, row))
+                        continue
+                    except (smtplib.SMTPException, OSError) as retry_error:
+                        failure = retry_error
+                broken = True
+                outcomes.extend(Outcome(r[0], False, repr(failure), retry=True) for r in rows[len(outcomes) :])
+                break
+        self.pool.release(route, conn, broken)
+        return self._record(rows, outcomes)
+
+    def _send_one(self, conn: smtplib.SMTP, row: Tuple) -> Outcome:
+        message_id, sender, recipient, _, to_header, subject, body, _ = row
+        message = EmailMessage()
+        message["From"] = sender
+        message["To"] = to_header
+        message["Subject"] = subject
+        message["Date"] = formatdate(localtime=True)
+        message["Message-ID"] = make_msgid(domain=sender.rpartition("@")[2] or None)
+        message.set_content(body)
+        try:
+            conn.send_message(message, from_addr=sender, to_addrs=[recipient])
+        except smtplib.SMTPRecipientsRefused as error:
+            code, reply = error.recipients[recipient]
+            return Outcome(message_id, False, f"{code} {reply.decode(errors='replace')}", retry=400 <= code < 500)
+        except smtplib.SMTPResponseException as error:
+            # smtplib has already sent RSET, so the connection is still usable
+            code, reply = error.smtp_code, error.smtp_error
+            return Outcome(message_id, False, f"{code} {reply.decode(errors='replace')}", retry=400 <= code < 500)
+        except smtplib.SMTPServerDisconnected:
+            raise
+        except smtplib.SMTPException as error:
+            # Refused before MAIL FROM (e.g. a non-ASCII address without SMTPUTF8): this message only, for good
+            return Outcome(message_id, False, repr(error))
+        return Outcome(message_id, True)
+
+    def _record(
+        self, rows: Sequence[Tuple], outcomes: Sequence[Outcome]
+    ) -> List[Tuple[Outcome, Optional[float], str]]:
+        """Store a batch's outcomes in one transaction; returns (outcome, retry time, domain)."""
+        now = time.time()
+        attempts = {row[0]: row[7] + 1 for row in rows}
+        domains = {row[0]: row[3] for row in rows}
+        results, updates = [], []
+        for outcome in outcomes:
+            tries = attempts[outcome.id]
+            if outcome.sent:
+                updates.append(("sent", tries, None, now, outcome.id))
+                results.append((outcome, None, domains[outcome.id]))
+            elif outcome.retry and tries < self.max_attempts:
+                # Exponential backoff with jitter, so a recovering server is not hit all at once
+                send_at = now + self.retry_base_seconds * 2 ** (tries - 1) * random.uniform(0.5, 1.5)
+                updates.append(("queued", tries, outcome.error, send_at, outcome.id))
+                results.append((outcome, send_at, domains[outcome.id]))
+            else:
+                updates.append(("failed", tries, outcome.error, None, outcome.id))
+                results.append((outcome, None, domains[outcome.id]))
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN")
+            conn.executemany(
+                "UPDATE outbox SET status = ?1, attempts = ?2, last_error = ?3, claimed_by = NULL, lease_until = NULL, "
+                "sent_at = CASE WHEN ?1 = 'sent' THEN ?4 ELSE sent_at END, "
+                "send_at = CASE WHEN ?1 = 'queued' THEN ?4 ELSE send_at END WHERE id = ?5",
+                updates,
+            )
+            conn.execute("COMMIT")
+        return results
+
+    def _unclaimed(self, now: float) -> List[Tuple[str, str, float]]:
+        """Rows due before the next rescan that no live claim holds."""
+        with self._lock:
+            return self._db().execute(
+                "SELECT id, domain, send_at FROM outbox WHERE "
+                "(status = 'queued' AND send_at <= ?) OR (status = 'sending' AND lease_until < ?)",
+                (now + self.rescan_seconds, now),
+            ).fetchall()
+
+    def get(self, message_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT recipient, subject, status, send_at, attempts, last_error, sent_at FROM outbox WHERE id = ?",
+                (message_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("recipient", "subject", "status", "send_at", "attempts", "last_error", "sent_at")
+        return dict(zip(keys, row))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            by_status = dict(self._db().execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"))
+        return {
+            "delivering": self.delivering and self._loop is not None,
+            "rows": by_status,
+            "ready": sum(len(queue) for queue in self._ready.values()),
+            "scheduled": self.wheel.pending,
+            "in_flight_batches": len(self._tasks),
+            "connections": {
+                "idle": self.pool.connections(),
+                "opened": self.pool.opened,
+                "reused": self.pool.reused,
+            },
+            **self.counts,
+            "last_error": self.last_error,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Parsing of tool arguments
+
+_RELATIVE_RE = re.compile(r"^in\s+(.+)$")
+_AT_RE = re.compile(r"\s+at\s+|\s+(?=\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?$)")
+
+
+def parse_send_time(text: str, now: datetime, tz: tzinfo) -> datetime:
+    """"in 2 hours", "tomorrow 9am", "friday at 14:30", "2026-10-20 08:00" or a time today."""
+    value = text.strip().lower()
+    match = _RELATIVE_RE.match(value)
+    if match:
+        return now + timedelta(seconds=parse_duration(match.group(1)))
+    try:
+        parsed = datetime.fromisoformat(text.strip())
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=tz)
+    except ValueError:
+        pass
+    parts = _AT_RE.split(value, maxsplit=1)
+    if len(parts) == 2:
+        day, clock = parse_date(parts[0], now.date()), parse_time(parts[1])
+        return datetime.combine(day, clock, tz)
+    try:
+        clock = parse_time(value)
+    except ValueError:
+        # A day alone: the start of the working day
+        return datetime.combine(parse_date(value, now.date()), parse_time("09:00"), tz)
+    when = datetime.combine(now.date(), clock, tz)
+    return when if when > now else when + timedelta(days=1)
+
+
+# Process-wide outbox; the file is opened by the first tool call
+outbox = Outbox()
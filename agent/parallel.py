@@ -0,0 +1,123 @@
+"""
+Parallel fan-out of multi-domain requests to several specialist agents.
+
+The supervisor emits one LangGraph Send per sub-task to branch_node. In each
+branch's input the user's request is narrowed to its sub-task. Branches
+run concurrently in the same superstep and park their state updates in
+`branch_results`; merge_node then folds them into the shared state in branch
+order, so the result does not depend on which branch finished first.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.types import Send
+
+from metrics import instrument_node
+from routing import RoutingDecision
+from state import AgentState
+
+# Per-domain collections a specialist may append to
+MERGED_COLLECTIONS = ("scheduled_events", "recent_emails", "research_results")
+
+
+def scoped_messages(messages: Sequence[BaseMessage], task: str) -> List[BaseMessage]:
+    """The history with the latest user message replaced by one sub-task."""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            # Same id, so the branch's new messages are still told apart from its input
+            scoped = messages[index].model_copy(update={"content": task})
+            return [*messages[:index], scoped, *messages[index + 1 :]]
+    return list(messages)
+
+
+def fan_out(state: AgentState, plan: List[RoutingDecision]) -> List[Send]:
+    """Build one Send per sub-task, each with the task scoped into its state.
+
+    A branch sees only its own clause as the user's request, so it cannot act
+    on another branch's part of it.
+
+    >>> from langchain_core.messages import AIMessage
+    >>> state = {"messages": [
+    ...     HumanMessage("hi", id="1"), AIMessage("hello", id="2"),
+    ...     HumanMessage("Email Bob the report, then book a room for Friday", id="3"),
+    ... ]}
+    >>> plan = [RoutingDecision("email", 0.9, "fan_out", task="Email Bob the report"),
+    ...         RoutingDecision("scheduler", 0.9, "fan_out", task="book a room for Friday")]
+    >>> [[(m.id, m.content) for m in send.arg["state"]["messages"]] for send in fan_out(state, plan)]
+    [[('1', 'hi'), ('2', 'hello'), ('3', 'Email Bob the report')], [('1', 'hi'), ('2', 'hello'), ('3', 'book a room for Friday')]]
+    """
+    sends = []
+    for index, decision in enumerate(plan):
+        branch_state = {
+            **state,
+            "messages": scoped_messages(state.get("messages", []), decision.task),
+            "current_task": decision.task,
+            "conversation_context": {
+                **state.get("conversation_context", {}),
+                "subtask": decision.task,
+            },
+        }
+        sends.append(
+            Send(
+                "branch_node",
+                {"index": index, "agent": decision.agent, "state": branch_state},
+            )
+        )
+    return sends
+
+
+class ParallelDispatcher:
+    """Runs specialist branches and merges their results deterministically."""
+
+    def __init__(self, specialists: Dict[str, Any]):
+        self.specialists = specialists
+        # Branches report under the specialist's own node name, as when routed directly
+        self._process = {
+            name: instrument_node(f"{name}_node", agent.process)
+            for name, agent in specialists.items()
+        }
+
+    async def run_branch(self, branch: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        """Run one specialist on its sub-task and record its update for merging."""
+        agent = branch["agent"]
+        command = await self._process[agent](branch["state"], config)
+        return {
+            "branch_results": [
+                {
+                    "index": branch["index"],
+                    "agent": agent,
+                    "update": command.update,
+                }
+            ]
+        }
+
+    def merge(self, state: AgentState) -> Dict[str, Any]:
+        """Combine all branch updates in branch order and clear the buffer."""
+        branches = sorted(state.get("branch_results", []), key=lambda b: b["index"])
+
+        messages = []
+        logs = []
+        collections: Dict[str, List[Dict[str, Any]]] = {key: [] for key in MERGED_COLLECTIONS}
+
+        # Specialists return only their new messages and entries, so merging
+        # is concatenation in branch order
+        for branch in branches:
+            update = branch["update"]
+            messages.extend(update.get("messages", []))
+            for key in MERGED_COLLECTIONS:
+                collections[key].extend(update.get(key, []))
+            logs.extend(update.get("logs", []))
+
+        logs.append(
+            {"message": f"🔀 Merged results from {len(branches)} agents", "done": True}
+        )
+
+        return {
+            "messages": messages,
+            **{key: entries for key, entries in collections.items() if entries},
+            "logs": logs,
+            "active_agent": ", ".join(branch["agent"] for branch in branches),
+            "branch_results": [],
+        }
@@ -0,0 +1,81 @@
+"""
+Prefix-cache-friendly prompt assembly shared by the supervisor and specialist agents.
+
+Local backends (LM Studio, llama.cpp, vLLM) reuse the KV cache for the longest
+prompt prefix they have already seen. Prompts are therefore laid out as:
+
+    [static system prompt] + [conversation history] + [volatile context]
+
+The static system prompt is byte-identical on every call and the history only
+ever grows at the end, so everything except the short trailing context message
+is served from cache.
+"""
+
+from datetime import datetime
+from textwrap import dedent
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest
+from langchain_core.messages import BaseMessage, SystemMessage
+
+ContextFn = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+def current_time_context(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Volatile context every agent needs to resolve relative dates."""
+    return {"Current time": datetime.now().strftime("%Y-%m-%d %H:%M (%A)")}
+
+
+class PromptBuilder:
+    """
+    Builds prompts with a byte-stable static prefix and a trailing context message.
+    """
+
+    def __init__(self, static_prompt: str, context_fn: Optional[ContextFn] = None):
+        # Normalize indentation once so the prefix never changes between calls
+        self.static_prompt = dedent(static_prompt).strip()
+        self.system_message = SystemMessage(content=self.static_prompt)
+        self.context_fn = context_fn or current_time_context
+
+    def context_message(self, state: Dict[str, Any]) -> Optional[SystemMessage]:
+        """Render the volatile state as a short message placed after the history."""
+        context = self.context_fn(state)
+        if not context:
+            return None
+        lines = [f"- {key}: {value}" for key, value in context.items()]
+        return SystemMessage(content="Current context:\n" + "\n".join(lines))
+
+    def build(
+        self, state: Dict[str, Any], messages: Optional[List[BaseMessage]] = None
+    ) -> List[BaseMessage]:
+        """Return [static system prompt, *history, volatile context]."""
+        history = list(state.get("messages", []) if messages is None else messages)
+        prompt = [self.system_message, *history]
+        context = self.context_message(state)
+        if context is not None:
+            prompt.append(context)
+        return prompt
+
+    def middleware(self) -> AgentMiddleware:
+        """Middleware that appends the volatile context to create_agent model calls."""
+        return _TrailingContextMiddleware(self)
+
+
+class _TrailingContextMiddleware(AgentMiddleware):
+    """Appends the builder's context message to each model request."""
+
+    def __init__(self, builder: PromptBuilder):
+        super().__init__()
+        self.builder = builder
+
+    def _with_context(self, request: ModelRequest) -> ModelRequest:
+        context = self.builder.context_message(request.state or {})
+        if context is None:
+            return request
+        return request.override(messages=[*request.messages, context])
+
+    def wrap_model_call(self, request, handler):
+        return handler(self._with_context(request))
+
+    async def awrap_model_call(self, request, handler):
+        return await handler(self._with_context(request))
@@ -0,0 +1,330 @@
+"""
+Recurring event series for the calendar store.
+
+A series is stored as its rule, not as instances: the first occurrence, a
+duration, an RRULE subset (FREQ=DAILY/WEEKLY/MONTHLY/YEARLY with INTERVAL,
+BYDAY, COUNT and UNTIL), exception dates and per-instance overrides.
+Occurrences come from a generator that jumps arithmetically to the first
+candidate date of a query window and stops at its end, so a query never
+materialises instances outside the window, however long the series runs.
+
+Occurrences keep their wall-clock time in the calendar's time zone across DST
+changes. Each is identified by its original date ("<series id>@YYYY-MM-DD",
+the iCalendar RECURRENCE-ID); an override moves that instance, an exception
+date removes it.
+
+Two series clash either never or once every repeat period of the pair (the
+least common multiple of their periods), so rule-against-rule conflict checks
+only expand one such period. Monthly against daily or weekly rules has no
+short common period; those are checked over a bounded horizon.
+"""
+
+import heapq
+from dataclasses import dataclass, field
+from datetime import MAXYEAR, date as Date, datetime, timedelta, tzinfo
+from math import gcd
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+# Rule-against-rule checks without a common period look this far ahead
+HORIZON_DAYS = 366
+# Repeat periods scanned for a clash not removed by exception dates
+MAX_REPEATS = 64
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+_DAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+
+@dataclass(frozen=True)
+class Rule:
+    """The supported subset of an RFC 5545 RRULE; `until` is an inclusive local date."""
+
+    freq: str
+    interval: int = 1
+    byday: Tuple[int, ...] = ()
+    count: Optional[int] = None
+    until: Optional[Date] = None
+
+    def __post_init__(self):
+        if self.freq not in FREQUENCIES:
+            raise ValueError(f"unsupported frequency {self.freq!r}")
+        if self.interval < 1 or (self.count is not None and self.count < 1):
+            raise ValueError("INTERVAL and COUNT must be positive")
+        if self.byday and self.freq != "WEEKLY":
+            raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+
+    def __str__(self) -> str:
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.byday:
+            parts.append("BYDAY=" + ",".join(_DAY_CODES[day] for day in self.byday))
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until:%Y%m%d}")
+        return ";".join(parts)
+
+    def period_days(self) -> Optional[int]:
+        """Days after which the pattern of dates repeats, if that is fixed."""
+        if self.freq == "DAILY":
+            return self.interval
+        if self.freq == "WEEKLY":
+            return 7 * self.interval
+        return None
+
+    def period_months(self) -> Optional[int]:
+        if self.freq == "MONTHLY":
+            return self.interval
+        if self.freq == "YEARLY":
+            return 12 * self.interval
+        return None
+
+    def weekdays(self, first: Date) -> Tuple[int, ...]:
+        return self.byday or (first.weekday(),)
+
+
+def parse_rrule(text: str) -> Rule:
+    """An RRULE value such as "FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10"."""
+    fields = {}
+    for part in text.strip().upper().removeprefix("RRULE:").split(";"):
+        key, _, value = part.partition("=")
+        if part:
+            fields[key.strip()] = value.strip()
+    try:
+        rule = Rule(
+            fields.pop("FREQ"),
+            int(fields.pop("INTERVAL", 1)),
+            tuple(sorted({_DAY_CODES.index(day[-2:]) for day in fields.pop("BYDAY").split(",")}))
+            if "BYDAY" in fields
+            else (),
+            int(fields.pop("COUNT")) if "COUNT" in fields else None,
+            datetime.strptime(fields.pop("UNTIL")[:8], "%Y%m%d").date() if "UNTIL" in fields else None,
+        )
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"unrecognised RRULE {text!r}") from e
+    if fields:
+        raise ValueError(f"unsupported RRULE parts {', '.join(fields)}")
+    return rule
+
+
+@dataclass(slots=True)
+class Series:
+    """A recurring event: its first occurrence, rule and exceptions.
+
+    `overrides` maps an original occurrence date to the instance's new
+    (start, end); `exdates` are occurrence dates that were cancelled.
+    """
+
+    id: str
+    title: str
+    start: int
+    duration: int
+    rule: Rule
+    participants: Tuple[str, ...]
+    tz: tzinfo
+    exdates: Set[Date] = field(default_factory=set)
+    overrides: Dict[Date, Tuple[int, int]] = field(default_factory=dict)
+
+    @property
+    def first(self) -> datetime:
+        return datetime.fromtimestamp(self.start, self.tz)
+
+    def occurrence_id(self, day: Date) -> str:
+        return f"{self.id}@{day.isoformat()}"
+
+    def at(self, day: Date) -> int:
+        """Start of the occurrence originally on `day`."""
+        return int(datetime.combine(day, self.first.timetz().replace(tzinfo=None), self.tz).timestamp())
+
+    def bounds(self) -> Tuple[int, Optional[int]]:
+        """First start and last end of the series, None when it never ends."""
+        first = self.first.date()
+        last: Optional[int] = None
+        if self.rule.until is not None or self.rule.count is not None:
+            # With only UNTIL, the last period before it holds the final date
+            rule, from_day = self.rule, first
+            if rule.count is None:
+                lookback = rule.period_days() or rule.period_months() * 31
+                from_day = rule.until - timedelta(days=lookback)
+            final = None
+            for _, day in occurrence_dates(rule, first, from_day):
+                final = day
+            last = self.at(final) + self.duration if final is not None else self.start
+        moved = list(self.overrides.values())
+        start = min([self.start, *(s for s, _ in moved)])
+        if last is not None and moved:
+            last = max(last, *(e for _, e in moved))
+        return start, last
+
+    def is_occurrence(self, day: Date) -> bool:
+        """Whether the rule has an occurrence on `day`, cancelled or not."""
+        return next(occurrence_dates(self.rule, self.first.date(), day), (0, None))[1] == day
+
+    def occurrences(self, start: int, end: int, exceptions: bool = True) -> Iterator[Tuple[int, int, Date]]:
+        """(start, end, original date) of instances overlapping [start, end), in start order.
+
+        With `exceptions` False the bare rule is expanded, ignoring exception
+        dates and overrides.
+        """
+        moved = []
+        if exceptions:
+            moved = sorted(
+                (s, e, day) for day, (s, e) in self.overrides.items() if s < end and start < e
+            )
+        return heapq.merge(self._regular(start, end, exceptions), moved)
+
+    def _regular(self, start: int, end: int, exceptions: bool) -> Iterator[Tuple[int, int, Date]]:
+        first = self.first
+        from_day = datetime.fromtimestamp(start - self.duration, self.tz).date()
+        wall = first.timetz().replace(tzinfo=None)
+        for _, day in occurrence_dates(self.rule, first.date(), from_day):
+            begin = int(datetime.combine(day, wall, self.tz).timestamp())
+            if begin >= end:
+                return
+            if exceptions and (day in self.exdates or day in self.overrides):
+                continue
+            if begin + self.duration > start:
+                yield begin, begin + self.duration, day
+
+
+def _add_months(day: Date, months: int, monthday: int) -> Optional[Date]:
+    """`monthday` of the month `months` after `day`'s, None if that month is too short."""
+    total = day.year * 12 + day.month - 1 + months
+    try:
+        return Date(total // 12, total % 12 + 1, monthday)
+    except ValueError:
+        return None
+
+
+def occurrence_dates(rule: Rule, first: Date, from_day: Date) -> Iterator[Tuple[int, Date]]:
+    """(index, date) of the rule's occurrences on or after `from_day`, lazily.
+
+    `index` counts occurrences from the first (for COUNT). The generator
+    starts at the period containing `from_day` instead of at `first`.
+    """
+    from_day = max(from_day, first)
+    until, count = rule.until, rule.count
+    if rule.freq == "DAILY":
+        step = rule.interval
+        k = -(-(from_day - first).days // step)
+        while True:
+            day = first + timedelta(days=k * step)
+            if (count is not None and k >= count) or (until is not None and day > until):
+                return
+            yield k, day
+            k += 1
+
+    elif rule.freq == "WEEKLY":
+        weekdays = rule.weekdays(first)
+        week0 = first - timedelta(days=first.weekday())
+        in_first_week = sum(1 for d in weekdays if d >= first.weekday())
+        weeks = (from_day - week0).days // 7
+        group = -(-weeks // rule.interval)
+        index = in_first_week + (group - 1) * len(weekdays) if group else 0
+        while True:
+            monday = week0 + timedelta(weeks=group * rule.interval)
+            for weekday in weekdays:
+                day = monday + timedelta(days=weekday)
+                if day < first:
+                    continue
+                if (count is not None and index >= count) or (until is not None and day > until):
+                    return
+                if day >= from_day:
+                    yield index, day
+                index += 1
+            group += 1
+
+    else:
+        step = rule.period_months()
+        months = (from_day.year - first.year) * 12 + from_day.month - first.month
+        group = max(0, months // step)
+        if first.day <= 28:
+            index = group
+        else:
+            # Months too short for the day are skipped, so count the real ones
+            index = sum(1 for g in range(group) if _add_months(first, g * step, first.day))
+        while first.year + (first.month - 1 + group * step) // 12 <= MAXYEAR:
+            day = _add_months(first, group * step, first.day)
+            group += 1
+            if day is None:
+                continue
+            if (count is not None and index >= count) or (until is not None and day > until):
+                return
+            if day >= from_day:
+                yield index, day
+            index += 1
+
+
+def _lcm(a: int, b: int) -> int:
+    return a * b // gcd(a, b)
+
+
+def first_clash(a: Series, b: Series) -> Optional[Tuple[int, Date, Date]]:
+    """First (start, date in a, date in b) where instances of two series overlap.
+
+    Both series are in the same time zone, so the pattern of clashes repeats
+    with the pair's common period. The bare rules are intersected over one
+    period; only if they meet are exceptions applied, scanning period by
+    period for a clash they do not remove.
+    """
+    a_start, a_end = a.bounds()
+    b_start, b_end = b.bounds()
+    lo = max(a_start, b_start)
+    ends = [end for end in (a_end, b_end) if end is not None]
+    hi = min(ends) if ends else None
+    if hi is not None and hi <= lo:
+        return None
+
+    days_a, days_b = a.rule.period_days(), b.rule.period_days()
+    months_a, months_b = a.rule.period_months(), b.rule.period_months()
+    if days_a and days_b:
+        period = _lcm(days_a, days_b) * 86400
+    elif months_a and months_b:
+        # Up to 31 days a month, plus a leap day for yearly rules
+        period = _lcm(months_a, months_b) * 31 * 86400 + 86400
+    else:
+        period = HORIZON_DAYS * 86400
+    slack = max(a.duration, b.duration) + 86400
+    window = period + slack
+
+    def scan(start: int, end: int, exceptions: bool) -> Optional[Tuple[int, Date, Date]]:
+        if hi is not None:
+            end = min(end, hi)
+        left = list(a.occurrences(start, end, exceptions))
+        right = list(b.occurrences(start, end, exceptions))
+        # Merge-join of two start-ordered lists of intervals
+        reach = max((e - s for s, e, _ in right), default=0)
+        j = 0
+        for s, e, day in left:
+            while j < len(right) and right[j][0] + reach <= s:
+                j += 1
+            k = j
+            while k < len(right) and right[k][0] < e:
+                if right[k][1] > s:
+                    return max(s, right[k][0]), day, right[k][2]
+                k += 1
+        return None
+
+    found = scan(lo, lo + window, exceptions=True)
+    if found is not None or not (a.overrides or b.overrides or a.exdates or b.exdates):
+        return found
+    if scan(lo, lo + window, exceptions=False) is None:
+        # The rules never meet; only moved instances can clash
+        return _moved_clash(a, b) or _moved_clash(b, a, swap=True)
+    start = lo + period
+    for _ in range(MAX_REPEATS):
+        if hi is not None and start >= hi:
+            return None
+        found = scan(start, start + window, exceptions=True)
+        if found is not None:
+            return found
+        start += period
+    return None
+
+
+def _moved_clash(a: Series, b: Series, swap: bool = False) -> Optional[Tuple[int, Date, Date]]:
+    for day, (s, e) in sorted(a.overrides.items(), key=lambda item: item[1]):
+        for other_start, _, other_day in b.occurrences(s, e):
+            found = (max(s, other_start), day, other_day)
+            return (found[0], found[2], found[1]) if swap else found
+    return None
@@ -0,0 +1,421 @@
+"""
+LLM response cache shared by every model in the registry.
+
+Users repeat near-identical requests ("schedule a sync with the team
+tomorrow"), and each one used to cost full generations. The registry in llm.py
+gives every model (supervisor routing and the create_agent specialists) this
+cache through LangChain's cache hook, which is consulted before each call:
+- exact tier: the key is the model settings and bound tool schemas (LangChain's
+  llm_string) plus the prompt normalized to role, text and tool calls. Message
+  ids, tool call ids, metadata and runs of whitespace do not count
+- semantic tier (LLM_CACHE=semantic with LLM_CACHE_EMBEDDING_MODEL): on an
+  exact miss for a turn's first step (no tool results yet), the latest user
+  message is embedded and compared by cosine similarity with earlier first
+  steps of the same role, prompt, tools and preceding conversation, in one
+  NumPy matrix. Only the trailing context message is left out of that match,
+  so in practice it serves the opening request of a thread; a follow-up such
+  as "move it to 3pm" only matches after an identical conversation. Requests
+  a few words apart ("at 3pm" / "at 4pm") can still be close neighbours, so
+  only plain-text answers are matched: an answer with tool calls is served
+  from the exact tier alone, never with another request's arguments
+- entries expire after LLM_CACHE_TTL_SECONDS and the least recently used are
+  evicted beyond LLM_CACHE_MAX_BYTES
+- side effects are never replayed. Answers that call a tool in
+  LLM_CACHE_BYPASS_TOOLS are not stored, and a step that follows one of those
+  calls skips the cache
+- lookups are counted per result on /metrics, and GET /llm/cache reports the
+  hit ratio
+
+Environment:
+- LLM_CACHE (default "exact"): "off", "exact" or "semantic"
+- LLM_CACHE_TTL_SECONDS (default 600)
+- LLM_CACHE_MAX_BYTES (default 32 MiB)
+- LLM_CACHE_SIMILARITY (default 0.95): cosine threshold of the semantic tier
+- LLM_CACHE_EMBEDDING_MODEL: embedding model served by the first backend (for
+  example nomic-embed-text in LM Studio). Without one, LLM_CACHE=semantic
+  falls back to the exact tier
+- LLM_CACHE_BYPASS_TOOLS (default "send_email,schedule_email_send,manage_email_thread,create_event,create_recurring_event,cancel_event_occurrence,reschedule_event")
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+import numpy as np
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps
+from langchain_core.outputs import ChatGeneration
+
+from balancing import backend_urls
+from metrics import llm_cache_lookups, metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("off", "exact", "semantic")
+LOOKUP_RESULTS = ("exact", "semantic", "miss", "bypass")
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, list):
+        content = " ".join(
+            part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+        )
+    return " ".join(str(content or "").split())
+
+
+def normalize(prompt: str) -> List[Dict[str, Any]]:
+    """Role, text and tool calls of each message in a serialized prompt."""
+    normalized = []
+    for message in json.loads(prompt):
+        kwargs = message.get("kwargs", {})
+        entry: Dict[str, Any] = {"type": kwargs.get("type"), "content": _text(kwargs.get("content"))}
+        if kwargs.get("tool_calls"):
+            entry["tool_calls"] = [[call["name"], call["args"]] for call in kwargs["tool_calls"]]
+        if kwargs.get("type") == "tool":
+            entry["name"] = kwargs.get("name")
+        normalized.append(entry)
+    return normalized
+
+
+def _plain_text(generations: RETURN_VAL_TYPE) -> bool:
+    """Whether an answer is text only; tool call arguments are never reused for a similar request."""
+    return not any(getattr(getattr(g, "message", None), "tool_calls", None) for g in generations)
+
+
+class CacheRequest:
+    """What one lookup or update needs to know about a prompt."""
+
+    def __init__(self, prompt: str, llm_string: str, bypass_tools: Sequence[str]):
+        messages = normalize(prompt)
+        self.key = hashlib.sha256(
+            json.dumps([llm_string, messages], sort_keys=True).encode()
+        ).hexdigest()
+
+        last_user = max((i for i, m in enumerate(messages) if m["type"] == "human"), default=-1)
+        turn = messages[last_user + 1 :]
+        called = {call[0] for m in turn for call in m.get("tool_calls", [])}
+        called.update(m.get("name") for m in turn if m["type"] == "tool")
+        self.bypass = any(name in called for name in bypass_tools)
+
+        # Only a first step is answered from the user message alone
+        self.query: Optional[str] = None
+        self.namespace = 0
+        if last_user >= 0 and not any(m["type"] == "tool" for m in turn):
+            self.query = messages[last_user]["content"]
+            # The same words after a different conversation ask something else, so
+            # everything but the query and the trailing context message (the current
+            # time) scopes the match: system prompt, earlier turns and summary
+            volatile = 1 if turn and turn[-1]["type"] == "system" else 0
+            context = messages[:last_user] + turn[: len(turn) - volatile]
+            digest = hashlib.sha256(json.dumps([llm_string, context], sort_keys=True).encode()).digest()
+            # Never 0, which marks a free row of the index
+            self.namespace = int.from_bytes(digest[:8], "little", signed=True) | 1
+
+
+class BackendEmbedder:
+    """Embeddings from an OpenAI-compatible /embeddings endpoint, such as LM Studio's."""
+
+    def __init__(self, base_url: str, model: str, timeout: float = 30.0):
+        self.url = base_url.rstrip("/") + "/embeddings"
+        self.model = model
+        self.timeout = timeout
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    def _vector(self, response: httpx.Response) -> np.ndarray:
+        response.raise_for_status()
+        vector = np.asarray(response.json()["data"][0]["embedding"], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, text: str) -> np.ndarray:
+        if self._client is None:
+            self._client = httpx.Client(timeout=self.timeout)
+        return self._vector(self._client.post(self.url, json={"model": self.model, "input": text}))
+
+    async def aembed(self, text: str) -> np.ndarray:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(timeout=self.timeout)
+        response = await self._async_client.post(self.url, json={"model": self.model, "input": text})
+        return self._vector(response)
+
+
+class SemanticIndex:
+    """Unit vectors of cached first steps in one matrix, searched by cosine similarity."""
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.vectors: Optional[np.ndarray] = None
+        # Namespace per row; 0 marks a free row
+        self.namespaces = np.zeros(capacity, dtype=np.int64)
+        self.keys: List[Optional[str]] = [None] * capacity
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def add(self, key: str, namespace: int, vector: np.ndarray) -> int:
+        if self.vectors is None:
+            self.vectors = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+        if not self.free:
+            # Double the matrix; rows keep their positions
+            grown = self.capacity * 2
+            self.vectors = np.vstack([self.vectors, np.zeros_like(self.vectors)])
+            self.namespaces = np.concatenate([self.namespaces, np.zeros(self.capacity, dtype=np.int64)])
+            self.keys.extend([None] * self.capacity)
+            self.free = list(range(grown - 1, self.capacity - 1, -1))
+            self.capacity = grown
+        row = self.free.pop()
+        self.vectors[row] = vector
+        self.namespaces[row] = namespace
+        self.keys[row] = key
+        return row
+
+    def remove(self, row: int):
+        self.namespaces[row] = 0
+        self.keys[row] = None
+        self.free.append(row)
+
+    def search(self, namespace: int, vector: np.ndarray) -> Tuple[Optional[str], float]:
+        """Most similar key in `namespace` and its cosine similarity."""
+        if self.vectors is None or len(vector) != self.vectors.shape[1]:
+            return None, 0.0
+        rows = np.flatnonzero(self.namespaces == namespace)
+        if not len(rows):
+            return None, 0.0
+        scores = self.vectors[rows] @ vector
+        best = int(scores.argmax())
+        return self.keys[rows[best]], float(scores[best])
+
+
+class CacheEntry:
+    __slots__ = ("generations", "expires", "size", "row")
+
+    def __init__(self, generations: List[ChatGeneration], expires: float, size: int):
+        self.generations = generations
+        self.expires = expires
+        self.size = size
+        self.row: Optional[int] = None
+
+
+class ResponseCache(BaseCache):
+    """Exact and semantic LLM response cache with TTL, LRU and a byte budget."""
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        similarity: Optional[float] = None,
+        bypass_tools: Optional[Sequence[str]] = None,
+        embedder: Optional[Any] = None,
+    ):
+        self.mode = mode or os.getenv("LLM_CACHE", "exact")
+        if self.mode not in CACHE_MODES:
+            raise ValueError(f"LLM_CACHE must be one of {CACHE_MODES}, got {self.mode!r}")
+        self.ttl_seconds = ttl_seconds or float(os.getenv("LLM_CACHE_TTL_SECONDS", "600"))
+        self.max_bytes = max_bytes or int(os.getenv("LLM_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+        self.similarity = similarity or float(os.getenv("LLM_CACHE_SIMILARITY", "0.95"))
+        if bypass_tools is None:
+            bypass_tools = os.getenv(
+                "LLM_CACHE_BYPASS_TOOLS", "send_email,schedule_email_send,manage_email_thread,create_event,create_recurring_event,cancel_event_occurrence,reschedule_event"
+            ).split(",")
+        self.bypass_tools = [name.strip() for name in bypass_tools if name.strip()]
+        if embedder is None and self.mode == "semantic":
+            model = os.getenv("LLM_CACHE_EMBEDDING_MODEL")
+            if model:
+                embedder = BackendEmbedder(backend_urls()[0], model)
+            else:
+                logger.warning("LLM_CACHE=semantic needs LLM_CACHE_EMBEDDING_MODEL; using the exact tier only")
+                self.mode = "exact"
+        self.embedder = embedder
+
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._index = SemanticIndex()
+        # Query vectors of recent misses, reused when their answer is stored
+        self._pending: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.lookups = dict.fromkeys(LOOKUP_RESULTS, 0)
+        self.evictions = {"ttl": 0, "lru": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def semantic(self) -> bool:
+        return self.mode == "semantic"
+
+    # LangChain cache interface
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        request = CacheRequest(prompt, llm_string, self.bypass_tools)
+        hit = self._lookup_exact(request)
+        if hit is None and self._wants_vector(request):
+            hit = self._lookup_semantic(request, self.embedder.embed(request.query))
+        return self._finish_lookup(request, hit)
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        request = CacheRequest(prompt, llm_string, self.bypass_tools)
+        hit = self._lookup_exact(request)
+        if hit is None and self._wants_vector(request):
+            hit = self._lookup_semantic(request, await self.embedder.aembed(request.query))
+        return self._finish_lookup(request, hit)
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        request = CacheRequest(prompt, llm_string, self.bypass_tools)
+        if self._storable(request, return_val):
+            vector = self._pending_vector(request)
+            if vector is None and self._wants_vector(request, return_val):
+                vector = self.embedder.embed(request.query)
+            self._store(request, return_val, vector)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        request = CacheRequest(prompt, llm_string, self.bypass_tools)
+        if self._storable(request, return_val):
+            vector = self._pending_vector(request)
+            if vector is None and self._wants_vector(request, return_val):
+                vector = await self.embedder.aembed(request.query)
+            self._store(request, return_val, vector)
+
+    def clear(self, **kwargs: Any):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+            self._index = SemanticIndex()
+            self.bytes = 0
+
+    async def aclear(self, **kwargs: Any):
+        self.clear()
+
+    # Internals
+
+    def _wants_vector(self, request: CacheRequest, return_val: Optional[RETURN_VAL_TYPE] = None) -> bool:
+        if return_val is not None and not _plain_text(return_val):
+            return False
+        return self.semantic and not request.bypass and bool(request.query)
+
+    def _lookup_exact(self, request: CacheRequest) -> Optional[Tuple[str, CacheEntry]]:
+        if request.bypass:
+            return None
+        with self._lock:
+            entry = self._live(request.key)
+        return ("exact", entry) if entry is not None else None
+
+    def _lookup_semantic(
+        self, request: CacheRequest, vector: np.ndarray
+    ) -> Optional[Tuple[str, CacheEntry]]:
+        with self._lock:
+            key, score = self._index.search(request.namespace, vector)
+            entry = self._live(key) if key is not None and score >= self.similarity else None
+            if entry is None:
+                self._pending[request.key] = vector
+                while len(self._pending) > 256:
+                    self._pending.popitem(last=False)
+        return ("semantic", entry) if entry is not None else None
+
+    def _live(self, key: str) -> Optional[CacheEntry]:
+        """Unexpired entry for `key`, marked as most recently used. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            self._evict(key, "ttl")
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _finish_lookup(
+        self, request: CacheRequest, hit: Optional[Tuple[str, CacheEntry]]
+    ) -> Optional[RETURN_VAL_TYPE]:
+        result = "bypass" if request.bypass else hit[0] if hit else "miss"
+        self.lookups[result] += 1
+        llm_cache_lookups.labels(result).inc()
+        return self._replay(hit[1].generations, hit[0]) if hit else None
+
+    def _replay(self, generations: List[ChatGeneration], tier: str) -> List[ChatGeneration]:
+        """Fresh copies of cached generations, with new tool call ids."""
+        replayed = []
+        for generation in generations:
+            message = generation.message.model_copy(deep=True)
+            for call in message.tool_calls:
+                call["id"] = f"call_{uuid.uuid4().hex[:24]}"
+            message.response_metadata["cache"] = tier
+            replayed.append(ChatGeneration(message=message, generation_info=generation.generation_info))
+        return replayed
+
+    def _storable(self, request: CacheRequest, return_val: RETURN_VAL_TYPE) -> bool:
+        if request.bypass:
+            return False
+        for generation in return_val:
+            message = getattr(generation, "message", None)
+            if message is None:
+                return False
+            # Replaying a side effect would repeat it without the model deciding to
+            if any(call["name"] in self.bypass_tools for call in getattr(message, "tool_calls", [])):
+                return False
+        return True
+
+    def _pending_vector(self, request: CacheRequest) -> Optional[np.ndarray]:
+        with self._lock:
+            return self._pending.pop(request.key, None)
+
+    def _store(self, request: CacheRequest, return_val: RETURN_VAL_TYPE, vector: Optional[np.ndarray]):
+        generations = [
+            ChatGeneration(
+                # Replayed answers generated no tokens
+                message=generation.message.model_copy(update={"id": None, "usage_metadata": None}),
+                generation_info=generation.generation_info,
+            )
+            for generation in return_val
+        ]
+        size = len(request.key) + len(dumps(generations)) + (vector.nbytes if vector is not None else 0)
+        if size > self.max_bytes:
+            return
+        entry = CacheEntry(generations, time.monotonic() + self.ttl_seconds, size)
+        with self._lock:
+            if request.key in self._entries:
+                self._evict(request.key)
+            if vector is not None and _plain_text(generations):
+                entry.row = self._index.add(request.key, request.namespace, vector)
+            self._entries[request.key] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes:
+                self._evict(next(iter(self._entries)), "lru")
+
+    def _evict(self, key: str, reason: Optional[str] = None):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        if entry.row is not None:
+            self._index.remove(entry.row)
+        if reason:
+            self.evictions[reason] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        hits = self.lookups["exact"] + self.lookups["semantic"]
+        answered = hits + self.lookups["miss"]
+        return {
+            "mode": self.mode,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "lookups": dict(self.lookups),
+            "hit_ratio": round(hits / answered, 4) if answered else 0.0,
+            "evictions": dict(self.evictions),
+        }
+
+
+# Process-wide cache shared by every model from the registry
+response_cache = ResponseCache()
+
+metrics.gauge(
+    "agent_llm_cache_bytes",
+    "Bytes held by the LLM response cache.",
+    [],
+    lambda: {(): response_cache.bytes},
+)
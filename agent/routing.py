@@ -0,0 +1,559 @@
+"""
+Request routing for the supervisor: a local fast-path classifier and a
+constrained, short-budget LLM routing call for the ambiguous remainder.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
+
+AGENT_NAMES = ("email", "scheduler", "research")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RoutingDecision:
+    """Which specialist handles a request, how sure we are, and who decided."""
+
+    agent: str
+    confidence: float
+    source: str  # "fast_path", "fan_out", "llm" or "classifier_fallback"
+    reasoning: str = ""
+    task: str = ""
+
+# Weighted keyword tables. Strong domain words carry more weight than generic
+# verbs such as "send" or "find" that appear across domains.
+ROUTING_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "email": {
+        "email": 3.0,
+        "mail": 2.5,
+        "inbox": 2.5,
+        "compose": 2.0,
+        "reply": 2.0,
+        "forward": 2.0,
+        "thread": 1.5,
+        "archive": 1.5,
+        "unread": 1.5,
+        "draft": 1.5,
+        "recipient": 1.5,
+        "subject": 1.0,
+        "send": 0.75,
+        "message": 0.75,
+    },
+    "scheduler": {
+        "schedule": 2.5,
+        "calendar": 3.0,
+        "meeting": 2.5,
+        "event": 2.0,
+        "appointment": 2.5,
+        "reschedule": 3.0,
+        "invite": 1.5,
+        "slot": 2.0,
+        "book": 1.5,
+        "available": 1.5,
+        "conflict": 1.5,
+        "standup": 1.5,
+        "sync": 1.0,
+        "tomorrow": 0.75,
+    },
+    "research": {
+        "research": 3.0,
+        "document": 2.5,
+        "doc": 2.0,
+        "search": 2.0,
+        "analyze": 2.5,
+        "analysis": 2.5,
+        "summarize": 2.0,
+        "summary": 2.0,
+        "report": 1.5,
+        "compare": 2.0,
+        "extract": 2.0,
+        "knowledge": 2.0,
+        "source": 1.0,
+        "find": 0.75,
+        "look": 0.5,
+    },
+}
+
+# Small labelled seed corpus used to train the TF-IDF centroid model.
+ROUTING_EXAMPLES: Dict[str, List[str]] = {
+    "email": [
+        "send an email to the team about the release",
+        "compose a follow up email to the client",
+        "draft a reply to john's message",
+        "email sarah the meeting notes",
+        "write an email thanking the vendor",
+        "forward the invoice email to accounting",
+        "archive the newsletter thread",
+        "mark the thread from hr as read",
+        "schedule this email to go out tomorrow morning",
+        "reply to the customer complaint politely",
+        "send a message to bob with the update",
+        "check my inbox for unread messages",
+    ],
+    "scheduler": [
+        "schedule a meeting with alice tomorrow at 3pm",
+        "book a sync with the team next week",
+        "find a free slot for a one hour call",
+        "create a calendar event for the product review",
+        "reschedule my 2pm appointment to friday",
+        "set up a recurring standup every monday",
+        "check if bob is available on thursday afternoon",
+        "send calendar invites for the planning session",
+        "are there any conflicts with the offsite",
+        "move the design review to next tuesday",
+        "put a dentist appointment on my calendar",
+        "when can we all meet this week",
+    ],
+    "research": [
+        "search the knowledge base for the security policy",
+        "find the document about the q3 roadmap",
+        "summarize the quarterly report",
+        "analyze the customer feedback survey",
+        "compare the two vendor proposals",
+        "extract the key figures from the financial statement",
+        "research best practices for onboarding",
+        "look up what our travel policy says",
+        "create a research summary of the competitor analysis",
+        "what does the architecture doc say about caching",
+        "give me an overview of the latest market study",
+        "find sources on remote work productivity",
+    ],
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+# A bare "and" usually joins objects ("Alice and Bob"), not tasks, so it is no boundary
+_CLAUSE_SPLIT_RE = re.compile(
+    r"[;,.!?]|\b(?:and then|then|and also|also|after that|afterwards)\b",
+    re.IGNORECASE,
+)
+# A later clause using one of these continues an earlier one ("reply to Sarah, tell her ...")
+_BACK_REFERENCES = frozenset(("he", "she", "they", "him", "her", "them", "his", "their", "it", "its"))
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "es", "ed", "ly", "s", "e", "y")
+
+
+def _stem(token: str) -> str:
+    """Strip a common English suffix so inflections share a feature."""
+    for suffix in _SUFFIXES:
+        if len(token) - len(suffix) >= 3 and token.endswith(suffix):
+            return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split and stem a message into routing features."""
+    return [_stem(token.strip("'")) for token in _TOKEN_RE.findall(text.lower())]
+
+
+class TfidfCentroidModel:
+    """
+    Linear TF-IDF classifier: each class is the normalized centroid of its
+    training vectors and a message is scored by cosine similarity.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]]):
+        documents = [
+            (label, Counter(tokenize(text)))
+            for label, texts in examples.items()
+            for text in texts
+        ]
+        doc_freq: Counter = Counter()
+        for _, counts in documents:
+            doc_freq.update(counts.keys())
+
+        total = len(documents)
+        self.idf = {
+            term: math.log((1 + total) / (1 + freq)) + 1.0
+            for term, freq in doc_freq.items()
+        }
+
+        self.centroids: Dict[str, Dict[str, float]] = {}
+        for label in examples:
+            centroid: Dict[str, float] = {}
+            for doc_label, counts in documents:
+                if doc_label != label:
+                    continue
+                for term, weight in self._vectorize(counts).items():
+                    centroid[term] = centroid.get(term, 0.0) + weight
+            self.centroids[label] = self._normalize(centroid)
+
+    def _vectorize(self, counts: Counter) -> Dict[str, float]:
+        vector = {
+            term: (1.0 + math.log(count)) * self.idf[term]
+            for term, count in counts.items()
+            if term in self.idf
+        }
+        return self._normalize(vector)
+
+    @staticmethod
+    def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if norm == 0.0:
+            return {}
+        return {term: value / norm for term, value in vector.items()}
+
+    def score(self, tokens: List[str]) -> Dict[str, float]:
+        """Return the cosine similarity between the message and each class."""
+        vector = self._vectorize(Counter(tokens))
+        return {
+            label: sum(weight * centroid.get(term, 0.0) for term, weight in vector.items())
+            for label, centroid in self.centroids.items()
+        }
+
+
+class RoutingStats:
+    """Counters describing how requests were routed."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.by_source: Counter = Counter()
+        self.by_agent: Counter = Counter()
+
+    def record(self, decision: RoutingDecision):
+        self.by_source[decision.source] += 1
+        self.by_agent[decision.agent] += 1
+
+    def record_plan(self, plan: List[RoutingDecision]):
+        """Count a fanned-out request once, and each of its branches per agent."""
+        self.by_source["fan_out"] += 1
+        for decision in plan:
+            self.by_agent[decision.agent] += 1
+
+    @property
+    def total(self) -> int:
+        return sum(self.by_source.values())
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of requests routed without calling the LLM."""
+        local = self.by_source["fast_path"] + self.by_source["fan_out"]
+        return local / self.total if self.total else 0.0
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "total": self.total,
+            "fast_path_hit_rate": round(self.hit_rate, 4),
+            "by_source": dict(self.by_source),
+            "by_agent": dict(self.by_agent),
+        }
+
+
+class FastPathRouter:
+    """
+    Pre-classifier combining keyword weights with the TF-IDF model.
+
+    Scores are turned into a probability distribution over agents; when the
+    top probability reaches the threshold the supervisor can skip the LLM.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        model_weight: float = 4.0,
+        temperature: float = 1.0,
+    ):
+        self.threshold = (
+            threshold
+            if threshold is not None
+            else float(os.getenv("FAST_ROUTE_THRESHOLD", "0.75"))
+        )
+        self.model_weight = model_weight
+        self.temperature = temperature
+        self.model = TfidfCentroidModel(ROUTING_EXAMPLES)
+        self.keywords = {
+            agent: {_stem(word): weight for word, weight in words.items()}
+            for agent, words in ROUTING_KEYWORDS.items()
+        }
+        self.stats = RoutingStats()
+
+    def keyword_scores(self, tokens: List[str]) -> Dict[str, float]:
+        return {
+            agent: sum(keywords.get(token, 0.0) for token in tokens)
+            for agent, keywords in self.keywords.items()
+        }
+
+    def classify(self, text: str) -> Tuple[str, float, Dict[str, float]]:
+        """Return (agent, confidence, probabilities) for a user message."""
+        tokens = tokenize(text)
+        keyword = self.keyword_scores(tokens)
+        model = self.model.score(tokens)
+
+        logits = {
+            agent: (keyword[agent] + self.model_weight * model.get(agent, 0.0))
+            / self.temperature
+            for agent in AGENT_NAMES
+        }
+        peak = max(logits.values())
+        exp = {agent: math.exp(value - peak) for agent, value in logits.items()}
+        total = sum(exp.values())
+        probabilities = {agent: value / total for agent, value in exp.items()}
+
+        agent = max(probabilities, key=probabilities.get)
+        return agent, probabilities[agent], probabilities
+
+    def route(self, text: str) -> Optional[RoutingDecision]:
+        """Return a decision when confident enough, else None."""
+        if not text.strip():
+            return None
+        agent, confidence, _ = self.classify(text)
+        if confidence >= self.threshold:
+            return RoutingDecision(
+                agent=agent,
+                confidence=confidence,
+                source="fast_path",
+                reasoning=f"fast-path classifier (confidence {confidence:.2f})",
+            )
+        return None
+
+    def plan(self, text: str) -> Optional[List[RoutingDecision]]:
+        """
+        Split a multi-domain request into per-agent sub-tasks.
+
+        Each clause is classified on its own; short fragments that are not
+        confidently classified are attached to the preceding clause. A clause
+        that refers back to an earlier one with a pronoun belongs to the same
+        task, so the request is not split. Returns one decision per agent, in
+        order of first mention, when two or more agents are confidently
+        involved, otherwise None.
+
+        >>> router = FastPathRouter(threshold=0.75)
+        >>> [(d.agent, d.task) for d in router.plan("Email Bob the report, then book a room for Friday")]
+        [('email', 'Email Bob the report'), ('scheduler', 'book a room for Friday')]
+        >>> router.plan("Email Alice and Bob about the meeting") is None
+        True
+        >>> router.plan("Reply to Sarah and tell her the meeting is moved to Friday") is None
+        True
+        >>> router.plan("Reply to Sarah, then tell her the meeting is moved to Friday") is None
+        True
+        """
+        clauses = [c.strip() for c in _CLAUSE_SPLIT_RE.split(text) if c and c.strip()]
+        if len(clauses) < 2:
+            return None
+
+        groups: Dict[str, List[str]] = {}
+        confidences: Dict[str, float] = {}
+        previous: Optional[str] = None
+        for clause in clauses:
+            if previous is not None and _BACK_REFERENCES.intersection(_TOKEN_RE.findall(clause.lower())):
+                return None
+            agent, confidence, _ = self.classify(clause)
+            if confidence < self.threshold:
+                # A substantial clause we cannot place makes the split unsafe
+                if previous is None or len(tokenize(clause)) >= 4:
+                    return None
+                groups[previous].append(clause)
+                continue
+            groups.setdefault(agent, []).append(clause)
+            confidences[agent] = min(confidences.get(agent, 1.0), confidence)
+            previous = agent
+
+        if len(groups) < 2:
+            return None
+        return [
+            RoutingDecision(
+                agent=agent,
+                confidence=confidences[agent],
+                source="fan_out",
+                reasoning=f"fan-out planner (confidence {confidences[agent]:.2f})",
+                task=", ".join(parts),
+            )
+            for agent, parts in groups.items()
+        ]
+
+
+# Decoding strategies for the routing call, most to least constrained
+ROUTING_MODES = ("json_schema", "tool", "stop")
+
+ROUTING_JSON_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "route",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"agent": {"type": "string", "enum": list(AGENT_NAMES)}},
+            "required": ["agent"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+ROUTING_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "route",
+        "description": "Route the request to a specialist agent.",
+        "parameters": ROUTING_JSON_SCHEMA["json_schema"]["schema"],
+    },
+}
+
+
+_UNSUPPORTED = re.compile(
+    r"not supported|unsupported|does not support|doesn't support|not implemented"
+    r"|unknown|unrecogni[sz]ed|not allowed|not permitted|extra (?:fields|inputs)",
+    re.IGNORECASE,
+)
+
+
+def unsupported_parameter(message: str) -> Optional[str]:
+    """The request parameter a 400 error message says the backend cannot handle.
+
+    >>> unsupported_parameter("Error code: 400 - response_format is not supported by this model")
+    'response_format'
+    >>> unsupported_parameter("Unsupported param: tool_choice")
+    'tool_choice'
+    >>> unsupported_parameter("This model's maximum context length is 4096 tokens") is None
+    True
+    """
+    if not _UNSUPPORTED.search(message):
+        return None
+    for name in ("response_format", "tool_choice", "logprobs"):
+        if name in message:
+            return name
+    return None
+
+
+class ConstrainedRouter:
+    """
+    Routing-only LLM invocation whose output is constrained to AGENT_NAMES.
+
+    json_schema and tool modes let the backend enforce the enum; stop mode
+    relies on stop sequences and the routing model's tiny token cap. If the
+    backend answers 400 saying response_format or tool_choice is unsupported,
+    the router downgrades to stop mode for the rest of the process; if it says
+    logprobs is unsupported, it stops asking for them. Any other bad request
+    (an oversized prompt, a malformed message) is raised as is. Confidence
+    comes from token logprobs when the backend returns them and from the
+    local classifier otherwise.
+    """
+
+    def __init__(
+        self,
+        model: BaseChatModel,
+        classifier: FastPathRouter,
+        mode: Optional[str] = None,
+    ):
+        self.model = model
+        self.classifier = classifier
+        self.mode = mode or os.getenv("ROUTING_DECODING", "json_schema")
+        if self.mode not in ROUTING_MODES:
+            raise ValueError(f"ROUTING_DECODING must be one of {ROUTING_MODES}, got {self.mode!r}")
+        # Cleared if the backend rejects the routing role's logprobs=True
+        self.logprobs = True
+
+    def _bound_model(self):
+        extra = {} if self.logprobs else {"logprobs": False}
+        if self.mode == "json_schema":
+            return self.model.bind(response_format=ROUTING_JSON_SCHEMA, **extra)
+        if self.mode == "tool":
+            return self.model.bind_tools([ROUTING_TOOL], tool_choice="route", **extra)
+        return self.model.bind(stop=["\n", ".", ","], **extra)
+
+    def _downgrade(self, error: Exception) -> bool:
+        """Drop the feature a bad request says is unsupported; False if it names none."""
+        feature = unsupported_parameter(str(error))
+        if feature == "logprobs" and self.logprobs:
+            self.logprobs = False
+            logger.warning("Routing backend does not support logprobs; using classifier confidence: %s", error)
+            return True
+        if feature in ("response_format", "tool_choice") and self.mode != "stop":
+            logger.warning(
+                "Routing backend does not support %s; downgrading from %s to stop mode: %s",
+                feature,
+                self.mode,
+                error,
+            )
+            self.mode = "stop"
+            return True
+        return False
+
+    async def route(
+        self, messages: List[BaseMessage], text: str, config: RunnableConfig
+    ) -> RoutingDecision:
+        import openai  # deferred: the SDK is slow to import and only needed here
+
+        while True:
+            try:
+                response = await self._bound_model().ainvoke(messages, config)
+                break
+            except openai.BadRequestError as e:
+                if not self._downgrade(e):
+                    raise
+
+        agent = self.parse(response)
+        if agent is None:
+            # Unparseable output: trust the local classifier, flagged as such
+            agent, confidence, _ = self.classifier.classify(text)
+            return RoutingDecision(
+                agent=agent,
+                confidence=confidence,
+                source="classifier_fallback",
+                reasoning=str(response.content),
+            )
+
+        confidence = self.logprob_confidence(response, agent)
+        if confidence is None:
+            _, _, probabilities = self.classifier.classify(text)
+            confidence = probabilities[agent]
+        return RoutingDecision(
+            agent=agent,
+            confidence=confidence,
+            source="llm",
+            reasoning=str(response.content or response.tool_calls),
+        )
+
+    def parse(self, response) -> Optional[str]:
+        """Return the routed agent if the output is a valid enum member."""
+        if self.mode == "tool":
+            for tool_call in response.tool_calls or []:
+                agent = tool_call.get("args", {}).get("agent")
+                if agent in AGENT_NAMES:
+                    return agent
+            return None
+
+        content = response.content if isinstance(response.content, str) else ""
+        if self.mode == "json_schema":
+            try:
+                agent = json.loads(content).get("agent")
+            except (ValueError, AttributeError):
+                return None
+            return agent if agent in AGENT_NAMES else None
+
+        match = re.match(r"\W*([a-z]+)", content.lower())
+        if match and match.group(1) in AGENT_NAMES:
+            return match.group(1)
+        return None
+
+    def logprob_confidence(self, response, agent: str) -> Optional[float]:
+        """Probability of the tokens spelling the chosen agent name."""
+        tokens: List[Dict[str, Any]] = (
+            (response.response_metadata.get("logprobs") or {}).get("content") or []
+        )
+        if not tokens:
+            return None
+
+        text = "".join(token.get("token", "") for token in tokens)
+        start = text.find(agent)
+        if start < 0:
+            return None
+        end = start + len(agent)
+
+        logprob, offset = 0.0, 0
+        for token in tokens:
+            piece = token.get("token", "")
+            if offset < end and offset + len(piece) > start:
+                logprob += token.get("logprob", 0.0)
+            offset += len(piece)
+        return math.exp(logprob)
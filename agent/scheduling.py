@@ -0,0 +1,160 @@
+"""
+Priority scheduling of LLM requests in front of each backend.
+
+Every node used to send its request straight to the backend. Under load, short
+routing calls queued behind long specialist generations inside the local
+server, and too many parallel sequences made it thrash. Each backend pool in
+llm.py now has an LLMScheduler:
+- at most LLM_MAX_IN_FLIGHT requests reach the backend at once (0 = no limit)
+- waiting requests are served by priority: routing calls, then a specialist's
+  first step, then follow-up steps that carry tool results
+- within a priority, threads take turns, so one busy conversation cannot
+  starve the others
+- the time each request waits is recorded per priority on /metrics
+
+New runs are refused up front (429 with Retry-After, see server.py) once more
+than LLM_MAX_QUEUE requests would be waiting. That is the larger of the
+requests queued now and the admitted runs beyond backend capacity, since a
+burst of runs is admitted before its LLM calls reach the queue. A run that was
+admitted always queues, so work already done is not thrown away.
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from metrics import current_node, llm_queue_time
+
+PRIORITIES = ("routing", "first_step", "tool_followup")
+ROUTING, FIRST_STEP, TOOL_FOLLOWUP = range(len(PRIORITIES))
+
+# Conversation served by this task (set per AG-UI run in server.py)
+current_thread: ContextVar[str] = ContextVar("current_thread", default="")
+
+
+def classify(body: bytes) -> int:
+    """Priority of a chat completion request, from the calling node and its messages."""
+    if current_node.get() == "supervisor_node":
+        return ROUTING
+    try:
+        messages = json.loads(body).get("messages", [])
+    except (ValueError, AttributeError):
+        return FIRST_STEP
+    # Prompt builders may append a system message after the tool results
+    for message in reversed(messages):
+        if message.get("role") != "system":
+            return TOOL_FOLLOWUP if message.get("role") == "tool" else FIRST_STEP
+    return FIRST_STEP
+
+
+class LLMScheduler:
+    """Limits in-flight requests to one backend and orders the waiting ones."""
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.queued = 0
+        # Per priority: thread -> its waiting requests, in turn order
+        self._waiting: List["OrderedDict[str, Deque[asyncio.Future]]"] = [
+            OrderedDict() for _ in PRIORITIES
+        ]
+        self.granted = [0] * len(PRIORITIES)
+        # Smoothed seconds a request holds its slot, for Retry-After hints
+        self.service_seconds = 1.0
+
+    def _has_capacity(self) -> bool:
+        return self.max_in_flight <= 0 or self.in_flight < self.max_in_flight
+
+    async def acquire(self, priority: int, thread: str = "") -> float:
+        """Wait for a slot; returns the seconds spent queued."""
+        start = time.perf_counter()
+        if self.queued == 0 and self._has_capacity():
+            self.in_flight += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiting[priority].setdefault(thread, deque()).append(future)
+            self.queued += 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just as we were cancelled
+                    self.release()
+                else:
+                    # Still queued; _next_waiter skips it
+                    self.queued -= 1
+                raise
+        waited = time.perf_counter() - start
+        self.granted[priority] += 1
+        llm_queue_time.labels(PRIORITIES[priority]).observe(waited)
+        return waited
+
+    def release(self, held_seconds: Optional[float] = None):
+        """Free a slot, handing it straight to the next waiter if there is one."""
+        if held_seconds is not None:
+            self.service_seconds += 0.1 * (held_seconds - self.service_seconds)
+        future = self._next_waiter()
+        if future is None:
+            self.in_flight -= 1
+        else:
+            future.set_result(None)
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for waiting in self._waiting:
+            while waiting:
+                thread, futures = next(iter(waiting.items()))
+                future = futures.popleft()
+                if futures:
+                    # This thread goes to the back of the line for its next request
+                    waiting.move_to_end(thread)
+                else:
+                    del waiting[thread]
+                if not future.cancelled():
+                    self.queued -= 1
+                    return future
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "granted": dict(zip(PRIORITIES, self.granted)),
+            "service_seconds": round(self.service_seconds, 3),
+        }
+
+
+class AdmissionController:
+    """Counts admitted runs and refuses new ones while the expected LLM queue is too deep."""
+
+    def __init__(self, schedulers: Callable[[], List[LLMScheduler]], max_queue: int):
+        self.schedulers = schedulers
+        self.max_queue = max_queue
+        self.active_runs = 0
+        self.rejected = 0
+
+    def try_admit(self) -> Optional[int]:
+        """Admit a run (returns None) or return the Retry-After seconds for refusing it."""
+        schedulers = self.schedulers()
+        if self.max_queue > 0 and schedulers:
+            limited = all(scheduler.max_in_flight > 0 for scheduler in schedulers)
+            capacity = sum(scheduler.max_in_flight for scheduler in schedulers)
+            queued = sum(scheduler.queued for scheduler in schedulers)
+            # A run holds about one LLM request at a time
+            expected = max(queued, self.active_runs - capacity) if limited else queued
+            if expected >= self.max_queue:
+                self.rejected += 1
+                service = max(scheduler.service_seconds for scheduler in schedulers)
+                return max(1, math.ceil(expected / max(capacity, 1) * service))
+        self.active_runs += 1
+        return None
+
+    def finished(self):
+        self.active_runs -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"max_queue": self.max_queue, "active_runs": self.active_runs, "rejected": self.rejected}
@@ -0,0 +1,64 @@
+"""
+Production entry point for the agent server.
+
+server.main() is the development server (single process, auto-reload). This
+runs server:app on SERVER_WORKERS processes with uvloop and httptools when they
+are installed. On SIGTERM/SIGINT uvicorn stops accepting connections and waits
+up to SERVER_DRAIN_TIMEOUT seconds for in-flight runs to finish.
+
+Workers are separate processes behind one listening socket, so a thread's
+requests can land on any of them. With more than one worker, checkpoints must
+live in the shared local SQLite store (CHECKPOINTER=sqlite, the default here).
+
+Environment:
+- SERVER_HOST (default 0.0.0.0), SERVER_PORT (default 8123)
+- SERVER_WORKERS (default: CPU count)
+- SERVER_DRAIN_TIMEOUT (default 30s)
+- AGENT_INIT defaults to "warm" so workers bind before building agents
+
+Run from the agent directory:
+    uv run python serve.py
+"""
+
+import importlib.util
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+
+def pick(preferred: str, fallback: str) -> str:
+    """Use the faster implementation when its package is installed."""
+    return preferred if importlib.util.find_spec(preferred) else fallback
+
+
+def main():
+    """Run server:app with multiple workers and graceful shutdown."""
+    # Read before the settings below; the workers inherit the environment
+    load_dotenv()
+    workers = int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1)))
+    if workers > 1:
+        # In-memory checkpoints would be private to each worker process
+        os.environ.setdefault("CHECKPOINTER", "sqlite")
+        if os.environ["CHECKPOINTER"] != "sqlite":
+            raise ValueError(
+                f"SERVER_WORKERS={workers} needs the shared store (CHECKPOINTER=sqlite), "
+                f"got CHECKPOINTER={os.environ['CHECKPOINTER']!r}"
+            )
+    os.environ.setdefault("AGENT_INIT", "warm")
+
+    # Workers are spawned as new processes and inherit this environment
+    uvicorn.run(
+        "server:app",
+        host=os.getenv("SERVER_HOST", "0.0.0.0"),
+        port=int(os.getenv("SERVER_PORT", "8123")),
+        workers=workers,
+        loop=pick("uvloop", "asyncio"),
+        http=pick("httptools", "h11"),
+        timeout_graceful_shutdown=float(os.getenv("SERVER_DRAIN_TIMEOUT", "30")),
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
+import asyncio
+import copy
 import os
+import time
+from contextlib import asynccontextmanager
 
 from ag_ui_langgraph import add_langgraph_fastapi_endpoint
 from copilotkit import LangGraphAGUIAgent
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 # from langgraph.graph import END, START, MessagesState, StateGraph
 # from langgraph.checkpoint.memory import MemorySaver
@@ -11,23 +16,50 @@ from fastapi import FastAPI
 # from langchain_openai import AzureChatOpenAI
 import uvicorn
 from dotenv import load_dotenv
-from main_graph import graph
-
-# Phoenix observability imports
-from openinference.instrumentation.langchain import LangChainInstrumentor
-from phoenix.otel import register
 
+# Entry point: read .env before main_graph and llm, which take their settings at import
 load_dotenv()
 
-# Set up Phoenix observability
-# Set the Phoenix collector endpoint via environment variable
-# uv run python -m phoenix.server.main serve
-os.environ["PHOENIX_COLLECTOR_ENDPOINT"] = "http://localhost:6006"
+import main_graph
+from main_graph import checkpointer, graph, supervisor
+from llm import admission, registry
+from response_cache import response_cache
+from context_window import context_manager
+from metrics import current_run, metrics, metrics_handler, runs_rejected
+from scheduling import current_thread
+from outbox import outbox
+import tracing
+
+# Startup timings reported by /startup
+startup = {
+    "agent_init": main_graph.AGENT_INIT,
+    "ready": main_graph.AGENT_INIT == "eager",
+    "tracing": tracing.settings(),
+}
+
+# Phoenix tracing (TRACING_* settings, see tracing.py); None when disabled
+tracer_provider = None
+
+if main_graph.AGENT_INIT == "eager":
+    tracer_provider = tracing.setup_tracing()
+
+
+def warm_up():
+    """Set up tracing and build the lazy agents in the background after startup."""
+    global tracer_provider
+    start = time.perf_counter()
+    try:
+        tracer_provider = tracing.setup_tracing()
+        startup["tracing_seconds"] = round(time.perf_counter() - start, 3)
+    except Exception as error:
+        # Serving must not depend on the collector; report it instead
+        startup["tracing_error"] = repr(error)
+    if main_graph.AGENT_INIT == "warm":
+        startup["agent_build_seconds"] = {
+            name: round(seconds, 3) for name, seconds in main_graph.warm_up().items()
+        }
+    startup["ready"] = True
 
-# Register and instrument
-# Note: LangChainInstrumentor will capture LLM calls within LangGraph nodes
-tracer_provider = register()
-LangChainInstrumentor().instrument(tracer_provider=tracer_provider)
 
 # async def mock_llm(state: MessagesState):
 #   print(os.getenv("AZURE_OPENAI_API_KEY"))
@@ -54,11 +86,115 @@ LangChainInstrumentor().instrument(tracer_provider=tracer_provider)
 # graph = graph.compile()
 
 
-app = FastAPI()
+class ConcurrentLangGraphAGUIAgent(LangGraphAGUIAgent):
+    """
+    LangGraphAGUIAgent that can serve concurrent runs in one process.
+
+    The base class keeps per-run bookkeeping (active_run, messages in progress)
+    on the instance, so overlapping requests overwrite each other. Each run
+    gets its own shallow copy; the compiled graph and config stay shared.
+
+    When the client disconnects, Starlette cancels the streaming task (uvicorn
+    speaks ASGI 2.3, so StreamingResponse listens for http.disconnect). The
+    cancellation propagates into the running graph and aborts the outstanding
+    LLM request, so the backend stops generating. Checkpoints are written
+    atomically per superstep, so the thread keeps its last complete one.
+    """
+
+    async def run(self, input):
+        agent = copy.copy(self)
+        agent.active_run = None
+        agent.messages_in_process = {}
+        # Inherited by the graph's tasks; not reset, as the streaming task ends with the run
+        current_run.set(input.run_id)
+        current_thread.set(input.thread_id)
+        try:
+            async for event in LangGraphAGUIAgent.run(agent, input):
+                yield event
+        except (asyncio.CancelledError, GeneratorExit):
+            metrics_handler.reclaim(input.run_id)
+            raise
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up_task = None
+    if main_graph.AGENT_INIT != "eager":
+        # Off the event loop, so the server accepts requests while this runs
+        warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    # Outbound email delivery (see outbox.py); queued mail waits when no SMTP route is set
+    outbox_task = asyncio.create_task(outbox.run()) if outbox.delivering else None
+    yield
+    if warm_up_task is not None:
+        await warm_up_task
+    if outbox_task is not None:
+        # Finish batches in flight; the rest stays queued in the file
+        await outbox.stop(timeout=float(os.getenv("SERVER_DRAIN_TIMEOUT", "30")))
+        await outbox_task
+    # Close the shared LLM connection pools on shutdown
+    await registry.aclose()
+    if tracer_provider is not None:
+        # Flush buffered spans (bounded by TRACING_EXPORT_TIMEOUT_MS)
+        await asyncio.to_thread(tracer_provider.shutdown)
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Requests currently being served in this worker, streaming bodies included
+in_flight = {"requests": 0}
+
+
+class InFlightMiddleware:
+    """ASGI middleware counting requests until their response has fully streamed."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        in_flight["requests"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            in_flight["requests"] -= 1
+
+
+class AdmissionMiddleware:
+    """ASGI middleware refusing new agent runs while the LLM queue is too deep.
+
+    Rejecting up front (429 with Retry-After) is cheaper than queueing a run
+    that would wait minutes, or failing it halfway through its LLM calls.
+    """
+
+    def __init__(self, app, path: str = "/"):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            return await self.app(scope, receive, send)
+        retry_after = admission.try_admit()
+        if retry_after is not None:
+            runs_rejected.labels().inc()
+            response = JSONResponse(
+                {"error": "LLM backend overloaded, retry later", "retry_after": retry_after},
+                status_code=429,
+                headers={"Retry-After": str(retry_after)},
+            )
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.finished()
+
+
+app.add_middleware(InFlightMiddleware)
+app.add_middleware(AdmissionMiddleware)
 
 add_langgraph_fastapi_endpoint(
     app=app,
-    agent=LangGraphAGUIAgent(
+    agent=ConcurrentLangGraphAGUIAgent(
         name="multi_agent_supervisor",
         description="A multi-agent system with supervisor routing to email, scheduler, and research agents",
         graph=graph,
@@ -67,8 +203,71 @@ add_langgraph_fastapi_endpoint(
 )
 
 
+@app.get("/health")
+def health():
+    """Liveness, warm-up state and this worker's in-flight request count."""
+    return {
+        "status": "ok",
+        "pid": os.getpid(),
+        "ready": startup["ready"],
+        "in_flight": in_flight["requests"] - 1,
+    }
+
+
+@app.get("/startup")
+def startup_status():
+    """Agent init mode and background warm-up progress."""
+    return startup
+
+
+@app.get("/routing/stats")
+def routing_stats():
+    """Supervisor routing distribution and fast-path hit rate."""
+    if supervisor is None:
+        return {"mode": "collapsed"}
+    return supervisor.routing_stats
+
+
+@app.get("/llm/pools")
+def llm_pools():
+    """Connection pool and scheduler state per LLM backend, plus admission control."""
+    return {**registry.pool_metrics(), "admission": admission.snapshot()}
+
+
+@app.get("/llm/cache")
+def llm_cache():
+    """Response cache size, lookups by result and hit ratio."""
+    return response_cache.snapshot()
+
+
+@app.get("/context/stats")
+def context_stats():
+    """Prompt tokens saved by per-role windowing, and rolling-summary counts."""
+    return context_manager.stats.snapshot()
+
+
+@app.get("/email/outbox")
+def email_outbox():
+    """Outbound email queue by status, scheduled sends and SMTP connection reuse."""
+    return outbox.snapshot()
+
+
+@app.get("/checkpoints/stats")
+def checkpoint_stats():
+    """Resident size and eviction/reload counters of the in-memory checkpointer."""
+    if not hasattr(checkpointer, "stats"):
+        return {"checkpointer": type(checkpointer).__name__}
+    return checkpointer.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Node, LLM, tool and routing metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 def main():
-    """Run the uvicorn server."""
+    """Run the uvicorn development server (auto-reload). See serve.py for production."""
     uvicorn.run(
         "server:app",
         host="0.0.0.0",
@@ -2,9 +2,54 @@
 Shared state definition for all agents in the multi-agent system.
 """
 
-from typing import List, Dict, Any
+import os
+from typing import Annotated, Callable, List, Dict, Any
 from copilotkit import CopilotKitState
 
+# Log entry that makes the logs reducer drop everything recorded before it
+CLEAR_LOGS: Dict[str, Any] = {"id": "__clear__"}
+
+Entries = List[Dict[str, Any]]
+
+
+def append_bounded(env_var: str, default: int) -> Callable[[Entries, Entries], Entries]:
+    """
+    Build an append reducer that keeps at most N entries (oldest evicted).
+
+    Nodes return only their new entries. Entries that carry an `id` already
+    present in the state are skipped, so state echoed back by the frontend is
+    not appended twice, and CLEAR_LOGS resets the collection.
+    """
+    limit = int(os.getenv(env_var, str(default)))
+
+    def reduce(existing: Entries, new: Entries) -> Entries:
+        merged = list(existing or [])
+        if not new:
+            return merged
+        known = {entry.get("id") for entry in merged if entry.get("id")}
+        for entry in new:
+            entry_id = entry.get("id")
+            if entry_id == CLEAR_LOGS["id"]:
+                merged, known = [], set()
+                continue
+            if entry_id:
+                if entry_id in known:
+                    continue
+                known.add(entry_id)
+            merged.append(entry)
+        return merged[-limit:]
+
+    return reduce
+
+
+def collect_branches(
+    existing: List[Dict[str, Any]], new: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Accumulate parallel branch outputs; writing an empty list clears them."""
+    if not new:
+        return []
+    return (existing or []) + new
+
 
 class AgentState(CopilotKitState):
     """
@@ -13,8 +58,14 @@ class AgentState(CopilotKitState):
 
     current_task: str = ""
     active_agent: str = "supervisor"
-    scheduled_events: List[Dict[str, Any]] = []
-    recent_emails: List[Dict[str, Any]] = []
-    research_results: List[Dict[str, Any]] = []
+    # Append-only with retention caps; nodes return only new entries
+    scheduled_events: Annotated[Entries, append_bounded("STATE_MAX_EVENTS", 200)] = []
+    recent_emails: Annotated[Entries, append_bounded("STATE_MAX_EMAILS", 200)] = []
+    research_results: Annotated[Entries, append_bounded("STATE_MAX_RESEARCH", 200)] = []
     conversation_context: Dict[str, Any] = {}
-    logs: List[Dict[str, Any]] = []
+    # Rolling summary of turns older than the verbatim window (see context_window.py)
+    conversation_summary: str = ""
+    summary_cursor: str = ""
+    logs: Annotated[Entries, append_bounded("STATE_MAX_LOGS", 50)] = []
+    # Outputs of specialists fanned out in parallel, consumed by merge_node
+    branch_results: Annotated[List[Dict[str, Any]], collect_branches] = []
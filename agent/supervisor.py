@@ -2,21 +2,71 @@
 Supervisor agent that coordinates and routes requests to specialized agents.
 """
 
-from typing import Dict, Any
-from langchain_core.messages import BaseMessage, SystemMessage
+from typing import Dict, Any, List
+from langchain_core.messages import BaseMessage
 from langchain_core.runnables import RunnableConfig
 # from langchain_openai import AzureChatOpenAI
 # from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
 from langgraph.types import Command
 from datetime import datetime
-import os
-from dotenv import load_dotenv
 
-from state import AgentState
-
-# Load environment variables
-load_dotenv()
+from state import AgentState, CLEAR_LOGS
+from llm import get_model
+from routing import ConstrainedRouter, FastPathRouter
+from prompts import PromptBuilder
+from context_window import context_manager
+from parallel import fan_out
+from metrics import record_routing
+
+# Static system prompt; kept byte-stable so local backends can reuse the KV cache
+SUPERVISOR_PROMPT = """You are an intelligent supervisor coordinating multiple specialist agents in a personal assistant system.
+
+Available specialist agents:
+
+🔵 EMAIL AGENT - For all email-related tasks:
+- Composing and sending emails
+- Managing email workflows
+- Scheduling email delivery
+- Email thread management
+
+🟢 SCHEDULER AGENT - For calendar and event management:
+- Creating calendar events and meetings
+- Finding available time slots
+- Managing participant schedules
+- Sending calendar invitations
+- Handling scheduling conflicts
+
+🟡 RESEARCH AGENT - For information and document tasks:
+- Searching through documents and knowledge bases
+- Analyzing and summarizing content
+- Extracting specific information
+- Comparing multiple sources
+- Creating research reports
+
+ROUTING INSTRUCTIONS:
+Analyze the user's request and determine which specialist agent should handle it.
+Requests that split cleanly into independent parts per domain are fanned out to
+several agents before reaching you. For any other request involving multiple
+domains, choose the PRIMARY agent needed.
+
+Respond with ONLY the agent name that should handle this request:
+- "email" for email-related tasks
+- "scheduler" for calendar/meeting tasks
+- "research" for document/information tasks
+
+If the request is unclear or involves coordination, choose the most relevant primary agent.
+The current system state is provided in the final context message."""
+
+
+def supervisor_context(state: AgentState) -> Dict[str, Any]:
+    """Volatile system state, sent after the conversation history."""
+    return {
+        "Active task": state.get("current_task") or "New request",
+        "Events scheduled": len(state.get("scheduled_events", [])),
+        "Emails processed": len(state.get("recent_emails", [])),
+        "Research items": len(state.get("research_results", [])),
+        "Current time": datetime.now().strftime("%Y-%m-%d %H:%M"),
+    }
 
 
 class SupervisorAgent:
@@ -31,13 +81,23 @@ class SupervisorAgent:
         #     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
         #     api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
         # )
-        self.model = ChatOpenAI(
-            model=os.getenv("LOCAL_MODEL_NAME", "TheBloke/Mistral-7B-Instruct-v0.2-GGUF"),
-            temperature=0.7,
-            max_tokens=2048,
-            base_url=os.getenv("OPENAI_BASE_URL", "http://localhost:1234/v1"),
-            api_key=os.getenv("OPENAI_API_KEY", "lm-studio")
-        )
+        # Routing-only model: greedy decoding and a tiny token budget, since the
+        # answer is a single enum value (role settings live in llm.py)
+        self.model = get_model("supervisor")
+
+        # Static system prefix with volatile state appended after the history
+        self.prompt = PromptBuilder(SUPERVISOR_PROMPT, supervisor_context)
+
+        # Local pre-classifier; confident requests skip the routing LLM call
+        self.fast_router = FastPathRouter()
+
+        # Enum-constrained routing call for the ambiguous remainder
+        self.llm_router = ConstrainedRouter(self.model, self.fast_router)
+
+    @property
+    def routing_stats(self) -> Dict[str, Any]:
+        """Fast-path hit rate and routing distribution."""
+        return self.fast_router.stats.snapshot()
 
     async def route_request(
         self, state: AgentState, config: RunnableConfig
@@ -46,60 +106,49 @@ class SupervisorAgent:
         Analyze the user request and route to the most appropriate specialist agent.
         """
 
-        system_message = SystemMessage(
-            content=f"""You are an intelligent supervisor coordinating multiple specialist agents in a personal assistant system.
-            
-            Available specialist agents:
-            
-            🔵 EMAIL AGENT - For all email-related tasks:
-            - Composing and sending emails
-            - Managing email workflows
-            - Scheduling email delivery
-            - Email thread management
-            
-            🟢 SCHEDULER AGENT - For calendar and event management:
-            - Creating calendar events and meetings
-            - Finding available time slots
-            - Managing participant schedules
-            - Sending calendar invitations
-            - Handling scheduling conflicts
-            
-            🟡 RESEARCH AGENT - For information and document tasks:
-            - Searching through documents and knowledge bases
-            - Analyzing and summarizing content
-            - Extracting specific information
-            - Comparing multiple sources
-            - Creating research reports
-            
-            Current system state:
-            - Active task: {state.get('current_task', 'New request')}
-            - Events scheduled: {len(state.get('scheduled_events', []))}
-            - Emails processed: {len(state.get('recent_emails', []))}
-            - Research items: {len(state.get('research_results', []))}
-            - Current time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-            
-            ROUTING INSTRUCTIONS:
-            Analyze the user's request and determine which specialist agent should handle it.
-            For complex requests involving multiple domains, choose the PRIMARY agent needed.
-            
-            Respond with ONLY the agent name that should handle this request:
-            - "email" for email-related tasks
-            - "scheduler" for calendar/meeting tasks  
-            - "research" for document/information tasks
-            
-            If the request is unclear or involves coordination, choose the most relevant primary agent."""
-        )
+        user_text = self.extract_latest_user_text(state["messages"])
+        task_description = self.extract_task_from_message(state["messages"][-1])
 
-        response = await self.model.ainvoke(
-            [system_message, *state["messages"]], config
-        )
+        # Multi-domain requests run as parallel branches joined by merge_node
+        plan = self.fast_router.plan(user_text)
+        if plan:
+            self.fast_router.stats.record_plan(plan)
+            for decision in plan:
+                record_routing(decision.agent, decision.source)
+            agents = [decision.agent for decision in plan]
+            return Command(
+                goto=fan_out(state, plan),
+                update={
+                    "active_agent": ", ".join(agents),
+                    "current_task": task_description,
+                    "conversation_context": {
+                        "supervisor_reasoning": "fan-out planner",
+                        "routed_to": agents,
+                        "subtasks": {decision.agent: decision.task for decision in plan},
+                        "timestamp": datetime.now().isoformat(),
+                    },
+                    "logs": [
+                        CLEAR_LOGS,
+                        {"message": f"🔀 Fanning out to {', '.join(agents)} agents", "done": True},
+                    ],
+                },
+            )
 
-        # Extract agent choice from response
-        agent_choice = self.extract_agent_choice(response.content)
-        task_description = self.extract_task_from_message(state["messages"][-1])
+        # Try the local fast path before paying for an LLM round trip
+        decision = self.fast_router.route(user_text)
+        if decision is None:
+            decision = await self.llm_router.route(
+                self.prompt.build(state, context_manager.window(state, "supervisor")),
+                user_text,
+                config,
+            )
 
-        # Add supervisor routing log
-        logs = [{"message": f"🎯 Routing to {agent_choice} agent", "done": True}]
+        self.fast_router.stats.record(decision)
+        record_routing(decision.agent, decision.source)
+        agent_choice = decision.agent
+
+        # Add supervisor routing log; as the entry node, start this turn's logs afresh
+        logs = [CLEAR_LOGS, {"message": f"🎯 Routing to {agent_choice} agent", "done": True}]
 
         return Command(
             goto=f"{agent_choice}_node",
@@ -107,46 +156,28 @@ class SupervisorAgent:
                 "active_agent": agent_choice,
                 "current_task": task_description,
                 "conversation_context": {
-                    "supervisor_reasoning": response.content,
+                    "supervisor_reasoning": decision.reasoning,
                     "routed_to": agent_choice,
+                    "routing_confidence": round(decision.confidence, 4),
+                    "routing_source": decision.source,
                     "timestamp": datetime.now().isoformat(),
                 },
                 "logs": logs,
             },
         )
 
-    def extract_agent_choice(self, content: str) -> str:
-        """
-        Extract the agent choice from supervisor response.
-        """
-        content_lower = content.lower().strip()
-
-        # Direct matches
-        if content_lower.startswith("email"):
-            return "email"
-        elif content_lower.startswith("scheduler"):
-            return "scheduler"
-        elif content_lower.startswith("research"):
-            return "research"
-
-        # Keyword-based routing as fallback
-        if any(
-            keyword in content_lower for keyword in ["email", "send", "compose", "mail"]
-        ):
-            return "email"
-        elif any(
-            keyword in content_lower
-            for keyword in ["schedule", "calendar", "meeting", "event", "appointment"]
-        ):
-            return "scheduler"
-        elif any(
-            keyword in content_lower
-            for keyword in ["search", "document", "research", "find", "analyze"]
-        ):
-            return "research"
-
-        # Default to scheduler for general coordination tasks
-        return "scheduler"
+    def extract_latest_user_text(self, messages: List[BaseMessage]) -> str:
+        """Return the text of the most recent human message."""
+        for message in reversed(messages):
+            if getattr(message, "type", None) == "human":
+                content = message.content
+                if isinstance(content, str):
+                    return content
+                return " ".join(
+                    part.get("text", "") if isinstance(part, dict) else str(part)
+                    for part in content
+                )
+        return ""
 
     def extract_task_from_message(self, message: BaseMessage) -> str:
         """Extract a brief task description from the user message."""
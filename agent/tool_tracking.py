@@ -0,0 +1,41 @@
+"""
+Incremental extraction of tool calls made during a single agent invocation.
+
+create_agent returns the full message history (input + new messages). Rather
+than rescanning everything on each turn, only the messages appended by the
+current invocation are inspected, and each tool call is reported once per
+tool_call_id.
+"""
+
+from typing import Any, Dict, Iterator, List, Sequence
+
+from langchain_core.messages import BaseMessage
+
+
+def new_messages(
+    before: Sequence[BaseMessage], after: Sequence[BaseMessage]
+) -> List[BaseMessage]:
+    """Return the messages in `after` that were produced after `before`."""
+    count = len(before)
+    # Fast path: the agent appended to the history it was given
+    if len(after) >= count and (
+        count == 0 or getattr(after[count - 1], "id", None) == getattr(before[-1], "id", None)
+    ):
+        return list(after[count:])
+
+    # History was rewritten (e.g. trimmed or summarized); diff by message id
+    known = {message.id for message in before if getattr(message, "id", None)}
+    return [message for message in after if getattr(message, "id", None) not in known]
+
+
+def new_tool_calls(messages: Sequence[BaseMessage]) -> Iterator[Dict[str, Any]]:
+    """Yield each tool call in `messages` once, keyed by tool_call_id."""
+    seen = set()
+    for message in messages:
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            call_id = tool_call.get("id")
+            if call_id is not None:
+                if call_id in seen:
+                    continue
+                seen.add(call_id)
+            yield tool_call
@@ -0,0 +1,99 @@
+"""
+Phoenix/OpenTelemetry tracing with bounded overhead.
+
+Tracing used to be always on: every LLM call and chain step was exported, even
+with no collector running. Now it is configured at startup:
+- TRACING_ENABLED (default true): "false" skips the OpenTelemetry and
+  instrumentation imports entirely, so nothing is patched
+- TRACING_SAMPLE_RATIO (default 1.0): head-based sampling of root spans.
+  Children follow their parent's decision, so a run is traced whole or not at all
+- TRACING_QUEUE_SIZE (default 2048): spans buffered for export. When the
+  queue is full, new spans are dropped rather than blocking a request
+- TRACING_BATCH_SIZE (default 512), TRACING_EXPORT_DELAY_MS (default 5000),
+  TRACING_EXPORT_TIMEOUT_MS (default 30000): batch export settings
+- PHOENIX_COLLECTOR_ENDPOINT (default http://localhost:6006)
+- PHOENIX_PROJECT_NAME (default "default")
+
+The OpenTelemetry SDK and OTLP exporter come with arize-phoenix.
+
+Start a collector with:
+    uv run python -m phoenix.server.main serve
+"""
+
+import os
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SpanExporter
+
+
+def _enabled() -> bool:
+    return os.getenv("TRACING_ENABLED", "true").lower() not in ("0", "false", "no", "off")
+
+
+def _sample_ratio() -> float:
+    ratio = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+    if not 0.0 <= ratio <= 1.0:
+        raise ValueError(f"TRACING_SAMPLE_RATIO must be between 0 and 1, got {ratio}")
+    return ratio
+
+
+def settings() -> Dict[str, Any]:
+    """Effective tracing configuration, as reported by /startup."""
+    return {
+        "enabled": _enabled(),
+        "sample_ratio": _sample_ratio(),
+        "endpoint": os.getenv("PHOENIX_COLLECTOR_ENDPOINT", "http://localhost:6006"),
+        "project": os.getenv("PHOENIX_PROJECT_NAME", "default"),
+        "queue_size": int(os.getenv("TRACING_QUEUE_SIZE", "2048")),
+        "batch_size": int(os.getenv("TRACING_BATCH_SIZE", "512")),
+        "export_delay_ms": int(os.getenv("TRACING_EXPORT_DELAY_MS", "5000")),
+        "export_timeout_ms": int(os.getenv("TRACING_EXPORT_TIMEOUT_MS", "30000")),
+    }
+
+
+def build_tracer_provider(
+    config: Dict[str, Any], exporter: Optional["SpanExporter"] = None
+) -> "TracerProvider":
+    """Sampled tracer provider with a bounded batch processor in front of `exporter`."""
+    # Deferred: the OpenTelemetry SDK is only needed when tracing is on
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if exporter is None:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        exporter = OTLPSpanExporter(endpoint=config["endpoint"].rstrip("/") + "/v1/traces")
+
+    provider = TracerProvider(
+        resource=Resource.create({"openinference.project.name": config["project"]}),
+        sampler=ParentBased(TraceIdRatioBased(config["sample_ratio"])),
+    )
+    # Exports on a background thread; a full queue drops spans instead of blocking
+    provider.add_span_processor(
+        BatchSpanProcessor(
+            exporter,
+            max_queue_size=config["queue_size"],
+            max_export_batch_size=min(config["batch_size"], config["queue_size"]),
+            schedule_delay_millis=config["export_delay_ms"],
+            export_timeout_millis=config["export_timeout_ms"],
+        )
+    )
+    return provider
+
+
+def setup_tracing() -> Optional["TracerProvider"]:
+    """Instrument LangChain per the TRACING_* settings; returns None when disabled."""
+    config = settings()
+    if not config["enabled"]:
+        return None
+
+    from openinference.instrumentation.langchain import LangChainInstrumentor
+
+    # Note: LangChainInstrumentor will capture LLM calls within LangGraph nodes
+    tracer_provider = build_tracer_provider(config)
+    LangChainInstrumentor().instrument(tracer_provider=tracer_provider)
+    return tracer_provider
@@ -39,8 +39,8 @@ if os.environ.get("LANGGRAPH_FASTAPI", "false").lower() == "false":
     # When running in LangGraph API, don't use a custom checkpointer
     graph = workflow.compile(**compile_kwargs)
 else:
-    # For CopilotKit and other contexts, use MemorySaver
-    from langgraph.checkpoint.memory import MemorySaver
-    memory = MemorySaver()
+    # For CopilotKit and other contexts, use a memory-bounded MemorySaver
+    from research_canvas.langgraph.checkpointer import BoundedMemorySaver
+    memory = BoundedMemorySaver()
     compile_kwargs["checkpointer"] = memory
     graph = workflow.compile(**compile_kwargs)
\ No newline at end of file
@@ -0,0 +1,258 @@
+"""
+A memory-bounded in-memory checkpointer.
+
+BoundedMemorySaver is a MemorySaver that evicts idle threads (TTL, then LRU)
+to stay within a byte budget, optionally spilling them to disk and reloading
+them on access. Configured through the environment:
+- MEMORY_SAVER_MAX_BYTES (default 256 MiB): budget for serialized checkpoint data
+- MEMORY_SAVER_MAX_THREADS (default 0, unlimited): resident thread cap
+- MEMORY_SAVER_TTL (default 3600s, 0 disables): evict threads idle this long
+- MEMORY_SAVER_SPILL_DIR (unset by default): spill evicted threads here instead of dropping them
+
+This is a copy of BoundedMemorySaver in the repository's agent/checkpointing.py.
+The example is packaged on its own (and pins an older langgraph), so it cannot
+import that module; apply any fix to both copies.
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+
+
+def _typed_size(typed: Tuple[str, bytes]) -> int:
+    return len(typed[0]) + len(typed[1])
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    MemorySaver that forgets idle threads and stays within a byte budget.
+
+    Each thread's footprint is the serialized size of its checkpoints, channel
+    blobs and pending writes. After every write, threads idle for longer than
+    `ttl` are evicted, then least-recently-used threads until the total fits
+    `max_bytes` and `max_threads`. The thread being written is never evicted,
+    so a single thread larger than the budget stays resident until it goes
+    idle. With a spill directory, evicted threads are pickled there and loaded
+    back transparently on their next access; otherwise they are dropped.
+
+    `list(None)` only sees resident threads.
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        max_threads: Optional[int] = None,
+        ttl: Optional[float] = None,
+        spill_dir: Optional[str] = None,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.max_bytes = (
+            max_bytes
+            if max_bytes is not None
+            else int(os.getenv("MEMORY_SAVER_MAX_BYTES", str(256 * 1024 * 1024)))
+        )
+        self.max_threads = (
+            max_threads if max_threads is not None else int(os.getenv("MEMORY_SAVER_MAX_THREADS", "0"))
+        )
+        self.ttl = ttl if ttl is not None else float(os.getenv("MEMORY_SAVER_TTL", "3600"))
+        self.spill_dir = spill_dir or os.getenv("MEMORY_SAVER_SPILL_DIR") or None
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+        # thread_id -> last access (monotonic), least recently used first
+        self._resident: "OrderedDict[str, float]" = OrderedDict()
+        self._sizes: Dict[str, int] = defaultdict(int)
+        self._blob_keys: Dict[str, Set[tuple]] = defaultdict(set)
+        self._write_keys: Dict[str, Set[tuple]] = defaultdict(set)
+        self._bytes = 0
+        self._rlock = threading.RLock()
+        self.counters = {"evictions": 0, "ttl_evictions": 0, "spills": 0, "reloads": 0, "dropped": 0}
+
+    # -- bookkeeping --------------------------------------------------------
+
+    def _spill_path(self, thread_id: str) -> str:
+        return os.path.join(self.spill_dir, hashlib.sha256(thread_id.encode()).hexdigest() + ".pkl")
+
+    def _touch(self, thread_id: str, create: bool = False):
+        """Mark a thread as used, reloading it from the spill directory if needed."""
+        if thread_id not in self._resident and self.spill_dir:
+            if os.path.exists(self._spill_path(thread_id)):
+                self._reload(thread_id)
+                self._enforce(thread_id)
+        if thread_id in self._resident or create:
+            self._resident[thread_id] = time.monotonic()
+            self._resident.move_to_end(thread_id)
+
+    def _forget_unknown(self, thread_id: str):
+        # MemorySaver's reads create empty defaultdict entries for unknown threads
+        if thread_id not in self._resident:
+            self.storage.pop(thread_id, None)
+
+    def _grow(self, thread_id: str, delta: int):
+        self._sizes[thread_id] += delta
+        self._bytes += delta
+
+    def _evict(self, thread_id: str, expired: bool = False):
+        payload = {
+            "storage": dict(self.storage.pop(thread_id, {})),
+            "writes": {key: self.writes.pop(key) for key in self._write_keys.pop(thread_id, ()) if key in self.writes},
+            "blobs": {key: self.blobs.pop(key) for key in self._blob_keys.pop(thread_id, ()) if key in self.blobs},
+        }
+        size = self._sizes.pop(thread_id, 0)
+        self._bytes -= size
+        del self._resident[thread_id]
+
+        self.counters["evictions"] += 1
+        if expired:
+            self.counters["ttl_evictions"] += 1
+        if self.spill_dir:
+            payload["size"] = size
+            path = self._spill_path(thread_id)
+            with open(path + ".tmp", "wb") as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + ".tmp", path)
+            self.counters["spills"] += 1
+        else:
+            self.counters["dropped"] += 1
+
+    def _reload(self, thread_id: str):
+        path = self._spill_path(thread_id)
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        os.remove(path)
+
+        self.storage[thread_id] = defaultdict(dict, payload["storage"])
+        self.writes.update(payload["writes"])
+        self.blobs.update(payload["blobs"])
+        self._write_keys[thread_id] = set(payload["writes"])
+        self._blob_keys[thread_id] = set(payload["blobs"])
+        self._grow(thread_id, payload["size"])
+        self._resident[thread_id] = time.monotonic()
+        self.counters["reloads"] += 1
+
+    def _enforce(self, current: str):
+        """Evict expired threads, then LRU threads until within budget."""
+        if self.ttl > 0:
+            now = time.monotonic()
+            for thread_id, last_access in list(self._resident.items()):
+                if now - last_access <= self.ttl:
+                    break
+                if thread_id != current:
+                    self._evict(thread_id, expired=True)
+
+        def over_budget() -> bool:
+            return self._bytes > self.max_bytes or (
+                self.max_threads > 0 and len(self._resident) > self.max_threads
+            )
+
+        while over_budget() and len(self._resident) > 1:
+            oldest = next(iter(self._resident))
+            if oldest == current:
+                break
+            self._evict(oldest)
+
+    # -- saver API ----------------------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._rlock:
+            self._touch(thread_id)
+            result = super().get_tuple(config)
+            self._forget_unknown(thread_id)
+            return result
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        with self._rlock:
+            if config:
+                self._touch(config["configurable"]["thread_id"])
+            results = list(super().list(config, filter=filter, before=before, limit=limit))
+            if config:
+                self._forget_unknown(config["configurable"]["thread_id"])
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._rlock:
+            self._touch(thread_id, create=True)
+            result = super().put(config, checkpoint, metadata, new_versions)
+
+            saved, saved_metadata, _ = self.storage[thread_id][checkpoint_ns][checkpoint["id"]]
+            size = _typed_size(saved) + _typed_size(saved_metadata)
+            for channel, version in new_versions.items():
+                key = (thread_id, checkpoint_ns, channel, version)
+                if key not in self._blob_keys[thread_id]:
+                    self._blob_keys[thread_id].add(key)
+                    size += _typed_size(self.blobs[key])
+            self._grow(thread_id, size)
+            self._enforce(thread_id)
+            return result
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        key = (
+            thread_id,
+            config["configurable"].get("checkpoint_ns", ""),
+            config["configurable"]["checkpoint_id"],
+        )
+
+        def writes_size() -> int:
+            return sum(_typed_size(write[2]) for write in self.writes.get(key, {}).values())
+
+        with self._rlock:
+            self._touch(thread_id, create=True)
+            before = writes_size()
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys[thread_id].add(key)
+            self._grow(thread_id, writes_size() - before)
+            self._enforce(thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._rlock:
+            super().delete_thread(thread_id)
+            self._bytes -= self._sizes.pop(thread_id, 0)
+            self._resident.pop(thread_id, None)
+            self._blob_keys.pop(thread_id, None)
+            self._write_keys.pop(thread_id, None)
+            if self.spill_dir and os.path.exists(self._spill_path(thread_id)):
+                os.remove(self._spill_path(thread_id))
+
+    def stats(self) -> Dict[str, Any]:
+        """Resident footprint and eviction/reload counters."""
+        with self._rlock:
+            return {
+                "resident_threads": len(self._resident),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_threads": self.max_threads,
+                "ttl_seconds": self.ttl,
+                "spill_dir": self.spill_dir,
+                **self.counters,
+            }